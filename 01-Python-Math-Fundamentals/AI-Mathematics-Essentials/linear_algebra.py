@@ -56,6 +56,12 @@ def cosine_similarity_embeddings():
     print(f"\nCosine similarity (AI, ML): {sim_ai_ml:.3f}")
     print(f"Cosine similarity (AI, Cooking): {sim_ai_cooking:.3f}")
     print("\nIntuition: Values close to 1 = very similar, close to -1 = very different")
+    
+    # At scale: normalize once, then score one query against all documents at once
+    documents = np.array([embedding_machine_learning, embedding_cooking])
+    unit_documents = documents / np.linalg.norm(documents, axis=1, keepdims=True)
+    one_to_many = unit_documents @ (embedding_ai / np.linalg.norm(embedding_ai))
+    print(f"One-to-many (AI vs [ML, Cooking]): {np.round(one_to_many, 3)}")
 
 
 def matrix_multiplication_attention():
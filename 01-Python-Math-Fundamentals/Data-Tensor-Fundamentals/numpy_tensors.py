@@ -92,6 +92,11 @@ def embedding_similarity():
     
     print(f"\nCosine Similarity (1, 2): {cos_sim_12:.3f}")
     print(f"Cosine Similarity (1, 3): {cos_sim_13:.3f}")
+    
+    # Whole matrices: every embedding vs every embedding in one matrix multiply
+    embeddings = np.stack([embedding1, embedding2, embedding3])
+    unit = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    print(f"\nMany-to-many cosine similarity:\n{np.round(unit @ unit.T, 3)}")
 
 
 def matrix_multiplication():
@@ -7,6 +7,25 @@ import pandas as pd
 import numpy as np
 
 
+def load_encoding():
+    """The cl100k_base tokenizer, or None (with a note) when tiktoken is unavailable."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print("Note: token chunking needs tiktoken (install with: pip install tiktoken)")
+        print(f"Error: {e}")
+        return None
+
+
+def token_windows(encoding, text, max_tokens, overlap=0):
+    """Split text into windows of at most max_tokens tokens; neighbours share `overlap` tokens."""
+    tokens = encoding.encode_ordinary(text)
+    step = max_tokens - overlap
+    return [encoding.decode(tokens[start:start + max_tokens])
+            for start in range(0, max(len(tokens) - overlap, 1), step)]
+
+
 def text_cleaning_pipeline():
     """
     Text cleaning pipeline: Preparing unstructured text for AI models.
@@ -90,24 +109,22 @@ def token_based_preparation():
     # Chunking strategy: Split long texts into chunks
     max_tokens = 512  # Common context window size
     
-    def chunk_text(text, max_tokens):
-        """Split text into chunks of max_tokens."""
-        approx_chars = max_tokens * 4
-        chunks = []
-        for i in range(0, len(text), approx_chars):
-            chunks.append(text[i:i + approx_chars])
-        return chunks
+    encoding = load_encoding()
+    if encoding is None:
+        return
     
-    df['chunks'] = df['text'].apply(lambda x: chunk_text(x, max_tokens))
+    # Exact token counts, all texts encoded in one batch
+    df['tokens'] = [len(tokens) for tokens in encoding.encode_ordinary_batch(df['text'].tolist())]
+    df['chunks'] = df['text'].apply(lambda x: token_windows(encoding, x, max_tokens))
     df['num_chunks'] = df['chunks'].apply(len)
     
     print("Token-based preparation:")
-    print(df[['text', 'approx_tokens', 'num_chunks']])
+    print(df[['text', 'approx_tokens', 'tokens', 'num_chunks']])
     
     # Show chunks for long text
     print(f"\nChunks for long text (max {max_tokens} tokens each):")
     for i, chunk in enumerate(df.iloc[2]['chunks']):
-        print(f"Chunk {i+1}: {chunk[:50]}...")
+        print(f"Chunk {i+1}: {len(encoding.encode_ordinary(chunk))} tokens: {chunk[:50]}...")
 
 
 def chunking_strategies():
@@ -119,14 +136,14 @@ def chunking_strategies():
     # Sample document
     document = "This is sentence one. This is sentence two. This is sentence three. " * 5
     
-    # Strategy 1: Fixed-size chunks (512 tokens)
+    encoding = load_encoding()
+    if encoding is None:
+        return
+    
+    # Strategy 1: Fixed-size chunks (512 real tokens, not 512 * 4 characters)
     def fixed_size_chunk(text, chunk_size=512):
-        """Fixed-size chunking (sliding window approach)."""
-        approx_chars = chunk_size * 4
-        chunks = []
-        for i in range(0, len(text), approx_chars):
-            chunks.append(text[i:i + approx_chars])
-        return chunks
+        """Fixed-size chunking in tokens."""
+        return token_windows(encoding, text, chunk_size)
     
     # Strategy 2: Sentence-based chunking
     def sentence_chunk(text, max_sentences=3):
@@ -140,15 +157,8 @@ def chunking_strategies():
     
     # Strategy 3: Sliding window with overlap
     def sliding_window_chunk(text, chunk_size=512, overlap=128):
-        """Sliding window with overlap to preserve context."""
-        approx_chars = chunk_size * 4
-        overlap_chars = overlap * 4
-        chunks = []
-        i = 0
-        while i < len(text):
-            chunks.append(text[i:i + approx_chars])
-            i += approx_chars - overlap_chars
-        return chunks
+        """Sliding window with overlap to preserve context (token windows)."""
+        return token_windows(encoding, text, chunk_size, overlap)
     
     fixed_chunks = fixed_size_chunk(document)
     sentence_chunks = sentence_chunk(document)
@@ -3,7 +3,7 @@ Type Hints for AI Engineering
 Essential for maintainability in large AI projects.
 """
 
-from typing import List, Dict, Optional, Union, Callable, Tuple
+from typing import List, Dict, Optional, Union, Callable, Tuple, Protocol, Sequence
 from pydantic import BaseModel
 
 
@@ -28,12 +28,48 @@ def batch_process_texts(
     return [processor(text) for text in texts]
 
 
+# Protocol: any object with these methods fits (structural typing, no inheritance)
+class EmbeddingCacheLike(Protocol):
+    def get_many(self, texts: Sequence[str], model: Optional[str] = None) -> list: ...
+
+    def put_many(self, texts: Sequence[str], embeddings, model: Optional[str] = None) -> None: ...
+
+
+class DictEmbeddingCache:
+    """Fits EmbeddingCacheLike without inheriting from it (so does the RAG pipeline's EmbeddingCache)."""
+
+    def __init__(self):
+        self.vectors: Dict[Tuple[Optional[str], str], List[float]] = {}
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get_many(self, texts: Sequence[str], model: Optional[str] = None) -> list:
+        found = [self.vectors.get((model, text)) for text in texts]
+        self.stats["misses"] += found.count(None)
+        self.stats["hits"] += len(found) - found.count(None)
+        return found
+
+    def put_many(self, texts: Sequence[str], embeddings, model: Optional[str] = None) -> None:
+        self.vectors.update(((model, text), list(vector)) for text, vector in zip(texts, embeddings))
+
+
 def create_embedding_dict(
     texts: List[str],
-    model: str = "default"
+    model: str = "default",
+    cache: Optional[EmbeddingCacheLike] = None
 ) -> Dict[str, List[float]]:
-    """Create dictionary mapping text to embeddings."""
-    return {text: calculate_embedding(text, model) for text in texts}
+    """Create dictionary mapping text to embeddings; with a cache, only misses are computed."""
+    if cache is None:
+        return {text: calculate_embedding(text, model) for text in texts}
+    
+    cached = cache.get_many(texts, model)
+    missing = [text for text, vector in zip(texts, cached) if vector is None]
+    computed = {text: calculate_embedding(text, model) for text in missing}
+    if computed:
+        cache.put_many(list(computed), list(computed.values()), model)
+    return {
+        text: computed[text] if vector is None else [float(x) for x in vector]
+        for text, vector in zip(texts, cached)
+    }
 
 
 # Optional and Union types
@@ -86,6 +122,11 @@ if __name__ == "__main__":
     processed = batch_process_texts(texts, process_text)
     print(f"Batch processed: {processed}")
     
+    cache = DictEmbeddingCache()
+    create_embedding_dict(texts, cache=cache)
+    create_embedding_dict(texts, cache=cache)
+    print(f"Embedding cache: {cache.stats['hits']} hits, {cache.stats['misses']} misses")
+    
     typed_result = get_typed_embedding("example")
     print(f"Typed result: {typed_result}")
 
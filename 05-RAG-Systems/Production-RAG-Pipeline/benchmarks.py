@@ -0,0 +1,1097 @@
+"""
+Retrieval Benchmarks
+Measuring production retrieval components against naive baselines.
+
+Run all benchmarks:  python benchmarks.py
+Run one benchmark:   python benchmarks.py vector_index
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+import numpy as np
+
+from bulk_writer import BulkVectorWriter
+from context_packer import ContextPacker, shrink_until_fits
+from hnsw_index import HNSWIndex
+from hybrid_retriever import HybridRetriever
+from incremental_indexer import IncrementalIndexer
+from ingestion_pipeline import IngestionPipeline, chunk_documents, read_documents, write_corpus
+from ivf_index import IVFIndex
+from local_embedder import HashingEmbedder
+from lsm_store import LSMVectorStore
+from mmap_store import MmapVectorStore
+from parallel_chunker import ParallelChunker
+from permission_filter import FilteredVectorIndex, matches, post_filter_search
+from pq_codec import PQIndex, ProductQuantizer
+from query_planner import ANN_IN_GRAPH, ANN_POST_FILTER, BRUTE_FORCE, PlannedRetriever
+from recursive_chunker import DEFAULT_SEPARATORS, RecursiveChunker
+from resilience import CircuitBreaker, Dependency, FakeService, FallbackChain
+from similarity import UnitVectors, many_to_many, one_to_many
+from tenant_index import TenantIndex
+from tiered_cache import FakeRemoteKV, TieredCache
+from token_chunker import TokenChunker, heuristic_chunks
+from tracing import TracedRAG, Tracer
+from vector_index import VectorIndex, recall_at_k, top_k
+
+
+def random_embeddings(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Random float32 embeddings, generated in blocks to limit peak memory."""
+    rng = np.random.default_rng(seed)
+    embeddings = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        end = min(start + 100_000, n)
+        embeddings[start:end] = rng.standard_normal((end - start, dim), dtype=np.float32)
+    return embeddings
+
+
+def clustered_embeddings(
+    n: int,
+    dim: int,
+    n_clusters: int = 1000,
+    noise: float = 1.0,
+    seed: int = 0
+) -> np.ndarray:
+    """Embeddings grouped around topic centers, closer to real corpora than pure noise."""
+    rng = np.random.default_rng(seed)
+    centers = np.random.default_rng(1234).standard_normal((n_clusters, dim), dtype=np.float32)
+    embeddings = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        end = min(start + 100_000, n)
+        embeddings[start:end] = centers[rng.integers(0, n_clusters, end - start)]
+        embeddings[start:end] += noise * rng.standard_normal((end - start, dim), dtype=np.float32)
+    return embeddings
+
+
+def synthetic_texts(n: int, words_per_text: int = 30, vocabulary: int = 50_000, seed: int = 0):
+    """Chunks of Zipf-distributed words ("w17 w3 w2048 ..."), like natural text frequencies."""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(vocabulary)])
+    texts = []
+    for start in range(0, n, 100_000):
+        count = min(100_000, n - start)
+        ids = np.minimum(rng.zipf(1.2, (count, words_per_text)), vocabulary) - 1
+        texts.extend(" ".join(row) for row in words[ids])
+    return texts
+
+
+def time_search(search, queries: np.ndarray, k: int, **kwargs):
+    """Run a batched search once and return (ids, ms per query)."""
+    start = time.perf_counter()
+    _, ids = search(queries, k, **kwargs)
+    return ids, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def latency_percentiles(search, queries: np.ndarray, k: int, **kwargs):
+    """Search one query at a time (like a serving path) and return (ids, p50 ms, p99 ms)."""
+    ids, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, row_ids = search(query, k, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids.append(row_ids[0])
+    return np.array(ids), np.percentile(latencies, 50), np.percentile(latencies, 99)
+
+
+def loop_search(query: np.ndarray, doc_embeddings: list, k: int = 2) -> list:
+    """The original per-document loop from vector_search() (baseline)."""
+    similarities = []
+    for doc_emb, text in doc_embeddings:
+        sim = np.dot(query, doc_emb) / (np.linalg.norm(query) * np.linalg.norm(doc_emb))
+        similarities.append((sim, text))
+    similarities.sort(reverse=True, key=lambda x: x[0])
+    return similarities[:k]
+
+
+def benchmark_vector_index(
+    sizes=(10_000, 100_000, 1_000_000),
+    dim: int = 384,
+    n_queries: int = 100,
+    k: int = 10
+):
+    """VectorIndex batched search vs the per-document loop."""
+    print("=== Benchmark: VectorIndex vs per-document loop ===")
+    print(f"dim={dim}, k={k}, batch of {n_queries} queries\n")
+    print(f"{'Vectors':>10} {'Loop ms/query':>15} {'Index ms/query':>15} {'Speedup':>10}")
+
+    for n in sizes:
+        embeddings = random_embeddings(n, dim)
+        queries = random_embeddings(n_queries, dim, seed=1)
+
+        # Baseline: a single query is enough, the loop is linear per query
+        docs = [(embeddings[i], i) for i in range(n)]
+        start = time.perf_counter()
+        loop_search(queries[0], docs, k)
+        loop_ms = (time.perf_counter() - start) * 1000
+        del docs
+
+        index = VectorIndex(dim, initial_capacity=n)
+        index.add(embeddings)
+        index.search(queries[:1], k)  # Warm-up
+        start = time.perf_counter()
+        index.search(queries, k)
+        index_ms = (time.perf_counter() - start) * 1000 / n_queries
+
+        print(f"{n:>10,} {loop_ms:>15.2f} {index_ms:>15.3f} {loop_ms / index_ms:>9.0f}x")
+
+
+def benchmark_ivf_index(
+    n: int = 1_000_000,
+    dim: int = 384,
+    nlist: int = 1024,
+    nprobes=(1, 4, 16, 64),
+    n_queries: int = 200,
+    k: int = 10
+):
+    """IVF recall@k and latency per nprobe, against the exact VectorIndex."""
+    print("=== Benchmark: IVF index vs exact search ===")
+    corpus = clustered_embeddings(n, dim)
+    queries = clustered_embeddings(n_queries, dim, seed=1)
+
+    exact = VectorIndex(dim, initial_capacity=n)
+    exact.add(corpus)
+    true_ids, exact_ms = time_search(exact.search, queries, k)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(dim, nlist=nlist)
+    ivf.train(corpus)
+    train_s = time.perf_counter() - start
+    start = time.perf_counter()
+    ivf.add(corpus)
+    add_s = time.perf_counter() - start
+
+    print(f"{n:,} vectors, dim={dim}, nlist={nlist}, k={k}")
+    print(f"Train: {train_s:.1f}s, add: {add_s:.1f}s, exact search: {exact_ms:.2f} ms/query\n")
+    print(f"{'nprobe':>6} {'recall@k':>10} {'ms/query':>10} {'Speedup':>10}")
+    for nprobe in nprobes:
+        found_ids, ivf_ms = time_search(ivf.search, queries, k, nprobe=nprobe)
+        recall = recall_at_k(found_ids, true_ids)
+        print(f"{nprobe:>6} {recall:>10.3f} {ivf_ms:>10.3f} {exact_ms / ivf_ms:>9.1f}x")
+
+
+def benchmark_hnsw_index(
+    n: int = 100_000,
+    dim: int = 384,
+    M: int = 16,
+    ef_construction: int = 100,
+    ef_searches=(16, 32, 64, 128),
+    n_queries: int = 200,
+    k: int = 10
+):
+    """
+    HNSW single-query p50/p99 latency and recall vs the exhaustive scan.
+    The graph is built in pure Python, so the default corpus is 100k;
+    pass n=1_000_000 for the full-size run (build takes hours).
+    """
+    print("=== Benchmark: HNSW vs exhaustive scan ===")
+    corpus = clustered_embeddings(n, dim)
+    queries = clustered_embeddings(n_queries, dim, seed=1)
+
+    exact = VectorIndex(dim, initial_capacity=n)
+    exact.add(corpus)
+    true_ids, exact_p50, exact_p99 = latency_percentiles(exact.search, queries, k)
+
+    start = time.perf_counter()
+    index = HNSWIndex(dim, M=M, ef_construction=ef_construction)
+    index.add(corpus)
+    build_s = time.perf_counter() - start
+
+    print(f"{n:,} vectors, dim={dim}, M={M}, ef_construction={ef_construction}, k={k}")
+    print(f"Build: {build_s:.0f}s ({build_s / n * 1000:.2f} ms/vector)")
+    print(f"Exhaustive scan: p50 {exact_p50:.3f} ms, p99 {exact_p99:.3f} ms\n")
+    print(f"{'ef_search':>9} {'recall@k':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for ef in ef_searches:
+        found_ids, p50, p99 = latency_percentiles(index.search, queries, k, ef_search=ef)
+        print(f"{ef:>9} {recall_at_k(found_ids, true_ids):>10.3f} {p50:>10.3f} {p99:>10.3f}")
+
+
+def benchmark_pq(
+    n: int = 100_000,
+    dim: int = 1536,
+    subvector_counts=(192, 384, 768),
+    train_size: int = 20_000,
+    n_queries: int = 50,
+    k: int = 10,
+    rerank: int = 100
+):
+    """PQ memory per vector, encode throughput and recall@k vs the uncompressed scan."""
+    print("=== Benchmark: Product quantization vs uncompressed scan ===")
+    corpus = clustered_embeddings(n, dim)
+    queries = clustered_embeddings(n_queries, dim, seed=1)
+
+    exact = VectorIndex(dim, initial_capacity=n)
+    exact.add(corpus)
+    true_ids, exact_ms = time_search(exact.search, queries, k)
+    print(f"{n:,} vectors, dim={dim}, float32 = {dim * 4:,} bytes/vector, "
+          f"exact scan {exact_ms:.2f} ms/query\n")
+    print(f"{'Subvectors':>10} {'Bytes/vec':>10} {'Ratio':>7} {'Encode vec/s':>13} "
+          f"{'Recall ADC':>11} {'ms/query':>9} {'Recall rerank':>14} {'ms/query':>9}")
+
+    for n_subvectors in subvector_counts:
+        quantizer = ProductQuantizer(dim, n_subvectors=n_subvectors)
+        quantizer.train(corpus[:train_size])
+        with tempfile.TemporaryDirectory() as tmp:
+            index = PQIndex(quantizer, rerank_path=os.path.join(tmp, "full.f32"))
+            start = time.perf_counter()
+            index.add(corpus)
+            encode_rate = n / (time.perf_counter() - start)
+
+            adc_ids, adc_ms = time_search(index.search, queries, k)
+            rerank_ids, rerank_ms = time_search(index.search, queries, k, rerank=rerank)
+
+        print(f"{n_subvectors:>10} {index.memory_per_vector():>10} "
+              f"{dim * 4 // index.memory_per_vector():>6}x {encode_rate:>13,.0f} "
+              f"{recall_at_k(adc_ids, true_ids):>11.3f} {adc_ms:>9.2f} "
+              f"{recall_at_k(rerank_ids, true_ids):>14.3f} {rerank_ms:>9.2f}")
+
+
+def process_memory_mb() -> dict:
+    """
+    RSS, PSS and private memory of this process (Linux /proc, in MB).
+    RSS counts shared pages in every process; PSS splits them fairly.
+    """
+    usage = {"rss": 0.0, "pss": 0.0, "private": 0.0}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                kb = int(value.split()[0]) if value.split()[0].isdigit() else 0
+                if key == "Rss":
+                    usage["rss"] = kb / 1024
+                elif key == "Pss":
+                    usage["pss"] = kb / 1024
+                elif key in ("Private_Clean", "Private_Dirty"):
+                    usage["private"] += kb / 1024
+    except OSError:
+        import resource
+        usage["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return usage
+
+
+def _retrieval_worker(args) -> Tuple[float, dict]:
+    """Worker start-up: open the corpus (copy or mapping), serve one query, report."""
+    mode, directory, dim, barrier = args
+    start = time.perf_counter()
+    if mode == "copy":
+        index = VectorIndex(dim)
+        index.add(np.load(MmapVectorStore(directory, dim).base_path))
+    else:
+        index = MmapVectorStore(directory, dim)
+    index.search(random_embeddings(1, dim, seed=os.getpid()), k=10)
+    startup_s = time.perf_counter() - start
+    barrier.wait()  # Measure while every worker is alive
+    return startup_s, process_memory_mb()
+
+
+def benchmark_mmap_store(n: int = 1_000_000, dim: int = 384, n_workers: int = 4):
+    """Per-worker startup time and memory: private in-RAM copy vs shared memory mapping."""
+    print("=== Benchmark: Worker startup and memory, copy vs memory map ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MmapVectorStore(tmp, dim)
+        for start in range(0, n, 100_000):
+            store.append(random_embeddings(min(100_000, n - start), dim, seed=start))
+        store.compact()
+        print(f"{n:,} vectors x {dim} dims = {n * dim * 4 / 1e6:,.0f} MB on disk, "
+              f"{n_workers} workers\n")
+        print(f"{'Mode':>6} {'Startup s':>10} {'RSS MB':>9} {'PSS MB':>9} {'Private MB':>11}")
+
+        context = multiprocessing.get_context("spawn")
+        for mode in ("copy", "mmap"):
+            with context.Manager() as manager:
+                barrier = manager.Barrier(n_workers)
+                with context.Pool(n_workers) as pool:
+                    results = pool.map(_retrieval_worker, [(mode, tmp, dim, barrier)] * n_workers)
+            startup = np.mean([startup_s for startup_s, _ in results])
+            memory = {key: np.mean([usage[key] for _, usage in results])
+                      for key in ("rss", "pss", "private")}
+            print(f"{mode:>6} {startup:>10.3f} {memory['rss']:>9.0f} "
+                  f"{memory['pss']:>9.0f} {memory['private']:>11.0f}")
+    print("\n(mean per worker; PSS shows each worker's fair share of shared pages)")
+
+
+def benchmark_hybrid(n: int = 1_000_000, dim: int = 384, n_queries: int = 200, k: int = 10):
+    """Hybrid BM25 + vector throughput and per-leg latency on a synthetic corpus."""
+    print("=== Benchmark: Hybrid retrieval (BM25 + vector, RRF) ===")
+    texts = synthetic_texts(n)
+    embedder = HashingEmbedder(dim)
+    retriever = HybridRetriever(embedder.embed, dim)
+
+    start = time.perf_counter()
+    for offset in range(0, n, 100_000):
+        batch = texts[offset:offset + 100_000]
+        retriever.add(batch, embeddings=clustered_embeddings(len(batch), dim, seed=offset))
+    retriever.search("w1", k)  # Builds the postings
+    build_s = time.perf_counter() - start
+    postings_mb = (retriever.bm25.doc_ids.nbytes + retriever.bm25.term_freqs.nbytes) / 1e6
+
+    queries = [" ".join(text.split()[:3]) for text in synthetic_texts(n_queries, seed=1)]
+    timings = {"keyword": [], "vector": [], "fusion": [], "total": []}
+    start = time.perf_counter()
+    for query in queries:
+        _, query_timings = retriever.search(query, k)
+        for leg, ms in query_timings.items():
+            timings[leg].append(ms)
+    elapsed = time.perf_counter() - start
+    retriever.close()
+
+    print(f"{n:,} chunks, dim={dim}, index build {build_s:.0f}s, "
+          f"postings {postings_mb:.0f} MB ({len(retriever.bm25.vocabulary):,} terms)")
+    print(f"Throughput: {n_queries / elapsed:.1f} queries/s (single client)\n")
+    print(f"{'Stage':>8} {'p50 ms':>9} {'p95 ms':>9}")
+    for leg, values in timings.items():
+        print(f"{leg:>8} {np.percentile(values, 50):>9.2f} {np.percentile(values, 95):>9.2f}")
+    serial = np.median(np.add(timings["keyword"], timings["vector"]))
+    print(f"\nKeyword + vector run serially would take {serial:.2f} ms (p50); "
+          f"concurrent legs take {np.median(timings['total']):.2f} ms")
+
+
+def benchmark_similarity(n: int = 100_000, dim: int = 384, n_queries: int = 100):
+    """Scalar cosine helper vs matrix kernels on pre-normalized (float32/float16) storage."""
+    print("=== Benchmark: Similarity kernels vs scalar helper ===")
+    docs = random_embeddings(n, dim)
+    queries = random_embeddings(n_queries, dim, seed=1)
+
+    def scalar_cosine(a, b):
+        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+
+    def timed_ms(fn, repeat: int = 3) -> float:
+        fn()  # Warm-up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) * 1000 / repeat
+
+    unit32 = UnitVectors(docs)
+    unit16 = UnitVectors(docs, dtype=np.float16)
+    out = np.empty(n, dtype=np.float32)
+    out_many = np.empty((n_queries, n), dtype=np.float32)
+
+    scalar_ms = timed_ms(lambda: [scalar_cosine(queries[0], doc) for doc in docs], repeat=1)
+    rows = [
+        ("scalar helper loop (1 query)", scalar_ms),
+        ("one_to_many, raw docs (norms per call)", timed_ms(lambda: one_to_many(queries[0], docs))),
+        ("one_to_many, UnitVectors f32 + out", timed_ms(lambda: one_to_many(queries[0], unit32, out=out))),
+        ("one_to_many, UnitVectors f16 + out", timed_ms(lambda: one_to_many(queries[0], unit16, out=out))),
+        (f"many_to_many f32 ({n_queries} queries) / query",
+         timed_ms(lambda: many_to_many(queries, unit32, out=out_many)) / n_queries),
+    ]
+    print(f"{n:,} documents, dim={dim}\n")
+    print(f"{'Kernel':<46} {'ms':>9} {'Speedup':>9}")
+    for name, ms in rows:
+        print(f"{name:<46} {ms:>9.3f} {scalar_ms / ms:>8.0f}x")
+    print(f"\nMemory: float32 {unit32.data.nbytes / 1e6:.0f} MB, float16 {unit16.data.nbytes / 1e6:.0f} MB")
+
+
+def benchmark_ingestion(sizes=(500, 2000, 8000), dim: int = 384, batch_size: int = 64):
+    """Streaming pipeline vs read-everything-then-embed: throughput and peak Python memory."""
+    print("=== Benchmark: Streaming ingestion vs eager lists ===")
+    print(f"dim={dim}, embedding batch {batch_size}, ~3 KB documents\n")
+    print(f"{'Docs':>7} {'Eager s':>9} {'Eager MB':>9} {'Stream s':>9} {'Stream MB':>10}")
+
+    def discard(chunks, embeddings):
+        pass  # Measure the pipeline itself, not the index that grows with the corpus
+
+    def eager(paths, embedder):
+        documents = list(read_documents(paths))
+        chunks = list(chunk_documents(documents))
+        embeddings = np.concatenate([
+            embedder.embed([chunk["text"] for chunk in chunks[start:start + batch_size]])
+            for start in range(0, len(chunks), batch_size)
+        ])
+        discard(chunks, embeddings)
+
+    def streaming(paths, embedder):
+        IngestionPipeline(embedder.embed, discard, embed_batch_size=batch_size).run(paths)
+
+    for n_docs in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = write_corpus(tmp, n_docs)
+            row = [f"{n_docs:>7}"]
+            for run in (eager, streaming):
+                embedder = HashingEmbedder(dim=dim)
+                embedder.embed(["refund shipping python quota embedding latency tenant cache"])  # Warm token cache
+                tracemalloc.start()
+                start = time.perf_counter()
+                run(paths, embedder)
+                elapsed = time.perf_counter() - start
+                peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+                tracemalloc.stop()
+                row.append(f"{elapsed:>9.2f} {peak_mb:>9.1f}")
+            print(" ".join(row))
+    print("\nStreaming peak memory stays flat: only queue_size batches are ever in flight.")
+
+
+def benchmark_parallel_chunking(n_files: int = 400, words_per_file: int = 20_000, max_workers: int = None):
+    """ParallelChunker throughput from 1 to N worker processes."""
+    print("=== Benchmark: Parallel chunking scaling ===")
+    max_workers = max_workers or os.cpu_count() or 1
+    worker_counts = sorted({w for w in (1, 2, 4, 8, 16) if w < max_workers} | {max_workers})
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_corpus(tmp, n_files, words_per_doc=words_per_file)
+        corpus_mb = sum(os.path.getsize(path) for path in paths) / 1e6
+        print(f"{n_files} files, {corpus_mb:.0f} MB, {os.cpu_count()} CPUs available\n")
+        print(f"{'Workers':>8} {'Seconds':>9} {'MB/s':>8} {'Chunks':>9} {'Speedup':>8}")
+
+        baseline = None
+        for workers in worker_counts:
+            chunker = ParallelChunker(max_workers=workers, chunk_size=1000, chunk_overlap=100)
+            start = time.perf_counter()
+            n_chunks = sum(1 for _ in chunker.chunk(paths))
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {corpus_mb / elapsed:>8.1f} {n_chunks:>9,} "
+                  f"{baseline / elapsed:>7.1f}x")
+
+
+def benchmark_token_chunker(n_docs: int = 600, max_tokens: int = 512, overlap: int = 64, encoding=None):
+    """TokenChunker vs the 4-chars-per-token heuristic: context overflows and throughput."""
+    print("=== Benchmark: Token chunker vs 4-chars-per-token heuristic ===")
+    samples = {
+        "prose": "Retrieval augmented generation grounds model answers in your own documents. ",
+        "code": "def score(x):\n    return {k: v ** 2 for k, v in x.items() if v > 0}  # TODO\n",
+        "german": "Die Rückerstattung erfolgt innerhalb von fünf Werktagen nach Eingang der Ware. ",
+        "japanese": "返金は商品到着後五営業日以内に処理されます。詳細はサポートまでお問い合わせください。",
+    }
+    chunker = TokenChunker(max_tokens, overlap, encoding=encoding)
+    print(f"max_tokens={max_tokens}, overlap={overlap}, {n_docs} documents per text type\n")
+    print(f"{'Text':>9} {'Heuristic chunks':>17} {'Over limit':>11} {'Token chunks':>13} {'Max tokens':>11}")
+
+    corpus = []
+    for name, sample in samples.items():
+        documents = [sample * (40 + i % 40) for i in range(n_docs)]
+        corpus.extend(documents)
+        heuristic = [chunk for document in documents for chunk in heuristic_chunks(document, max_tokens, overlap)]
+        over = sum(n > max_tokens for n in chunker.count_tokens(heuristic))
+        token_chunks = [chunk for chunks in chunker.chunk_documents(documents) for chunk in chunks]
+        print(f"{name:>9} {len(heuristic):>17,} {over / len(heuristic):>10.0%} {len(token_chunks):>13,} "
+              f"{max(chunk['n_tokens'] for chunk in token_chunks):>11}")
+
+    corpus_mb = sum(len(document.encode()) for document in corpus) / 1e6
+    timings = {
+        "heuristic (no tokenizer)": lambda: [heuristic_chunks(d, max_tokens, overlap) for d in corpus],
+        "token chunker, one doc per call": lambda: [chunker.chunk(d) for d in corpus],
+        "token chunker, batched": lambda: chunker.chunk_documents(corpus),
+    }
+    print(f"\nThroughput on {len(corpus):,} documents ({corpus_mb:.0f} MB):")
+    for name, run in timings.items():
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<32} {elapsed:>7.2f} s  {corpus_mb / elapsed:>7.1f} MB/s")
+
+
+def naive_recursive_split(text: str, chunk_size: int, separators=DEFAULT_SEPARATORS) -> list:
+    """Textbook recursive splitter (baseline): split into substrings, re-join to measure, recurse."""
+    level = next(i for i, sep in enumerate(separators) if sep == "" or sep in text)
+    separator, rest = separators[level], separators[level + 1:]
+    pieces = text.split(separator) if separator else list(text)
+    chunks, current = [], []
+    for piece in pieces:
+        if len(piece) > chunk_size:
+            if current:
+                chunks.append(separator.join(current))
+                current = []
+            chunks.extend(naive_recursive_split(piece, chunk_size, rest))
+        elif len(separator.join(current + [piece])) <= chunk_size:
+            current.append(piece)
+        else:
+            chunks.append(separator.join(current))
+            current = [piece]
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def benchmark_recursive_chunker(sizes_mb=(1, 4, 16), chunk_size: int = 1000):
+    """Index-span recursive chunker vs a naive substring-based recursive splitter."""
+    print("=== Benchmark: Recursive chunker (index spans) vs naive recursive split ===")
+    print(f"chunk_size={chunk_size} characters\n")
+    print(f"{'MB':>4} {'Naive s':>9} {'Naive MB/s':>11} {'Spans s':>9} {'Spans MB/s':>11} {'Speedup':>8}")
+
+    sentence_words = synthetic_texts(20_000, words_per_text=12)
+    chunker = RecursiveChunker(chunk_size=chunk_size)
+    for size_mb in sizes_mb:
+        # Paragraphs of sentences; every 10th sentence is a long run-on that needs word-level splits
+        parts, length, i = [], 0, 0
+        while length < size_mb * 1_000_000:
+            words = sentence_words[i % len(sentence_words)]
+            sentence = (words + " ") * 30 if i % 10 == 9 else words
+            parts.append(sentence + (".\n\n" if i % 40 == 39 else ". "))
+            length += len(parts[-1])
+            i += 1
+        document = "".join(parts)
+
+        start = time.perf_counter()
+        naive_recursive_split(document, chunk_size)
+        naive_s = time.perf_counter() - start
+        start = time.perf_counter()
+        chunker.split_spans(document)
+        spans_s = time.perf_counter() - start
+        mb = len(document) / 1e6
+        print(f"{size_mb:>4} {naive_s:>9.2f} {mb / naive_s:>11.1f} {spans_s:>9.2f} {mb / spans_s:>11.1f} "
+              f"{naive_s / spans_s:>7.1f}x")
+
+
+def benchmark_incremental_index(n_docs: int = 2000, paragraphs: int = 10, changed: float = 0.05, dim: int = 384):
+    """Daily update (a few edited paragraphs): full re-index vs manifest-diffed incremental upsert."""
+    print("=== Benchmark: Incremental re-indexing vs full rebuild ===")
+    texts = synthetic_texts(n_docs * paragraphs + n_docs, words_per_text=120)
+    documents = {
+        f"doc-{i}": "\n\n".join(texts[i * paragraphs:(i + 1) * paragraphs]) for i in range(n_docs)
+    }
+    rng = np.random.default_rng(0)
+    updated = dict(documents)
+    edited_ids = rng.choice(n_docs, int(n_docs * changed), replace=False)
+    for n, i in enumerate(edited_ids.tolist()):
+        parts = updated[f"doc-{i}"].split("\n\n")
+        parts[rng.integers(paragraphs)] = texts[n_docs * paragraphs + n]
+        updated[f"doc-{i}"] = "\n\n".join(parts)
+    print(f"{n_docs} documents x {paragraphs} paragraphs, {len(edited_ids)} documents get one edited paragraph\n")
+
+    embedder = HashingEmbedder(dim=dim)
+
+    def ingested() -> IncrementalIndexer:
+        indexer = IncrementalIndexer(embedder.embed, VectorIndex(dim))
+        indexer.upsert(documents)
+        return indexer
+
+    scan_all, known_changes = ingested(), ingested()
+    runs = [
+        ("full rebuild", lambda: IncrementalIndexer(embedder.embed, VectorIndex(dim)).upsert(updated)),
+        ("incremental, all documents", lambda: scan_all.upsert(updated)),
+        ("incremental, changed documents", lambda: known_changes.upsert(
+            {f"doc-{i}": updated[f"doc-{i}"] for i in edited_ids.tolist()})),
+    ]
+    print(f"{'Strategy':<32} {'Seconds':>9} {'Embedded':>9} {'Reused':>8} {'Deleted':>8}")
+    for name, run in runs:
+        start = time.perf_counter()
+        result = run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:<32} {elapsed:>9.2f} {result['embedded']:>9,} {result['reused']:>8,} {result['deleted']:>8,}")
+
+
+def benchmark_tiered_cache(
+    n_threads: int = 32,
+    requests_per_thread: int = 40,
+    n_keys: int = 100,
+    llm_ms: float = 20.0,
+    l2_ms: float = 1.0
+):
+    """Concurrent load on popular queries: upstream LLM calls and latency per cache setup."""
+    print("=== Benchmark: Tiered cache with request coalescing ===")
+    rng = np.random.default_rng(0)
+    popularity = 1.0 / np.arange(1, n_keys + 1)
+    workload = rng.choice(n_keys, size=(n_threads, requests_per_thread), p=popularity / popularity.sum())
+    print(f"{n_threads} threads x {requests_per_thread} requests over {n_keys} Zipf-popular queries, "
+          f"LLM {llm_ms:.0f} ms, L2 round trip {l2_ms:.0f} ms\n")
+
+    setups = [
+        ("L2 only (Redis sketch)", dict(l1_items=0, coalesce=False)),
+        ("L1 + L2", dict(coalesce=False)),
+        ("L1 + L2 + single-flight", dict(coalesce=True)),
+    ]
+    print(f"{'Setup':<26} {'LLM calls':>10} {'L2 calls':>9} {'p50 ms':>8} {'p99 ms':>8} {'Seconds':>8}")
+    for name, options in setups:
+        l2 = FakeRemoteKV(latency_s=l2_ms / 1000)
+        cache = TieredCache(l2, **options)
+        llm_calls = []
+        start_together = threading.Barrier(n_threads)
+
+        def llm(key: int) -> str:
+            llm_calls.append(key)
+            time.sleep(llm_ms / 1000)
+            return f"answer {key}"
+
+        def client(keys) -> list:
+            start_together.wait()
+            latencies = []
+            for key in keys.tolist():
+                request_start = time.perf_counter()
+                cache.get_or_compute(f"q{key}", lambda key=key: llm(key))
+                latencies.append(time.perf_counter() - request_start)
+            return latencies
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=n_threads) as pool:
+            latencies = np.concatenate(list(pool.map(client, workload))) * 1000
+        elapsed = time.perf_counter() - start
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{name:<26} {len(llm_calls):>10,} {l2.calls:>9,} {p50:>8.2f} {p99:>8.2f} {elapsed:>8.2f}")
+    print(f"\n(Unique queries: {len(np.unique(workload))}; single-flight computes each one once)")
+
+
+def benchmark_tenant_index(
+    big_tenants: int = 2,
+    big_size: int = 100_000,
+    small_tenants: int = 400,
+    small_size: int = 250,
+    dim: int = 128,
+    n_queries: int = 200,
+    k: int = 10
+):
+    """Shared collection filtered by tenant_id vs per-tenant shards (all resident, and under a budget)."""
+    print("=== Benchmark: Tenant-partitioned index vs tenant_id filtering ===")
+    rng = np.random.default_rng(0)
+    sizes = {f"big-{i}": big_size for i in range(big_tenants)}
+    sizes.update({f"small-{i}": small_size for i in range(small_tenants)})
+    tenants = list(sizes)
+    total = sum(sizes.values())
+    print(f"{big_tenants} tenants x {big_size:,} + {small_tenants} tenants x {small_size} vectors "
+          f"({total:,} total, dim {dim}), top-{k}\n")
+
+    shared = VectorIndex(dim, initial_capacity=total)
+    owners = np.repeat(np.arange(len(tenants)), list(sizes.values()))
+    with tempfile.TemporaryDirectory() as tmp:
+        full_mb = total * dim * 4 / 2**20
+        resident = TenantIndex(os.path.join(tmp, "resident"), dim, memory_budget_mb=4 * full_mb)
+        budgeted = TenantIndex(os.path.join(tmp, "budget"), dim, memory_budget_mb=full_mb * 3 / 4)
+        for tenant, size in sizes.items():
+            vectors = rng.standard_normal((size, dim), dtype=np.float32)
+            shared.add(vectors)
+            resident.add(tenant, vectors)
+            budgeted.add(tenant, vectors)
+        budgeted.flush()
+        queries = rng.standard_normal((n_queries, dim), dtype=np.float32)
+
+        def where_filter(tenant: str, query: np.ndarray):
+            """What where={"tenant_id": ...} costs on one shared collection: score everything, mask."""
+            scores = many_to_many(UnitVectors(query), shared.vectors)
+            scores[:, owners != tenants.index(tenant)] = -np.inf
+            return top_k(scores, k)
+
+        setups = [
+            ("shared + tenant_id filter", where_filter),
+            ("tenant shards, all resident", lambda tenant, query: resident.search(tenant, query, k)),
+            (f"tenant shards, {full_mb * 3 / 4:.0f} MB budget", lambda tenant, query: budgeted.search(tenant, query, k)),
+        ]
+        print(f"{'Setup':<30} {'small p50':>10} {'small p99':>10} {'big p50':>8} {'big p99':>8}")
+        for name, search in setups:
+            latencies = {"small": [], "big": []}
+            for i, query in enumerate(queries):
+                tenant = tenants[rng.integers(big_tenants)] if i % 4 == 0 else tenants[rng.integers(big_tenants, len(tenants))]
+                start = time.perf_counter()
+                search(tenant, query[None])
+                latencies[tenant.split("-")[0]].append((time.perf_counter() - start) * 1000)
+            small_p = np.percentile(latencies["small"], [50, 99])
+            big_p = np.percentile(latencies["big"], [50, 99])
+            print(f"{name:<30} {small_p[0]:>10.2f} {small_p[1]:>10.2f} {big_p[0]:>8.2f} {big_p[1]:>8.2f}")
+        print(f"\nUnder the budget: {budgeted.resident_bytes / 2**20:.0f} MB resident of {full_mb:.0f} MB, "
+              f"{budgeted.stats['loads']} cold loads, {budgeted.stats['evictions']} evictions")
+
+
+def benchmark_permission_filter(
+    n: int = 200_000,
+    dim: int = 128,
+    n_queries: int = 50,
+    k: int = 10,
+    oversample: int = 10,
+    selectivities=(0.001, 0.01, 0.1, 0.5, 1.0)
+):
+    """Bitmap filter inside top-k vs post-filtering an oversampled top-k, from 0.1% to 100% permitted."""
+    print("=== Benchmark: Bitmap permission filtering vs post-filtering ===")
+    rng = np.random.default_rng(0)
+    groups = 1000
+    metadatas = [{"acl_group": int(group)} for group in rng.integers(groups, size=n)]
+    index = FilteredVectorIndex(dim)
+    index.add(rng.standard_normal((n, dim), dtype=np.float32), metadatas)
+    queries = rng.standard_normal((n_queries, dim), dtype=np.float32)
+    print(f"{n:,} vectors, dim {dim}, top-{k}; post-filter fetches top-{k * oversample} "
+          f"and checks each candidate\n")
+
+    print(f"{'Permitted':>10} {'Post ms':>9} {'Post results':>13} {'Bitmap ms':>10} {'Bitmap results':>15} {'Exact':>6}")
+    for selectivity in selectivities:
+        where = {"acl_group": {"$in": list(range(max(int(groups * selectivity), 1)))}}
+        start = time.perf_counter()
+        post = [post_filter_search(index.index, metadatas, query[None], k, where, oversample)[0] for query in queries]
+        post_ms = (time.perf_counter() - start) * 1000 / n_queries
+
+        index.metadata.bitmap(where)  # Compiled once per predicate, like a user's permission filter
+        start = time.perf_counter()
+        filtered = [index.search(query[None], k, where)[1][0] for query in queries]
+        bitmap_ms = (time.perf_counter() - start) * 1000 / n_queries
+
+        # Exact filtered answer, from the per-row reference semantics
+        allowed = np.flatnonzero([matches(metadata, where) for metadata in metadatas])
+        exact = [allowed[np.argsort(-(index.index.vectors.data[allowed] @ (query / np.linalg.norm(query))))[:k]]
+                 for query in queries]
+        correct = np.mean([np.array_equal(found, truth) for found, truth in zip(filtered, exact)])
+        print(f"{selectivity:>10.1%} {post_ms:>9.2f} {np.mean([len(r) for r in post]):>13.1f} "
+              f"{bitmap_ms:>10.2f} {np.mean([len(r) for r in filtered]):>15.1f} {correct:>6.0%}")
+
+
+def benchmark_query_planner(n: int = 10_000, dim: int = 32, n_queries: int = 20, k: int = 10):
+    """Each plan forced vs the planner's choice, per filter: latency and recall against the exact filtered top-k."""
+    print("=== Benchmark: Query planner decisions ===")
+    rng = np.random.default_rng(0)
+    metadatas = [
+        {"user_id": int(rng.integers(1000)), "department": int(rng.integers(20)), "public": bool(rng.random() < 0.6)}
+        for _ in range(n)
+    ]
+    retriever = PlannedRetriever(dim)
+    start = time.perf_counter()
+    retriever.add(rng.standard_normal((n, dim), dtype=np.float32), metadatas)
+    print(f"{n:,} vectors, dim {dim} (HNSW build {time.perf_counter() - start:.0f} s); "
+          f"calibrated costs (us): { {name: round(cost, 4) for name, cost in retriever.calibrate().items()} }\n")
+    queries = rng.standard_normal((n_queries, dim), dtype=np.float32)
+
+    filters = [
+        ("user (0.1%)", {"user_id": 7}),
+        ("department (5%)", {"department": 3}),
+        ("not department (95%)", {"department": {"$ne": 3}}),
+        ("public (60%)", {"public": True}),
+    ]
+    plans = (BRUTE_FORCE, ANN_IN_GRAPH, ANN_POST_FILTER)
+    print(f"{'Filter':<22} {'Chosen':<16} " + " ".join(f"{plan + ' ms/recall':>26}" for plan in plans))
+    for name, where in filters:
+        chosen, _, _ = retriever.plan(where, k)
+        exact = [retriever.search(query, k, where, force_plan=BRUTE_FORCE)[1] for query in queries]
+        cells = []
+        for plan in plans:
+            start = time.perf_counter()
+            found = [retriever.search(query, k, where, force_plan=plan)[1] for query in queries]
+            elapsed = (time.perf_counter() - start) * 1000 / n_queries
+            cells.append(f"{elapsed:>17.2f} / {recall_at_k(np.array(found), np.array(exact)):.2f}")
+        print(f"{name:<22} {chosen:<16} " + " ".join(f"{cell:>26}" for cell in cells))
+
+
+def benchmark_tracing(n_docs: int = 20_000, queries_per_round: int = 200, rounds: int = 20, generate_ms: float = 0.0):
+    """Tracing overhead: one traced RAG query path, tracing toggled on and off in interleaved rounds."""
+    print("=== Benchmark: Tracing overhead ===")
+    tracer = Tracer()
+    rag = TracedRAG(synthetic_texts(n_docs, words_per_text=40), tracer, generate_s=generate_ms / 1000)
+    questions = synthetic_texts(queries_per_round, words_per_text=8, seed=1)
+    print(f"{n_docs:,} chunks, {rounds} rounds x {queries_per_round} queries, simulated LLM {generate_ms:.1f} ms "
+          f"(no LLM time is the worst case for relative overhead), 6 spans per query\n")
+
+    per_round = {False: [], True: []}
+    for _ in range(rounds):  # Interleaved, so machine noise hits both settings alike
+        for enabled in (False, True):
+            tracer.enabled = enabled
+            start = time.perf_counter()
+            for question in questions:
+                rag.query(question)
+            per_round[enabled].append((time.perf_counter() - start) / queries_per_round)
+    tracer.enabled = True
+    off, on = np.median(per_round[False]), np.median(per_round[True])
+    paired = np.median(np.subtract(per_round[True], per_round[False]))
+
+    start = time.perf_counter()
+    for _ in range(100_000):
+        with tracer.span("embed"):
+            pass
+    span_s = (time.perf_counter() - start) / 100_000
+
+    print(f"Median request, tracing off: {off * 1000:.3f} ms")
+    print(f"Median request, tracing on:  {on * 1000:.3f} ms  (paired difference {paired / off:+.2%}, "
+          f"within run-to-run noise of {np.std(per_round[False]) / off:.1%})")
+    print(f"Cost of one span: {span_s * 1e6:.2f} us -> 6 spans = {6 * span_s / off:.2%} of a request")
+
+
+def benchmark_resilience(n_requests: int = 200, timeout_ms: float = 50.0, slow_rates=(0.01, 0.03)):
+    """Request latency during a hanging-vector-DB outage (with/without breaker) and hedging on a slow tail."""
+    print("=== Benchmark: Circuit breaker and hedged requests ===")
+
+    print(f"Vector DB hangs (every call times out after {timeout_ms:.0f} ms), keyword fallback 2 ms, "
+          f"{n_requests} requests:")
+    print(f"{'Setup':<22} {'p50 ms':>8} {'p99 ms':>8} {'Total s':>8} {'Vector DB calls':>16}")
+    for name, threshold in (("timeout + fallback", 10**9), ("+ circuit breaker", 5)):
+        vector_db = FakeService("vector_db", latency_ms=10 * timeout_ms)  # Far slower than the timeout
+        vector = Dependency("vector_db", vector_db, CircuitBreaker("vector_db", threshold), timeout_s=timeout_ms / 1000)
+        chain = FallbackChain([("vector", vector), ("keyword", FakeService("keyword", latency_ms=2))])
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(n_requests):
+            request_start = time.perf_counter()
+            chain("query")
+            latencies.append((time.perf_counter() - request_start) * 1000)
+        total = time.perf_counter() - start
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"{name:<22} {p50:>8.1f} {p99:>8.1f} {total:>8.2f} {vector_db.calls:>16,}")
+        vector.close()
+
+    print("\nLLM with a slow tail (10 ms normally, 200 ms for a fraction of calls), hedged at p95:")
+    print(f"{'Slow calls':>10} {'Hedging':>8} {'p50 ms':>8} {'p99 ms':>8} {'p99.9 ms':>9} {'Extra calls':>12}")
+    for slow_rate in slow_rates:
+        for hedge in (False, True):
+            llm = Dependency("llm", FakeService("llm", latency_ms=10, slow_rate=slow_rate, slow_ms=200, seed=2), hedge=hedge)
+            latencies = []
+            for _ in range(n_requests * 3):
+                request_start = time.perf_counter()
+                llm("prompt")
+                latencies.append((time.perf_counter() - request_start) * 1000)
+            p50, p99, p999 = np.percentile(latencies, [50, 99, 99.9])
+            extra = llm.stats["hedges"] / llm.stats["calls"]
+            print(f"{slow_rate:>10.0%} {'on' if hedge else 'off':>8} {p50:>8.1f} {p99:>8.1f} {p999:>9.1f} {extra:>12.1%}")
+            llm.close()
+
+
+def benchmark_context_packer(n_sets: int = 50, n_chunks: int = 100, duplicate_rate: float = 0.15,
+                             model: str = "gpt-3.5-turbo", max_tokens: int = 512, encoding=None):
+    """ContextPacker vs "re-encode the prompt and drop the last chunk until it fits" on 100-chunk candidate sets."""
+    print("=== Benchmark: Context packer vs shrink-until-fits ===")
+    rng = np.random.default_rng(0)
+    words = [f"term{i}" for i in range(3000)]
+    system_prompt = "Answer using only the context below. Cite the source of every claim."
+    query = "How long do refunds take and which payment methods are refunded?"
+
+    def sentence():
+        return " ".join(rng.choice(words, rng.integers(8, 25))).capitalize() + "."
+
+    candidate_sets = []
+    for _ in range(n_sets):
+        chunks = []
+        for i in range(n_chunks):
+            if chunks and rng.random() < duplicate_rate:  # Same passage from another copy of the document
+                source = chunks[rng.integers(len(chunks))]["text"]
+                text = source.replace(source.split()[3], "revised", 1)
+            else:
+                text = " ".join(sentence() for _ in range(rng.integers(2, 14)))
+            chunks.append({"text": text, "source": f"doc{i}"})
+        candidate_sets.append(chunks)
+
+    packer = ContextPacker(model, max_tokens=max_tokens, system_prompt=system_prompt, encoding=encoding)
+    encoding = packer.encoding
+    with_counts = [[{**chunk, "n_tokens": packer.count(chunk["text"])} for chunk in chunks] for chunks in candidate_sets]
+    print(f"{n_sets} sets of {n_chunks} ranked chunks ({duplicate_rate:.0%} near-duplicates), "
+          f"{model} window {packer.context_window}, max_tokens {max_tokens}\n")
+
+    def shrink(chunks):
+        return shrink_until_fits(encoding, chunks, system_prompt, query, packer.context_window, max_tokens)
+
+    def fresh_pack(chunks):
+        return ContextPacker(model, max_tokens=max_tokens, system_prompt=system_prompt, encoding=encoding).pack(chunks, query)
+
+    runs = {
+        "shrink until fits (re-encode)": (shrink, candidate_sets),
+        "packer, counts not cached": (fresh_pack, candidate_sets),
+        "packer, n_tokens from chunker": (lambda chunks: packer.pack(chunks, query), with_counts),
+    }
+    print(f"{'Method':<32} {'ms / pack':>10} {'Chunks':>7} {'Duplicates':>11} {'Context tokens':>15} {'Fits':>6}")
+    for name, (run, sets) in runs.items():
+        start = time.perf_counter()
+        results = [run(chunks) for chunks in sets]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / n_sets
+        kept_sets = [result if isinstance(result, list) else result["chunks"] for result in results]
+        duplicates = [sum("revised" in chunk["text"] for chunk in kept) for kept in kept_sets]
+        contexts = ["\n\n".join(chunk["text"] for chunk in kept) for kept in kept_sets]
+        prompt_tokens = [len(encoding.encode_ordinary(system_prompt + context + query)) for context in contexts]
+        fits = np.mean([tokens + max_tokens <= packer.context_window for tokens in prompt_tokens])
+        print(f"{name:<32} {elapsed_ms:>10.2f} {np.mean([len(k) for k in kept_sets]):>7.1f} "
+              f"{np.mean(duplicates):>11.2f} {np.mean(prompt_tokens):>15,.0f} {fits:>6.0%}")
+
+
+def benchmark_bulk_writer(n: int = 300_000, preload: int = 200_000, dim: int = 64, call_size: int = 1000,
+                          batch_size: int = 50_000, throttled_rate: int = 10_000, throttled_seconds: float = 8.0,
+                          n_readers: int = 1, k: int = 10):
+    """
+    Synchronous appends vs BulkVectorWriter, with threads querying throughout:
+    the ingest rate flat out, then query latency while both ingest at the same fixed rate.
+    """
+    print("=== Benchmark: Bulk writer vs synchronous appends under query load ===")
+    rng = np.random.default_rng(0)
+    total = preload + n + int(throttled_rate * throttled_seconds)
+    vectors = rng.standard_normal((total, dim)).astype(np.float32)
+    ids = [f"doc{i}" for i in range(total)]
+    queries = rng.standard_normal((256, dim)).astype(np.float32)
+    print(f"{preload:,} vectors preloaded (dim {dim}); upserts of {call_size} per call, fsync'd; "
+          f"{n_readers} thread(s) querying (k={k}) throughout")
+
+    def run(write, search, finish, start_row, n_rows, rate=None):
+        stop = threading.Event()
+        latencies = []
+
+        def reader(seed: int):
+            i = seed
+            while not stop.is_set():
+                query_start = time.perf_counter()
+                search(queries[i % len(queries)][None], k)
+                latencies.append((time.perf_counter() - query_start) * 1000)
+                i += n_readers
+
+        threads = [threading.Thread(target=reader, args=(seed,)) for seed in range(n_readers)]
+        for thread in threads:
+            thread.start()
+        start = time.perf_counter()
+        for i in range(start_row, start_row + n_rows, call_size):
+            write(i, i + call_size)
+            if rate is not None:  # Pace the writes: sleep until this call's scheduled time
+                time.sleep(max(start + (i + call_size - start_row) / rate - time.perf_counter(), 0))
+        finish()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return n_rows / elapsed, latencies
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MmapVectorStore(os.path.join(tmp, "mmap"), dim)
+        store.append(vectors[:preload])
+        store.compact()
+        lock = threading.Lock()  # Append remaps the files, so queries wait for it
+
+        def append(start, end):
+            with lock:
+                store.append(vectors[start:end], sync=True)
+
+        def locked_search(query, k):
+            with lock:
+                return store.search(query, k)
+
+        writer = BulkVectorWriter(os.path.join(tmp, "bulk"), dim, batch_size=batch_size)
+        writer.upsert(ids[:preload], vectors[:preload])
+        writer.flush()
+        stores = {
+            "mmap store, append per call": (append, locked_search, lambda: None),
+            "bulk writer, background build": (
+                lambda start, end: writer.upsert(ids[start:end], vectors[start:end]), writer.search, writer.flush),
+        }
+
+        n_throttled = int(throttled_rate * throttled_seconds)
+        print(f"\n{'Store':<30} {'Max vectors/s':>14} {'p99 ms':>8} | at {throttled_rate:,}/s: "
+              f"{'Queries':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, (write, search, finish) in stores.items():
+            rate, latencies = run(write, search, finish, preload, n)
+            _, paced = run(write, search, finish, preload + n, n_throttled, rate=throttled_rate)
+            p99 = np.percentile(latencies, 99)
+            paced_p50, paced_p99 = np.percentile(paced, [50, 99])
+            print(f"{name:<30} {rate:>14,.0f} {p99:>8.1f} | {'':>{len(f'at {throttled_rate:,}/s: ')}}"
+                  f"{len(paced):>8,} {paced_p50:>8.1f} {paced_p99:>8.1f}")
+        print(f"\nBulk writer: {writer.stats['batches']} batches, {writer.stats['merges']} merges, "
+              f"{len(writer.segments)} segments at the end")
+        writer.close()
+
+
+def benchmark_lsm_store(n: int = 200_000, dim: int = 64, call_size: int = 1000, memtable_size: int = 20_000,
+                        delete_fraction: float = 0.1, k: int = 10):
+    """LSM store: durable ingest and deletes under query load, snapshot cost for writers, crash recovery time."""
+    print("=== Benchmark: LSM vector store ===")
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    ids = [f"doc{i}" for i in range(n)]
+    queries = rng.standard_normal((256, dim)).astype(np.float32)
+    print(f"{n:,} vectors (dim {dim}), half preloaded; {call_size} per put() call with WAL fsync, "
+          f"memtable {memtable_size:,}, one thread querying (k={k}) throughout\n")
+
+    def with_queries(store, work):
+        stop = threading.Event()
+        latencies = []
+
+        def reader():
+            i = 0
+            while not stop.is_set():
+                start = time.perf_counter()
+                store.search(queries[i % len(queries)][None], k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                i += 1
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        start = time.perf_counter()
+        work()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        thread.join()
+        return elapsed, latencies
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = LSMVectorStore(os.path.join(tmp, "store"), dim, memtable_size=memtable_size)
+        store.put(ids[:n // 2], vectors[:n // 2])
+        store.flush()
+
+        def ingest():
+            for i in range(n // 2, n, call_size):
+                store.put(ids[i:i + call_size], vectors[i:i + call_size])
+
+        deleted = rng.choice(n, int(n * delete_fraction), replace=False)
+
+        def delete():
+            for i in range(0, len(deleted), call_size // 10):
+                store.delete([ids[j] for j in deleted[i:i + call_size // 10]])
+            store.flush()
+
+        print(f"{'Phase':<22} {'Ops/s':>10} {'Queries':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for name, work, count in (("put", ingest, n - n // 2), (f"delete {delete_fraction:.0%}", delete, len(deleted))):
+            elapsed, latencies = with_queries(store, work)
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{name:<22} {count / elapsed:>10,.0f} {len(latencies):>8,} {p50:>8.1f} {p99:>8.1f}")
+        print(f"{len(store):,} live vectors in {len(store.segments)} segments; stats {store.stats}")
+
+        put_ms = []
+
+        def snapshot_during_writes():
+            stop = threading.Event()
+
+            def writer():
+                i = 0
+                while not stop.is_set():
+                    start = time.perf_counter()
+                    store.put(ids[i:i + 100], vectors[i:i + 100])
+                    put_ms.append((time.perf_counter() - start) * 1000)
+                    i = (i + 100) % n
+
+            thread = threading.Thread(target=writer)
+            thread.start()
+            time.sleep(0.2)
+            start = time.perf_counter()
+            store.snapshot(os.path.join(tmp, "snapshot"))
+            elapsed = time.perf_counter() - start
+            time.sleep(0.2)
+            stop.set()
+            thread.join()
+            return elapsed
+
+        elapsed = snapshot_during_writes()
+        print(f"\nSnapshot while writing: {elapsed * 1000:.0f} ms; concurrent put() of 100: "
+              f"p50 {np.percentile(put_ms, 50):.1f} ms, max {max(put_ms):.1f} ms")
+
+        # Crash: copy the directory with a full memtable in the WAL, as a kill would leave it
+        store.flush()
+        store.put(ids[:memtable_size - 1], vectors[:memtable_size - 1])  # Fits: no flush runs during the copy
+        shutil.copytree(os.path.join(tmp, "store"), os.path.join(tmp, "crashed"))
+        store.close()
+        start = time.perf_counter()
+        recovered = LSMVectorStore(os.path.join(tmp, "crashed"), dim, memtable_size=memtable_size)
+        elapsed = time.perf_counter() - start
+        print(f"Recovery: {elapsed * 1000:.0f} ms to open, {recovered.stats['recovered_records']:,} WAL records "
+              f"replayed, {len(recovered):,} live vectors")
+        recovered.close()
+
+
+BENCHMARKS = {
+    "vector_index": benchmark_vector_index,
+    "ivf_index": benchmark_ivf_index,
+    "hnsw_index": benchmark_hnsw_index,
+    "pq": benchmark_pq,
+    "mmap_store": benchmark_mmap_store,
+    "hybrid": benchmark_hybrid,
+    "similarity": benchmark_similarity,
+    "ingestion": benchmark_ingestion,
+    "parallel_chunking": benchmark_parallel_chunking,
+    "token_chunker": benchmark_token_chunker,
+    "recursive_chunker": benchmark_recursive_chunker,
+    "incremental_index": benchmark_incremental_index,
+    "tiered_cache": benchmark_tiered_cache,
+    "tenant_index": benchmark_tenant_index,
+    "permission_filter": benchmark_permission_filter,
+    "query_planner": benchmark_query_planner,
+    "tracing": benchmark_tracing,
+    "resilience": benchmark_resilience,
+    "context_packer": benchmark_context_packer,
+    "bulk_writer": benchmark_bulk_writer,
+    "lsm_store": benchmark_lsm_store,
+}
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
+        print()
@@ -0,0 +1,395 @@
+"""
+Bulk Vector Writer
+Upserts buffered into large columnar batches, each written to disk as one
+immutable segment with a single sequential write; a background thread builds
+and merges segments and swaps them in atomically, so readers never block.
+"""
+
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from similarity import UnitVectors, many_to_many, normalize
+from vector_index import top_k
+
+_HEADER_BYTES = 4096  # Header padded to a page so the vector block is page-aligned
+
+
+class Segment:
+    """
+    One immutable batch on disk:
+
+        [JSON header, padded to 4 KB][float32 unit vectors, n x dim][JSON ids + metadatas + tombstones]
+
+    written with one write call and memory-mapped on open. Rows superseded by a
+    later upsert are hidden by `live`; the file is never modified, with_live()
+    returns a copy sharing the same vectors (hide() flips rows in place instead).
+    `tombstones` lists ids deleted as of this segment (used by lsm_store.py).
+    """
+
+    def __init__(self, path: str, ids: np.ndarray, vectors: np.ndarray,
+                 metadatas: List[Optional[Dict[str, object]]], live: Optional[np.ndarray] = None,
+                 tombstones: Sequence[str] = ()):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.ids = ids
+        self.vectors = vectors
+        self.metadatas = metadatas
+        self.live = np.ones(len(ids), dtype=bool) if live is None else live
+        self.n_live = int(self.live.sum())
+        self.tombstones = list(tombstones)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def write(cls, path: str, ids: np.ndarray, vectors: np.ndarray,
+              metadatas: List[Optional[Dict[str, object]]], sync: bool = True,
+              tombstones: Sequence[str] = ()) -> "Segment":
+        """Write unit vectors + ids + metadatas as one file (via a temp file and rename), then map it."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        payload = json.dumps({"ids": ids.tolist(), "metadatas": metadatas, "tombstones": list(tombstones)}).encode()
+        header = json.dumps({"n": len(ids), "dim": vectors.shape[1], "payload_bytes": len(payload)}).encode()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join([header.ljust(_HEADER_BYTES), vectors.tobytes(), payload]))
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path: str) -> "Segment":
+        with open(path, "rb") as f:
+            header = json.loads(f.read(_HEADER_BYTES))
+            n, dim = header["n"], header["dim"]
+            f.seek(_HEADER_BYTES + n * dim * 4)
+            payload = json.loads(f.read(header["payload_bytes"]))
+        vectors = (
+            np.memmap(path, dtype=np.float32, mode="r", offset=_HEADER_BYTES, shape=(n, dim))
+            if n else np.empty((0, dim), dtype=np.float32)
+        )
+        return cls(path, np.array(payload["ids"], dtype=object), vectors, payload["metadatas"],
+                   tombstones=payload.get("tombstones", ()))
+
+    def with_live(self, live: np.ndarray) -> "Segment":
+        return Segment(self.path, self.ids, self.vectors, self.metadatas, live, self.tombstones)
+
+    def hide(self, rows: Sequence[int]):
+        """Mark rows dead in place (n_live drops first, so a concurrent search always applies the mask)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        self.n_live -= int(np.count_nonzero(self.live[rows]))
+        self.live[rows] = False
+
+    def search(self, queries: UnitVectors, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(scores, row numbers) of the top-k live rows, -inf / -1 where fewer are live."""
+        scores = many_to_many(queries, UnitVectors(self.vectors, assume_normalized=True))
+        if self.n_live < len(self):
+            scores[:, ~self.live] = -np.inf
+        return top_k(scores, k)
+
+
+def search_segments(segments: Sequence[Segment], queries: np.ndarray, k: int):
+    """
+    Exact top-k over several segments: per-segment top-k, merged.
+    Returns (scores, ids, metadatas); ids is an object array of the string ids
+    (None where fewer than k rows are live).
+    """
+    queries = UnitVectors(normalize(queries), assume_normalized=True)
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_refs = np.empty((len(queries), 0, 2), dtype=np.int64)  # (segment number, row)
+    for number, segment in enumerate(segments):
+        if not segment.n_live:
+            continue
+        scores, rows = segment.search(queries, k)
+        refs = np.stack([np.full_like(rows, number), rows], axis=-1)
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_refs = np.concatenate([best_refs, refs], axis=1)
+        best_scores, order = top_k(merged_scores, k)
+        best_refs = np.take_along_axis(merged_refs, order[..., None], axis=1)
+    ids = np.full(best_scores.shape, None, dtype=object)
+    metadatas = [[None] * best_scores.shape[1] for _ in range(len(queries))]
+    for q, i in zip(*np.nonzero(np.isfinite(best_scores))):
+        segment, row = segments[best_refs[q, i, 0]], best_refs[q, i, 1]
+        ids[q, i], metadatas[q][i] = segment.ids[row], segment.metadatas[row]
+    return best_scores, ids, metadatas
+
+
+class BulkVectorWriter:
+    """
+    Local vector store for loading millions of vectors while serving queries.
+
+    - upsert() only appends the arrays to an in-memory buffer; every
+      `batch_size` rows the buffer is concatenated into one columnar batch
+      (ids, vectors, metadatas) and queued for the builder thread. At most
+      `max_pending_batches` wait in the queue, then upsert() blocks
+      (backpressure instead of unbounded memory).
+    - The builder thread normalizes a batch, writes it as one Segment file,
+      hides older versions of re-upserted ids, and publishes the new segment
+      list with a single reference assignment. search() reads whatever list
+      is current: no locks, no waiting on writes.
+    - When there are more than `max_segments`, the builder merges the
+      `merge_factor` smallest into one (dropping superseded rows) in the
+      background and swaps the merged segment in the same way.
+    - manifest.json (rewritten atomically on every publish) lists the
+      segments; reopening the directory restores the store.
+
+    Upserts become searchable once their batch is published; flush() hands
+    off a partial batch and waits for the builder to catch up. Batches are
+    queued in the order they were cut from the buffer, also across writer
+    threads, so the later upsert of an id always wins.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(
+        self,
+        directory: str,
+        dim: int,
+        batch_size: int = 50_000,
+        max_pending_batches: int = 2,
+        max_segments: int = 8,
+        merge_factor: int = 4,
+        sync: bool = True
+    ):
+        self.directory = directory
+        self.dim = dim
+        self.batch_size = batch_size
+        self.max_segments = max_segments
+        self.merge_factor = merge_factor
+        self.sync = sync
+        self.stats = {"batches": 0, "merges": 0, "rows_written": 0, "rows_merged": 0}
+        os.makedirs(directory, exist_ok=True)
+
+        self._buffer: List[Tuple[np.ndarray, np.ndarray, List]] = []
+        self._buffered = 0
+        self._buffer_lock = threading.Lock()
+        self._queue_lock = threading.Lock()  # Taken before the buffer lock is released: batches queue in take order
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_pending_batches)
+        self._error: Optional[BaseException] = None
+        self._locations: Dict[str, Tuple[str, int]] = {}  # id -> (segment name, row); builder thread only
+        self._next_segment = 0
+        self.segments: Tuple[Segment, ...] = ()
+        self._load()
+
+        self._builder = threading.Thread(target=self._build_loop, name="segment-builder", daemon=True)
+        self._builder.start()
+
+    def __len__(self) -> int:
+        """Live vectors in published segments (excludes the buffer and queued batches)."""
+        return sum(segment.n_live for segment in self.segments)
+
+    # -- writes (caller thread) --------------------------------------------
+
+    def upsert(self, ids: Sequence[str], embeddings: np.ndarray,
+               metadatas: Optional[Sequence[Dict[str, object]]] = None):
+        """Buffer rows; a later upsert of the same id replaces the earlier one."""
+        self._raise_builder_error()
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected embeddings of shape (n, {self.dim}), got {embeddings.shape}")
+        if len(ids) != len(embeddings) or (metadatas is not None and len(metadatas) != len(ids)):
+            raise ValueError("ids, embeddings and metadatas must have the same length")
+        batch = None
+        with self._buffer_lock:
+            self._buffer.append((np.asarray(ids, dtype=object), embeddings,
+                                 list(metadatas) if metadatas is not None else [None] * len(ids)))
+            self._buffered += len(ids)
+            if self._buffered >= self.batch_size:
+                batch = self._take_buffer()
+                self._queue_lock.acquire()
+        if batch is not None:
+            self._enqueue(batch)
+
+    def _take_buffer(self):
+        parts, self._buffer, self._buffered = self._buffer, [], 0
+        return (
+            np.concatenate([ids for ids, _, _ in parts]),
+            np.concatenate([vectors for _, vectors, _ in parts]),
+            [metadata for _, _, metadatas in parts for metadata in metadatas],
+        )
+
+    def _enqueue(self, batch):
+        """Queue a batch (caller holds _queue_lock); blocks while max_pending_batches are queued."""
+        try:
+            self._queue.put(batch)
+        finally:
+            self._queue_lock.release()
+
+    def flush(self):
+        """Queue the partial batch and wait until everything upserted so far is searchable."""
+        with self._buffer_lock:
+            batch = self._take_buffer() if self._buffered else None
+            if batch is not None:
+                self._queue_lock.acquire()
+        if batch is not None:
+            self._enqueue(batch)
+        self._queue.join()
+        self._raise_builder_error()
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._builder.join()
+
+    def _raise_builder_error(self):
+        if self._error is not None:
+            raise RuntimeError("segment builder failed") from self._error
+
+    # -- reads (any thread) ------------------------------------------------
+
+    def search(self, queries: np.ndarray, k: int = 10):
+        """(scores, ids, metadatas) of the exact top-k over the published segments."""
+        return search_segments(self.segments, queries, k)  # One read of self.segments: a consistent view
+
+    # -- builder thread ------------------------------------------------------
+
+    def _build_loop(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                if batch is None:
+                    return
+                if self._error is None:
+                    self._publish_batch(*batch)
+                    while len(self.segments) > self.max_segments:
+                        self._merge_smallest()
+            except BaseException as error:  # Surfaced to writers on their next call
+                self._error = error
+            finally:
+                self._queue.task_done()
+
+    def _new_segment_path(self) -> str:
+        self._next_segment += 1
+        return os.path.join(self.directory, f"segment-{self._next_segment:08d}.seg")
+
+    def _publish_batch(self, ids: np.ndarray, vectors: np.ndarray, metadatas: List):
+        # Within a batch the last upsert of an id wins
+        _, last = np.unique(ids[::-1].astype(str), return_index=True)
+        keep = np.sort(len(ids) - 1 - last)
+        if len(keep) < len(ids):
+            ids, vectors, metadatas = ids[keep], vectors[keep], [metadatas[i] for i in keep]
+        segment = Segment.write(self._new_segment_path(), ids, normalize(vectors), metadatas, self.sync)
+        self._swap(self.segments + (segment,), added=segment)
+        self.stats["batches"] += 1
+        self.stats["rows_written"] += len(segment)
+
+    def _merge_smallest(self):
+        chosen = set(sorted(self.segments, key=lambda segment: segment.n_live)[:self.merge_factor])
+        # Merged rows keep their relative order (older segments first)
+        parts = [segment for segment in self.segments if segment in chosen]
+        ids = np.concatenate([segment.ids[segment.live] for segment in parts])
+        vectors = np.concatenate([np.asarray(segment.vectors)[segment.live] for segment in parts])
+        metadatas = [segment.metadatas[row] for segment in parts for row in np.flatnonzero(segment.live)]
+        merged = Segment.write(self._new_segment_path(), ids, vectors, metadatas, self.sync)
+        # The merged segment takes the newest part's place: unmerged segments in between only
+        # hold dead versions of its ids, and must stay older than it when the store is reopened
+        position = self.segments.index(parts[-1]) - (len(parts) - 1)
+        remaining = [segment for segment in self.segments if segment not in chosen]
+        self._swap(tuple(remaining[:position] + [merged] + remaining[position:]), added=merged, removed=parts)
+        self.stats["merges"] += 1
+        self.stats["rows_merged"] += len(merged)
+
+    def _swap(self, segments: Tuple[Segment, ...], added: Segment, removed: Sequence[Segment] = ()):
+        """Hide superseded rows, persist the manifest, then publish with one assignment."""
+        by_name = {segment.name: segment for segment in segments}
+        if not removed:  # A new batch: earlier versions of its ids become dead rows
+            superseded: Dict[str, List[int]] = {}
+            for previous in map(self._locations.get, added.ids):
+                if previous is not None and previous[0] in by_name:
+                    superseded.setdefault(previous[0], []).append(previous[1])
+            for name, rows in superseded.items():
+                live = by_name[name].live.copy()
+                live[rows] = False
+                by_name[name] = by_name[name].with_live(live)
+            segments = tuple(by_name[segment.name] for segment in segments)
+        # A merge only moves live rows, which are the current versions already. Updated in
+        # slices: one dict.update over a whole merged segment would hold the GIL from readers.
+        for start in range(0, len(added), 8192):
+            rows = range(start, min(start + 8192, len(added)))
+            self._locations.update(zip(added.ids[start:rows.stop], zip([added.name] * len(rows), rows)))
+
+        manifest = {"dim": self.dim, "next_segment": self._next_segment,
+                    "segments": [segment.name for segment in segments]}
+        tmp_path = os.path.join(self.directory, self.MANIFEST + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, os.path.join(self.directory, self.MANIFEST))
+
+        self.segments = segments  # Atomic swap: readers see the old or the new list, never a mix
+        for segment in removed:
+            os.remove(segment.path)  # Readers still holding the old list keep their mapping
+
+    def _load(self):
+        path = os.path.join(self.directory, self.MANIFEST)
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest["dim"] != self.dim:
+            raise ValueError(f"Store has dimension {manifest['dim']}, expected {self.dim}")
+        self._next_segment = manifest["next_segment"]
+        segments = [Segment.open(os.path.join(self.directory, name)) for name in manifest["segments"]]
+        # Newest segment first: the first time an id is seen is its live version
+        seen: Dict[str, Tuple[str, int]] = {}
+        for number in range(len(segments) - 1, -1, -1):
+            segment = segments[number]
+            live = np.ones(len(segment), dtype=bool)
+            for row, id_ in enumerate(segment.ids):
+                if id_ in seen:
+                    live[row] = False
+                else:
+                    seen[id_] = (segment.name, row)
+            segments[number] = segment.with_live(live)
+        self._locations = seen
+        self.segments = tuple(segments)
+        listed = set(manifest["segments"]) | {self.MANIFEST}
+        for name in os.listdir(self.directory):  # Unpublished leftovers of a crash
+            if name not in listed and (name.endswith(".seg") or name.endswith(".tmp")):
+                os.remove(os.path.join(self.directory, name))
+
+
+def demonstrate_bulk_writer():
+    """Bulk load while querying, re-upsert some ids, then reopen the directory."""
+    print("=== Bulk Vector Writer ===")
+
+    rng = np.random.default_rng(0)
+    dim, n = 64, 200_000
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = BulkVectorWriter(tmp, dim, batch_size=20_000, max_segments=4)
+        start = time.perf_counter()
+        for i in range(0, n, 1000):  # Small upsert calls, as a loader would make them
+            writer.upsert([f"doc{j}" for j in range(i, i + 1000)], vectors[i:i + 1000],
+                          [{"batch": i // 1000}] * 1000)
+            if i % 50_000 == 0:
+                print(f"  after {i:>7,} upserts: {len(writer):>7,} searchable in {len(writer.segments)} segments")
+        writer.flush()
+        elapsed = time.perf_counter() - start
+        print(f"Loaded {n:,} vectors in {elapsed:.2f} s ({n / elapsed:,.0f} vectors/s), "
+              f"{len(writer.segments)} segments, stats {writer.stats}")
+
+        writer.upsert(["doc7"], -vectors[7:8], [{"batch": "updated"}])
+        writer.flush()
+        _, ids, metadatas = writer.search(vectors[7:8], k=1)
+        _, negated_ids, negated_metadatas = writer.search(-vectors[7:8], k=1)
+        print(f"After re-upserting doc7 with the negated vector: {len(writer):,} live; "
+              f"nearest to the old vector is {ids[0, 0]}, nearest to the new one is "
+              f"{negated_ids[0, 0]} {negated_metadatas[0][0]}")
+        writer.close()
+
+        reopened = BulkVectorWriter(tmp, dim)
+        _, ids, _ = reopened.search(vectors[123:124], k=1)
+        print(f"Reopened: {len(reopened):,} live vectors, nearest to doc123 is {ids[0, 0]}")
+        reopened.close()
+
+
+if __name__ == "__main__":
+    demonstrate_bulk_writer()
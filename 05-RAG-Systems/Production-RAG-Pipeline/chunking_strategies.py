@@ -3,6 +3,38 @@ Chunking Strategies for RAG
 Different approaches to splitting documents for retrieval.
 """
 
+import re
+from typing import Iterator, Tuple
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def iter_fixed_size_chunks(
+    text: str,
+    chunk_size: int = 500,
+    chunk_overlap: int = 50
+) -> Iterator[Tuple[int, str]]:
+    """Lazily yield (character offset, chunk) pairs; nothing is collected in memory."""
+    if not 0 <= chunk_overlap < chunk_size:
+        raise ValueError("chunk_overlap must be in [0, chunk_size)")
+    for start in range(0, len(text), chunk_size - chunk_overlap):
+        yield start, text[start:start + chunk_size]
+        if start + chunk_size >= len(text):
+            return
+
+
+def iter_sentence_chunks(text: str, max_sentences: int = 5) -> Iterator[Tuple[int, str]]:
+    """Lazily yield (character offset, chunk) pairs of up to max_sentences sentences."""
+    count = 0
+    chunk_start = 0
+    for match in _SENTENCE_END.finditer(text):
+        count += 1
+        if count == max_sentences:
+            yield chunk_start, text[chunk_start:match.start()]
+            chunk_start, count = match.end(), 0
+    if text[chunk_start:].strip():
+        yield chunk_start, text[chunk_start:].rstrip()
+
 
 def fixed_size_chunking():
     """Fixed-size chunking with optional overlap."""
@@ -18,13 +50,7 @@ def fixed_size_chunking():
     chunk_size = 50  # characters
     chunk_overlap = 10  # characters
     
-    chunks = []
-    start = 0
-    while start < len(document):
-        end = start + chunk_size
-        chunk = document[start:end]
-        chunks.append(chunk.strip())
-        start = end - chunk_overlap  # Overlap
+    chunks = [chunk.strip() for _, chunk in iter_fixed_size_chunks(document, chunk_size, chunk_overlap)]
     
     print(f"Document length: {len(document)} characters")
     print(f"Chunk size: {chunk_size} characters")
@@ -84,6 +110,7 @@ def semantic_chunking():
     print("\nPros: Preserves semantic coherence")
     print("Cons: More complex, requires embedding model")
     print("Use case: Documents with varying topics")
+    print("Implementation: semantic_chunker.py (percentile breakpoints, cached sentence embeddings)")
 
 
 def recursive_chunking():
@@ -95,6 +122,7 @@ def recursive_chunking():
     print("2. If chunks too large, split by sentences")
     print("3. If still too large, split by words")
     print("4. Ensures chunks fit within size limits")
+    print("Implementation: recursive_chunker.py (linear time, index spans, character or token lengths)")
     
     print("\nPros: Adapts to document structure")
     print("Cons: More complex implementation")
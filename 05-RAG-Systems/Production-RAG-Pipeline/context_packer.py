@@ -0,0 +1,248 @@
+"""
+Context Packer
+Fits ranked chunks into the model's context window: the system prompt, the
+question and max_tokens are reserved first, near-duplicates are dropped, and
+the chunk that no longer fits whole is trimmed at a sentence boundary.
+"""
+
+import re
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import tiktoken
+
+# Same sizes as context_window() in 04-LLM-Generative-AI/LLM-Fundamentals/tokenization.py
+CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 4096,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "claude-3": 200000,
+}
+
+# Split before the whitespace that follows . ! or ?, so every sentence after
+# the first starts with its space: " The", exactly how tiktoken pre-splits words.
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])(?=\s)")
+
+Chunk = Dict[str, object]  # {"text", optional "n_tokens", optional "embedding", ...}
+
+
+class ContextPacker:
+    """
+    pack(chunks, query) walks the chunks in rank order and keeps each one that
+    is not a near-duplicate of a kept chunk and fits the remaining budget:
+
+        budget = context_window - system prompt - query - max_tokens - reserve
+
+    The first chunk that does not fit whole is cut to its longest sentence
+    prefix that does (if that leaves at least `min_trim_tokens`); smaller
+    chunks further down the ranking can still fill the rest.
+
+    Nothing is encoded twice: a chunk's "n_tokens" (as produced by
+    TokenChunker) is used when present, other counts are encoded in one batch
+    and cached per text, and per-sentence counts are computed only for a chunk
+    being trimmed. Near-duplicates are detected by cosine similarity when
+    chunks carry an "embedding", otherwise by Jaccard similarity of word
+    3-gram shingles. `reserve` covers chat-format tokens and the one token per
+    chunk boundary where separately counted pieces can merge.
+    """
+
+    def __init__(
+        self,
+        model: str = "gpt-3.5-turbo",
+        context_window: Optional[int] = None,
+        max_tokens: int = 512,
+        system_prompt: str = "",
+        separator: str = "\n\n",
+        duplicate_threshold: float = 0.8,
+        min_trim_tokens: int = 32,
+        reserve: int = 16,
+        encoding: Optional[tiktoken.Encoding] = None,
+        cache_size: int = 50_000
+    ):
+        if context_window is None:
+            if model.lower() not in CONTEXT_WINDOWS:
+                raise ValueError(f"Unknown context window for {model!r}; pass context_window")
+            context_window = CONTEXT_WINDOWS[model.lower()]
+        if encoding is None:
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:  # Not an OpenAI model: cl100k_base is a close enough count
+                encoding = tiktoken.get_encoding("cl100k_base")
+        self.encoding = encoding
+        self.context_window = context_window
+        self.max_tokens = max_tokens
+        self.system_prompt = system_prompt
+        self.separator = separator
+        self.duplicate_threshold = duplicate_threshold
+        self.min_trim_tokens = min_trim_tokens
+        self.reserve = reserve
+        self.cache_size = cache_size
+        self._system_tokens = self.count(system_prompt)
+        self._separator_tokens = self.count(separator) + 1
+        self._cache: "OrderedDict[str, Dict[str, object]]" = OrderedDict()
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+    def budget(self, query: str = "") -> int:
+        """Tokens left for context after the system prompt, query, answer and reserve."""
+        return self.context_window - self._system_tokens - self.count(query) - self.max_tokens - self.reserve
+
+    def _entry(self, text: str) -> Dict[str, object]:
+        entry = self._cache.get(text)
+        if entry is None:
+            entry = self._cache[text] = {}
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(text)
+        return entry
+
+    def _token_counts(self, chunks: Sequence[Chunk]) -> List[int]:
+        entries = [self._entry(chunk["text"]) for chunk in chunks]
+        for chunk, entry in zip(chunks, entries):
+            if "n_tokens" in chunk and "n_tokens" not in entry:
+                entry["n_tokens"] = int(chunk["n_tokens"])
+        missing = [i for i, entry in enumerate(entries) if "n_tokens" not in entry]
+        if missing:
+            encoded = self.encoding.encode_ordinary_batch([chunks[i]["text"] for i in missing])
+            for i, tokens in zip(missing, encoded):
+                entries[i]["n_tokens"] = len(tokens)
+        return [entry["n_tokens"] for entry in entries]
+
+    def _shingles(self, text: str) -> frozenset:
+        entry = self._entry(text)
+        if "shingles" not in entry:
+            words = text.lower().split()
+            entry["shingles"] = frozenset(hash(tuple(words[i:i + 3])) for i in range(max(len(words) - 2, 1)))
+        return entry["shingles"]
+
+    def _sentences(self, text: str):
+        """(sentences, token count of each), cached per text."""
+        entry = self._entry(text)
+        if "sentences" not in entry:
+            sentences = _SENTENCE_BOUNDARY.split(text)
+            entry["sentences"] = sentences
+            entry["sentence_tokens"] = [len(t) for t in self.encoding.encode_ordinary_batch(sentences)]
+        return entry["sentences"], entry["sentence_tokens"]
+
+    def _trim(self, text: str, room: int) -> Optional[tuple]:
+        """Longest sentence prefix of `text` within `room` tokens, as (text, n_tokens)."""
+        sentences, counts = self._sentences(text)
+        prefix_tokens = np.cumsum(counts)
+        n_sentences = int(np.searchsorted(prefix_tokens, room, side="right"))
+        if n_sentences == 0 or prefix_tokens[n_sentences - 1] < self.min_trim_tokens:
+            return None
+        return "".join(sentences[:n_sentences]), int(prefix_tokens[n_sentences - 1])
+
+    def _is_duplicate(self, chunk: Chunk, kept_texts: List[str], kept_embeddings: List[np.ndarray]) -> bool:
+        embedding = chunk.get("embedding")
+        if embedding is not None and len(kept_embeddings) == len(kept_texts):
+            if not kept_embeddings:
+                return False
+            embedding = np.asarray(embedding, dtype=np.float32)
+            similarities = np.stack(kept_embeddings) @ embedding / (np.linalg.norm(embedding) + 1e-12)
+            return bool(similarities.max() >= self.duplicate_threshold)
+        shingles = self._shingles(chunk["text"])
+        for text in kept_texts:
+            other_shingles = self._shingles(text)
+            overlap = len(shingles & other_shingles)
+            if overlap and overlap / (len(shingles) + len(other_shingles) - overlap) >= self.duplicate_threshold:
+                return True
+        return False
+
+    def pack(self, chunks: Sequence[Chunk], query: str = "") -> Dict[str, object]:
+        """
+        Select from `chunks` (best first). Returns {"context", "chunks", "n_tokens",
+        "budget", "dropped"}; kept chunks are copies with "n_tokens" and "trimmed" set.
+        """
+        budget = self.budget(query)
+        if budget <= 0:
+            raise ValueError(f"No room for context: budget is {budget} tokens")
+        counts = self._token_counts(chunks)
+        kept: List[Chunk] = []
+        kept_texts: List[str] = []  # Untrimmed, for duplicate checks
+        kept_embeddings: List[np.ndarray] = []
+        used = 0
+        dropped = {"duplicate": 0, "no_room": 0}
+        may_trim = True
+        for chunk, n_tokens in zip(chunks, counts):
+            room = budget - used - self._separator_tokens
+            if n_tokens > room and not (may_trim and room >= self.min_trim_tokens):
+                dropped["no_room"] += 1
+                continue
+            if self._is_duplicate(chunk, kept_texts, kept_embeddings):
+                dropped["duplicate"] += 1
+                continue
+            text, trimmed = chunk["text"], False
+            if n_tokens > room:
+                may_trim = False
+                cut = self._trim(text, room)
+                if cut is None:
+                    dropped["no_room"] += 1
+                    continue
+                (text, n_tokens), trimmed = cut, True
+            kept.append({**chunk, "text": text, "n_tokens": n_tokens, "trimmed": trimmed})
+            kept_texts.append(chunk["text"])
+            if chunk.get("embedding") is not None:
+                embedding = np.asarray(chunk["embedding"], dtype=np.float32)
+                kept_embeddings.append(embedding / (np.linalg.norm(embedding) + 1e-12))
+            used += n_tokens + self._separator_tokens
+        return {
+            "context": self.separator.join(chunk["text"] for chunk in kept),
+            "chunks": kept,
+            "n_tokens": used,
+            "budget": budget,
+            "dropped": dropped,
+        }
+
+
+def shrink_until_fits(encoding, chunks: Sequence[Chunk], system_prompt: str, query: str,
+                      context_window: int, max_tokens: int, separator: str = "\n\n") -> List[Chunk]:
+    """Baseline ("reduce chunk count"): re-encode the whole prompt, drop the last chunk, repeat."""
+    chunks = list(chunks)
+    while chunks:
+        prompt = system_prompt + separator.join(chunk["text"] for chunk in chunks) + query
+        if len(encoding.encode_ordinary(prompt)) + max_tokens <= context_window:
+            break
+        chunks.pop()
+    return chunks
+
+
+def demonstrate_context_packer():
+    """Pack ranked chunks (with a near-duplicate and a long chunk) into a small window."""
+    print("=== Context Packer ===")
+
+    try:
+        packer = ContextPacker(context_window=700, max_tokens=256,
+                               system_prompt="Answer using only the context below. Cite sources.")
+    except Exception as e:
+        print("Note: needs the tiktoken encoding files (install with: pip install tiktoken)")
+        print(f"Error: {e}")
+        return
+
+    refund = ("Refunds are processed within five business days after the item arrives at our warehouse. "
+              "The amount is returned to the original payment method. ")
+    chunks = [
+        {"source": "policy.md", "text": refund + "Store credit is issued immediately on request."},
+        {"source": "policy_v2.md", "text": refund + "Store credit is issued immediately upon request."},
+        {"source": "terms.md", "text": " ".join(f"Clause {i}: returns must include the original receipt." for i in range(30))},
+        {"source": "faq.md", "text": "Shipping is free for orders over fifty euros."},
+        {"source": "contact.md", "text": "Support is reachable by email around the clock."},
+    ]
+    query = "How long do refunds take?"
+    packed = packer.pack(chunks, query)
+    print(f"Window {packer.context_window}, max_tokens {packer.max_tokens}: "
+          f"{packed['budget']} tokens left for context")
+    for chunk in packed["chunks"]:
+        print(f"  {chunk['source']:<13} {chunk['n_tokens']:>4} tokens{'  (trimmed at a sentence)' if chunk['trimmed'] else ''}")
+    print(f"Dropped: {packed['dropped']}")
+
+    prompt_tokens = packer.count(packer.system_prompt) + packer.count(packed["context"]) + packer.count(query)
+    print(f"Encoded prompt: {prompt_tokens} tokens + {packer.max_tokens} for the answer "
+          f"<= {packer.context_window}: {prompt_tokens + packer.max_tokens <= packer.context_window}")
+
+
+if __name__ == "__main__":
+    demonstrate_context_packer()
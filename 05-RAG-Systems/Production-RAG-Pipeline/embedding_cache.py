@@ -0,0 +1,209 @@
+"""
+Embedding Cache
+Content-addressed embedding cache: an in-process LRU in front of a SQLite file
+of float32 blobs, keyed by (model name, text hash), with batch lookups.
+"""
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from local_embedder import HashingEmbedder
+
+EmbedFn = Callable[[Sequence[str]], np.ndarray]
+
+
+class EmbeddingCache:
+    """
+    Two layers:
+    - memory: LRU of the `memory_items` most recently used vectors
+    - disk:   SQLite table of float32 blobs, survives restarts and is shared by
+              every process that opens the same file; trimmed to `max_items`
+              by least recent use
+
+    get_many/put_many cover a whole batch with one query per SQL_BATCH keys.
+    Returned vectors are read-only views; copy before modifying.
+    Counters in `stats`: memory_hits, disk_hits, misses, evictions (memory),
+    disk_evictions.
+    """
+
+    SQL_BATCH = 500  # Keys per "IN (...)" query, below SQLite's parameter limit
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        model_name: str = "default",
+        memory_items: int = 10_000,
+        max_items: Optional[int] = None
+    ):
+        self.path = path
+        self.model_name = model_name
+        self.memory_items = memory_items
+        self.max_items = max_items
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+        self._memory: "OrderedDict[Tuple[str, bytes], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, key BLOB NOT NULL, vector BLOB NOT NULL, last_used INTEGER NOT NULL,"
+            " PRIMARY KEY (model, key)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._db.commit()
+        # Logical clock for least-recent-use order (no ties within a batch, unlike wall time)
+        self._clock = self._db.execute("SELECT COALESCE(MAX(last_used), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def text_hash(text: str) -> bytes:
+        return hashlib.sha1(text.encode()).digest()
+
+    def __len__(self) -> int:
+        """Vectors stored on disk (all models)."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def hit_rate(self) -> float:
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def _remember(self, key: Tuple[str, bytes], vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_many(self, texts: Sequence[str], model: Optional[str] = None) -> List[Optional[np.ndarray]]:
+        """Cached vector for each text, or None; one pass over memory, batched SQL for the rest."""
+        model = model or self.model_name
+        keys = [(model, self.text_hash(text)) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            on_disk: Dict[bytes, List[int]] = {}
+            for position, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is None:
+                    on_disk.setdefault(key[1], []).append(position)
+                else:
+                    self._memory.move_to_end(key)
+                    results[position] = vector
+                    self.stats["memory_hits"] += 1
+
+            found = []
+            hashes = list(on_disk)
+            for start in range(0, len(hashes), self.SQL_BATCH):
+                batch = hashes[start:start + self.SQL_BATCH]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({','.join('?' * len(batch))})",
+                    [model, *batch],
+                ).fetchall()
+                for text_key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._remember((model, text_key), vector)
+                    for position in on_disk[text_key]:
+                        results[position] = vector
+                    found.append(text_key)
+            disk_hits = sum(len(on_disk[text_key]) for text_key in found)
+            self.stats["disk_hits"] += disk_hits
+            self.stats["misses"] += sum(len(positions) for positions in on_disk.values()) - disk_hits
+            if found:
+                self._db.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                    [(self._tick(), model, text_key) for text_key in found],
+                )
+                self._db.commit()
+        return results
+
+    def put_many(self, texts: Sequence[str], embeddings, model: Optional[str] = None):
+        """Store a batch (one transaction), then trim the disk layer to max_items."""
+        if not len(texts):
+            return
+        model = model or self.model_name
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(texts), -1)
+        rows = []
+        with self._lock:
+            for text, vector in zip(texts, embeddings):
+                key = (model, self.text_hash(text))
+                vector = vector.copy()
+                vector.flags.writeable = False
+                self._remember(key, vector)
+                rows.append((model, key[1], vector.tobytes(), self._tick()))
+            self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            if self.max_items is not None:
+                excess = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_items
+                if excess > 0:
+                    self._db.execute(
+                        "DELETE FROM embeddings WHERE (model, key) IN "
+                        "(SELECT model, key FROM embeddings ORDER BY last_used LIMIT ?)",
+                        (excess,),
+                    )
+                    self.stats["disk_evictions"] += excess
+            self._db.commit()
+
+    def get(self, text: str, model: Optional[str] = None) -> Optional[np.ndarray]:
+        return self.get_many([text], model)[0]
+
+    def put(self, text: str, embedding, model: Optional[str] = None):
+        self.put_many([text], [embedding], model)
+
+    def embed(self, texts: Sequence[str], embed_fn: EmbedFn, model: Optional[str] = None) -> np.ndarray:
+        """Embeddings for texts; only cache misses (deduplicated) go to embed_fn, in one call."""
+        vectors = self.get_many(texts, model)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            computed = dict(zip(missing, np.asarray(embed_fn(missing), dtype=np.float32)))
+            self.put_many(missing, list(computed.values()), model)
+            vectors = [computed[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return np.stack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+
+    def wrap(self, embed_fn: EmbedFn, model: Optional[str] = None) -> EmbedFn:
+        """A drop-in embed_fn (for pipelines and retrievers) that goes through the cache."""
+        return lambda texts: self.embed(texts, embed_fn, model)
+
+    def close(self):
+        self._db.close()
+
+
+def demonstrate_embedding_cache():
+    """Second ingestion of the same corpus is served from the cache."""
+    print("=== Embedding Cache ===")
+
+    texts = [f"Chunk {i % 600}: refund policy and shipping details" for i in range(1000)]
+    embedder = HashingEmbedder(dim=128)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "embeddings.sqlite")
+        cache = EmbeddingCache(path, model_name=embedder.model_name, memory_items=1000)
+
+        embed = cache.wrap(embedder.embed)
+        for batch_start in range(0, len(texts), 100):
+            embed(texts[batch_start:batch_start + 100])
+        print(f"First ingest:  {embedder.texts_embedded} texts embedded, hit rate {cache.hit_rate():.0%}")
+        print(f"  stats: {cache.stats}")
+        cache.close()
+
+        # A new process opening the same file: memory is cold, disk is warm
+        reopened = EmbeddingCache(path, model_name=embedder.model_name, memory_items=1000)
+        vectors = reopened.embed(texts, embedder.embed)
+        print(f"After restart: {embedder.texts_embedded} texts embedded in total, "
+              f"hit rate {reopened.hit_rate():.0%}, {len(reopened)} vectors on disk")
+        print(f"  stats: {reopened.stats}")
+        print(f"  matches a fresh embedding: {np.allclose(vectors[5], embedder.embed([texts[5]])[0])}")
+        reopened.close()
+
+
+if __name__ == "__main__":
+    demonstrate_embedding_cache()
@@ -5,6 +5,12 @@ Understanding how embeddings enable semantic search.
 
 import numpy as np
 
+from hybrid_retriever import HybridRetriever
+from local_embedder import HashingEmbedder
+from reranker import OverlapCrossEncoder, Reranker
+from similarity import cosine_similarity
+from vector_index import VectorIndex
+
 
 def embedding_concept():
     """Understanding embeddings for RAG."""
@@ -27,10 +33,7 @@ def embedding_concept():
     print(f"Text 2: '{text2}'")
     print(f"Text 3: '{text3}'")
     
-    # Cosine similarity
-    def cosine_similarity(a, b):
-        return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
-    
+    # Cosine similarity (shared kernel: dot(a, b) / (|a| * |b|))
     sim_12 = cosine_similarity(embedding1, embedding2)
     sim_13 = cosine_similarity(embedding1, embedding3)
     
@@ -51,17 +54,17 @@ def embedding_model_selection():
     models = {
         "OpenAI text-embedding-ada-002": {
             "Dimensions": 1536,
-            "Context": 8191 tokens,
+            "Context": "8191 tokens",
             "Use case": "General purpose, good quality",
         },
         "sentence-transformers/all-MiniLM-L6-v2": {
             "Dimensions": 384,
-            "Context": 256 tokens,
+            "Context": "256 tokens",
             "Use case": "Fast, local, smaller embeddings",
         },
         "sentence-transformers/all-mpnet-base-v2": {
             "Dimensions": 768,
-            "Context": 384 tokens,
+            "Context": "384 tokens",
             "Use case": "Better quality, still local",
         },
     }
@@ -75,6 +78,7 @@ def embedding_model_selection():
     print("\nSelection criteria:")
     print("  - Quality vs speed trade-off")
     print("  - Embedding dimensions (affects storage)")
+    print("    e.g. 1536 dims x 4 bytes = 6 KB per chunk (see pq_codec.py to compress)")
     print("  - Context window size")
     print("  - Cost (API vs local)")
     print("  - Language support")
@@ -95,27 +99,28 @@ def vector_search():
     query_embedding = np.array([0.8, 0.6, 0.4, 0.2])
     
     # Document embeddings (stored in vector DB)
-    doc_embeddings = [
-        (np.array([0.7, 0.5, 0.5, 0.3]), "Python is a programming language..."),
-        (np.array([0.6, 0.4, 0.6, 0.2]), "Python syntax is simple..."),
-        (np.array([-0.2, -0.3, 0.1, 0.8]), "Cooking recipes are..."),
+    doc_embeddings = np.array([
+        [0.7, 0.5, 0.5, 0.3],
+        [0.6, 0.4, 0.6, 0.2],
+        [-0.2, -0.3, 0.1, 0.8],
+    ])
+    doc_texts = [
+        "Python is a programming language...",
+        "Python syntax is simple...",
+        "Cooking recipes are...",
     ]
     
-    # Calculate similarities
-    similarities = []
-    for i, (doc_emb, text) in enumerate(doc_embeddings):
-        sim = np.dot(query_embedding, doc_emb) / (
-            np.linalg.norm(query_embedding) * np.linalg.norm(doc_emb)
-        )
-        similarities.append((sim, text))
+    # Index once: one float32 matrix, norms precomputed at insert
+    index = VectorIndex(dim=doc_embeddings.shape[1])
+    index.add(doc_embeddings, texts=doc_texts)
     
-    # Sort by similarity
-    similarities.sort(reverse=True, key=lambda x: x[0])
+    # One matrix multiply + argpartition top-k (queries can be batched)
+    scores, ids = index.search(query_embedding, k=2)
     
     print("\nTop results (by similarity):")
-    for i, (sim, text) in enumerate(similarities[:2]):
+    for i, (sim, doc_id) in enumerate(zip(scores[0], ids[0])):
         print(f"  {i+1}. Similarity: {sim:.3f}")
-        print(f"     Text: {text[:50]}...")
+        print(f"     Text: {index.texts[doc_id][:50]}...")
 
 
 def hybrid_search():
@@ -143,6 +148,24 @@ def hybrid_search():
     print("  - BM25: Specific product names, codes, dates")
     print("  - Vector: Conceptual questions, synonyms")
     print("  - Hybrid: Production systems (best results)")
+    
+    # Working example (local hashing embedder stands in for a real model)
+    documents = [
+        "Invoice INV-2024-001 was paid on March 3",
+        "Python is a programming language...",
+        "Python syntax is simple...",
+        "Cooking recipes are...",
+    ]
+    embedder = HashingEmbedder(dim=64)
+    retriever = HybridRetriever(embedder.embed, dim=64, fusion="rrf")
+    retriever.add(documents)
+    
+    results, timings = retriever.search("INV-2024-001 python", k=3)
+    print("\nHybrid results for 'INV-2024-001 python' (reciprocal rank fusion):")
+    for i, (doc_id, score) in enumerate(results):
+        print(f"  {i+1}. RRF score: {score:.4f}  {documents[doc_id]}")
+    print(f"  Latency: keyword {timings['keyword']:.2f} ms, vector {timings['vector']:.2f} ms")
+    retriever.close()
 
 
 def reranking():
@@ -166,6 +189,18 @@ def reranking():
     
     print("\nProduction tip:")
     print("  Retrieve 50-100 candidates, re-rank to top 5-10")
+    
+    # Working example: first-stage order -> cross-encoder order
+    candidates = [
+        ("doc-1", "Python syntax is simple..."),
+        ("doc-2", "Cooking recipes are..."),
+        ("doc-3", "What is Python? Python is a programming language..."),
+    ]
+    reranker = Reranker(OverlapCrossEncoder(), batch_size=8, latency_budget_ms=50)
+    results, stats = reranker.rerank("What is Python?", candidates, top_n=2)
+    print("\nRe-ranked (stand-in cross-encoder, 50 ms budget):")
+    for chunk_id, score in results:
+        print(f"  {chunk_id}: {score:.2f}")
 
 
 if __name__ == "__main__":
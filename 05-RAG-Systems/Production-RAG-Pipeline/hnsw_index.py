@@ -0,0 +1,352 @@
+"""
+HNSW Index (Hierarchical Navigable Small World)
+Graph-based ANN search with tombstone deletes and a versioned on-disk format.
+"""
+
+import heapq
+import math
+import os
+import struct
+import tempfile
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from similarity import normalize
+from vector_index import VectorIndex, recall_at_k
+
+# File layout (little endian):
+#   header  magic, version, dim, M, ef_construction, ef_search, count, entry point, max level
+#   arrays  vectors float32 (count x dim), levels int32 (count), deleted uint8 (count),
+#           link counts int32 (one per node per level), links int32 (flattened)
+HNSW_MAGIC = b"HNSW"
+HNSW_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIIIIIqqi")
+
+
+class HNSWIndex:
+    """
+    Approximate cosine search over a layered proximity graph.
+    - M: links per node (2*M on the bottom layer); more = better recall, more memory
+    - ef_construction: candidate list size while building; more = better graph, slower build
+    - ef_search: candidate list size while querying; more = better recall, slower queries
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        M: int = 16,
+        ef_construction: int = 200,
+        ef_search: int = 50,
+        seed: int = 0
+    ):
+        if M < 2:
+            raise ValueError(f"M must be at least 2 (links per node), got {M}")
+        self.dim = dim
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._level_mult = 1 / math.log(M)
+        self._rng = np.random.default_rng(seed)
+
+        self._vectors = np.empty((1024, dim), dtype=np.float32)
+        self._levels: List[int] = []
+        self._links: List[List[List[int]]] = []  # node -> level -> neighbour ids
+        self._deleted = np.zeros(1024, dtype=bool)
+        self._entry_point = -1
+        self._max_level = -1
+        self._size = 0
+
+    def __len__(self) -> int:
+        """Number of live (non-deleted) vectors."""
+        return self._size - int(self._deleted[:self._size].sum())
+
+    def _reserve(self, capacity: int):
+        if capacity <= len(self._vectors):
+            return
+        new_capacity = max(capacity, 2 * len(self._vectors))
+        vectors = np.empty((new_capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        deleted = np.zeros(new_capacity, dtype=bool)
+        deleted[:self._size] = self._deleted[:self._size]
+        self._vectors, self._deleted = vectors, deleted
+
+    def _max_links(self, level: int) -> int:
+        return 2 * self.M if level == 0 else self.M
+
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entry_points: List[int],
+        ef: int,
+        level: int,
+        accept: Optional[np.ndarray] = None
+    ) -> List[Tuple[float, int]]:
+        """
+        Best-first search on one layer. Returns up to ef (similarity, node) pairs.
+        With an `accept` mask, every node is still traversed but only accepted
+        nodes enter the results (filtering inside the graph search).
+        """
+        visited = set(entry_points)
+        sims = (self._vectors[entry_points] @ query).tolist()
+        candidates = [(-sim, node) for sim, node in zip(sims, entry_points)]
+        results = [(sim, node) for sim, node in zip(sims, entry_points) if accept is None or accept[node]]
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            if len(results) >= ef and -neg_sim < results[0][0]:
+                break  # Closest remaining candidate is worse than the worst result
+            neighbours = [n for n in self._links[node][level] if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+            # Score all unvisited neighbours with one vectorized product
+            for sim, neighbour in zip((self._vectors[neighbours] @ query).tolist(), neighbours):
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, neighbour))
+                    if accept is None or accept[neighbour]:
+                        heapq.heappush(results, (sim, neighbour))
+                        if len(results) > ef:
+                            heapq.heappop(results)
+        return results
+
+    def _select_neighbours(self, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """
+        Neighbour selection heuristic from the HNSW paper: skip a candidate
+        that is closer to an already selected neighbour than to the base node.
+        This keeps links spread in different directions.
+        """
+        ordered = sorted(candidates, reverse=True)
+        if len(ordered) <= m:
+            return [node for _, node in ordered]
+
+        nodes = [node for _, node in ordered]
+        vectors = self._vectors[nodes]
+        pairwise = vectors @ vectors.T  # All candidate-candidate sims at once
+        # Running max similarity of every candidate to the selected set
+        closest_selected = np.full(len(nodes), -np.inf, dtype=np.float32)
+        selected: List[int] = []
+        pruned: List[int] = []
+        for i, (sim, _) in enumerate(ordered):
+            if len(selected) >= m:
+                break
+            if closest_selected[i] > sim:
+                pruned.append(i)
+            else:
+                selected.append(i)
+                np.maximum(closest_selected, pairwise[i], out=closest_selected)
+        # Fill remaining slots with the best pruned candidates to keep the graph connected
+        return [nodes[i] for i in selected + pruned[:m - len(selected)]]
+
+    def _insert(self, node: int):
+        query = self._vectors[node]
+        level = int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+        self._levels.append(level)
+        self._links.append([[] for _ in range(level + 1)])
+
+        if self._entry_point < 0:
+            self._entry_point, self._max_level = node, level
+            return
+
+        # Greedy descent through the layers above the new node's level
+        entry = [self._entry_point]
+        for layer in range(self._max_level, level, -1):
+            entry = [max(self._search_layer(query, entry, 1, layer))[1]]
+
+        for layer in range(min(level, self._max_level), -1, -1):
+            candidates = self._search_layer(query, entry, self.ef_construction, layer)
+            neighbours = self._select_neighbours(candidates, self.M)
+            self._links[node][layer] = neighbours
+
+            max_links = self._max_links(layer)
+            for neighbour in neighbours:
+                links = self._links[neighbour][layer]
+                links.append(node)
+                if len(links) > max_links:
+                    sims = (self._vectors[links] @ self._vectors[neighbour]).tolist()
+                    self._links[neighbour][layer] = self._select_neighbours(
+                        list(zip(sims, links)), max_links
+                    )
+            entry = [node for _, node in candidates]
+
+        if level > self._max_level:
+            self._entry_point, self._max_level = node, level
+
+    def add(self, embeddings: np.ndarray) -> np.ndarray:
+        """Insert vectors one at a time into the graph and return their ids."""
+        embeddings = normalize(embeddings)
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected dimension {self.dim}, got {embeddings.shape[1]}")
+        start = self._size
+        self._reserve(start + len(embeddings))
+        self._vectors[start:start + len(embeddings)] = embeddings
+        for node in range(start, start + len(embeddings)):
+            self._size = node + 1
+            self._insert(node)
+        return np.arange(start, self._size)
+
+    def delete(self, ids: Sequence[int]):
+        """
+        Tombstone deletes: nodes stay in the graph for navigation
+        but are never returned as results.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) and (ids.min() < 0 or ids.max() >= self._size):
+            raise KeyError("Unknown vector id")
+        self._deleted[ids] = True
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        ef_search: Optional[int] = None,
+        allowed: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k search. Returns (scores, ids); missing results have id -1.
+        `allowed` (boolean mask over ids) restricts results to those ids while
+        still navigating through all nodes; very selective masks make the
+        traversal visit many nodes, where a scan of the allowed ids is cheaper.
+        """
+        queries = normalize(queries)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if self._entry_point < 0:
+            return all_scores, all_ids
+
+        # Deleted nodes are still traversed (they keep the graph connected) but
+        # never enter the results, so they cannot take result slots
+        accept = None
+        if allowed is not None:
+            accept = np.asarray(allowed, dtype=bool)[:self._size] & ~self._deleted[:self._size]
+        elif self._deleted[:self._size].any():
+            accept = ~self._deleted[:self._size]
+        ef = max(ef_search or self.ef_search, k)
+
+        for row, query in enumerate(queries):
+            entry = [self._entry_point]
+            for layer in range(self._max_level, 0, -1):
+                entry = [max(self._search_layer(query, entry, 1, layer))[1]]
+            results = self._search_layer(query, entry, ef, 0, accept)
+            for col, (sim, node) in enumerate(sorted(results, reverse=True)[:k]):
+                all_scores[row, col], all_ids[row, col] = sim, node
+        return all_scores, all_ids
+
+    def save(self, path: str):
+        """Write graph and vectors in the versioned binary format."""
+        counts, links = [], []
+        for node_links in self._links:
+            for layer_links in node_links:
+                counts.append(len(layer_links))
+                links.extend(layer_links)
+
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(
+                HNSW_MAGIC, HNSW_FORMAT_VERSION, self.dim, self.M,
+                self.ef_construction, self.ef_search,
+                self._size, self._entry_point, self._max_level
+            ))
+            f.write(self._vectors[:self._size].tobytes())
+            f.write(np.asarray(self._levels, dtype=np.int32).tobytes())
+            f.write(self._deleted[:self._size].astype(np.uint8).tobytes())
+            f.write(np.asarray(counts, dtype=np.int32).tobytes())
+            f.write(np.asarray(links, dtype=np.int32).tobytes())
+
+    @classmethod
+    def load(cls, path: str) -> "HNSWIndex":
+        """Read an index written by save()."""
+        with open(path, "rb") as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                raise ValueError(f"{path}: truncated HNSW header")
+            (magic, version, dim, M, ef_construction, ef_search,
+             count, entry_point, max_level) = _HEADER.unpack(header)
+            if magic != HNSW_MAGIC:
+                raise ValueError(f"{path}: not an HNSW index file")
+            if version != HNSW_FORMAT_VERSION:
+                raise ValueError(f"{path}: unsupported format version {version}")
+
+            def read_array(dtype, n):
+                data = f.read(np.dtype(dtype).itemsize * n)
+                if len(data) < np.dtype(dtype).itemsize * n:
+                    raise ValueError(f"{path}: truncated HNSW data")
+                return np.frombuffer(data, dtype=dtype)
+
+            vectors = read_array(np.float32, count * dim).reshape(count, dim)
+            levels = read_array(np.int32, count)
+            deleted = read_array(np.uint8, count).astype(bool)
+            counts = read_array(np.int32, int((levels + 1).sum()))
+            links = read_array(np.int32, int(counts.sum()))
+
+        index = cls(dim, M=M, ef_construction=ef_construction, ef_search=ef_search)
+        index._reserve(count)
+        index._vectors[:count] = vectors
+        index._deleted[:count] = deleted
+        index._levels = levels.tolist()
+        index._size, index._entry_point, index._max_level = count, entry_point, max_level
+
+        flat_links = links.tolist()
+        offsets = np.concatenate(([0], np.cumsum(counts))).tolist()
+        position = 0
+        for level in index._levels:
+            node_links = []
+            for _ in range(level + 1):
+                node_links.append(flat_links[offsets[position]:offsets[position + 1]])
+                position += 1
+            index._links.append(node_links)
+        return index
+
+
+def demonstrate_hnsw_index():
+    """Build, query, delete, save and reload a small HNSW graph."""
+    print("=== HNSW Index ===")
+
+    rng = np.random.default_rng(0)
+    dim, n = 64, 3000
+    corpus = rng.standard_normal((n, dim)).astype(np.float32)
+    queries = corpus[:100] + 0.2 * rng.standard_normal((100, dim)).astype(np.float32)
+
+    start = time.perf_counter()
+    index = HNSWIndex(dim, M=16, ef_construction=100, ef_search=50)
+    index.add(corpus)
+    print(f"Built graph over {len(index)} vectors in {time.perf_counter() - start:.1f}s")
+
+    exact = VectorIndex(dim)
+    exact.add(corpus)
+    _, true_ids = exact.search(queries, k=10)
+
+    print(f"\n{'ef_search':>9} {'recall@10':>10} {'ms/query':>10}")
+    for ef in (10, 50, 200):
+        start = time.perf_counter()
+        _, found_ids = index.search(queries, k=10, ef_search=ef)
+        elapsed = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{ef:>9} {recall_at_k(found_ids, true_ids):>10.3f} {elapsed:>10.3f}")
+
+    index.delete([0, 1, 2])
+    _, ids = index.search(queries[:3], k=3)
+    print(f"\nAfter deleting ids 0-2, top hits for their queries: {ids[:, 0].tolist()}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "demo.hnsw")
+        index.save(path)
+        restored = HNSWIndex.load(path)
+        size_mb = os.path.getsize(path) / 1e6
+    _, restored_ids = restored.search(queries, k=10)
+    _, original_ids = index.search(queries, k=10)
+    print(f"Saved {size_mb:.1f} MB (format v{HNSW_FORMAT_VERSION}), reloaded "
+          f"{len(restored)} vectors, identical results: "
+          f"{np.array_equal(restored_ids, original_ids)}")
+
+    print("\nTuning:")
+    print("  - M: 12-48 (memory vs recall)")
+    print("  - ef_construction: 100-400 (build time vs graph quality)")
+    print("  - ef_search: >= k, raise until recall is good enough")
+
+
+if __name__ == "__main__":
+    demonstrate_hnsw_index()
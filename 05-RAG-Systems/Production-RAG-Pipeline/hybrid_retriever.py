@@ -0,0 +1,256 @@
+"""
+Hybrid Retriever
+BM25 keyword search + dense vector search, fused into one ranking.
+"""
+
+import threading
+import time
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from local_embedder import HashingEmbedder, tokenize
+from vector_index import VectorIndex, top_k
+
+
+class BM25Index:
+    """
+    BM25 over an inverted index with compact, array-backed postings (CSR layout):
+    postings for term t are doc_ids[offsets[t]:offsets[t + 1]] with matching
+    term_freqs. No per-term dicts, so millions of documents stay cheap.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.doc_lengths = np.empty(0, dtype=np.int32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.empty(0, dtype=np.int32)
+        self.term_freqs = np.empty(0, dtype=np.int32)
+        # New postings are staged in flat arrays and merged on the next search
+        self._pending_terms = array("i")
+        self._pending_docs = array("i")
+        self._pending_freqs = array("i")
+        self._pending_lengths = array("i")
+        self._length_norm = np.empty(0, dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths) + len(self._pending_lengths)
+
+    def add(self, texts: Sequence[str]) -> np.ndarray:
+        """Tokenize and stage documents; returns their ids."""
+        tokenized = [Counter(tokenize(text)) for text in texts]
+        with self._lock:
+            start = len(self)
+            for doc_id, counts in enumerate(tokenized, start=start):
+                self._pending_lengths.append(sum(counts.values()))
+                for term, freq in counts.items():
+                    term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+                    self._pending_terms.append(term_id)
+                    self._pending_docs.append(doc_id)
+                    self._pending_freqs.append(freq)
+            return np.arange(start, len(self))
+
+    def _postings(self):
+        """
+        Merge staged postings, then return (offsets, doc_ids, term_freqs, length_norm)
+        read under the same lock, so a concurrent merge cannot mix old and new arrays.
+        """
+        with self._lock:
+            if self._pending_lengths:
+                self._merge_pending_locked()
+            return self.offsets, self.doc_ids, self.term_freqs, self._length_norm
+
+    def _merge_pending_locked(self):
+        """Fold staged postings into the CSR arrays with one stable sort by term."""
+        old_terms = np.repeat(np.arange(len(self.offsets) - 1, dtype=np.int32), np.diff(self.offsets))
+        terms = np.concatenate([old_terms, np.frombuffer(self._pending_terms, dtype=np.int32)])
+        docs = np.concatenate([self.doc_ids, np.frombuffer(self._pending_docs, dtype=np.int32)])
+        freqs = np.concatenate([self.term_freqs, np.frombuffer(self._pending_freqs, dtype=np.int32)])
+
+        order = np.argsort(terms, kind="stable")  # Keeps doc ids ascending per term
+        self.doc_ids, self.term_freqs = docs[order], freqs[order]
+        counts = np.bincount(terms, minlength=len(self.vocabulary))
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.doc_lengths = np.concatenate(
+            [self.doc_lengths, np.frombuffer(self._pending_lengths, dtype=np.int32)]
+        )
+        self._pending_terms, self._pending_docs = array("i"), array("i")
+        self._pending_freqs, self._pending_lengths = array("i"), array("i")
+        # Per-document BM25 length normalization only changes when documents are added
+        average_length = max(self.doc_lengths.mean(), 1)
+        self._length_norm = (
+            self.k1 * (1 - self.b + self.b * self.doc_lengths / average_length)
+        ).astype(np.float32)
+
+    def search(self, query: str, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k BM25 documents as (scores, ids); ids are -1 padded when fewer match."""
+        offsets, doc_ids, term_freqs, length_norm = self._postings()
+        n_docs = len(length_norm)
+        scores = np.zeros(n_docs, dtype=np.float32)
+
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None or term_id + 1 >= len(offsets):  # Unknown, or only in documents added since
+                continue
+            start, end = offsets[term_id], offsets[term_id + 1]
+            docs, freqs = doc_ids[start:end], term_freqs[start:end]
+            idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            # Each doc appears once per term, so fancy-index += is safe
+            scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + length_norm[docs])
+
+        best_scores, best_ids = top_k(scores, k)
+        best_ids = np.where(best_scores > 0, best_ids, -1)
+        return best_scores[0], best_ids[0]
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], rrf_k: int = 60) -> Dict[int, float]:
+    """RRF: score(d) = sum over rankings of 1 / (rrf_k + rank). Scale-free, no tuning."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking.tolist(), start=1):
+            if doc_id >= 0:
+                fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank)
+    return fused
+
+
+def weighted_score_fusion(
+    results: List[Tuple[np.ndarray, np.ndarray]],
+    weights: Sequence[float]
+) -> Dict[int, float]:
+    """Min-max normalize each leg's scores to [0, 1], then take a weighted sum."""
+    fused: Dict[int, float] = {}
+    for (scores, ids), weight in zip(results, weights):
+        valid = ids >= 0
+        scores, ids = scores[valid], ids[valid]
+        if not len(ids):
+            continue
+        spread = scores.max() - scores.min()
+        normalized = (scores - scores.min()) / spread if spread > 0 else np.ones_like(scores)
+        for doc_id, score in zip(ids.tolist(), normalized.tolist()):
+            fused[doc_id] = fused.get(doc_id, 0.0) + weight * score
+    return fused
+
+
+class HybridRetriever:
+    """
+    Runs the BM25 and vector legs concurrently and fuses their rankings.
+    - fusion="rrf": reciprocal rank fusion (default, robust)
+    - fusion="weighted": normalized score fusion with `weights` (keyword, vector)
+    Every search also returns per-leg latency, so you can see which side dominates.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[Sequence[str]], np.ndarray],
+        dim: int,
+        fusion: str = "rrf",
+        rrf_k: int = 60,
+        weights: Tuple[float, float] = (0.5, 0.5),
+        candidates: int = 100
+    ):
+        if fusion not in ("rrf", "weighted"):
+            raise ValueError(f"Unknown fusion method: {fusion}")
+        self.embed_fn = embed_fn
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.weights = weights
+        self.candidates = candidates
+        self.bm25 = BM25Index()
+        self.vectors = VectorIndex(dim)
+        self._executor = ThreadPoolExecutor(max_workers=2)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def add(self, texts: Sequence[str], embeddings: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Index texts in both legs (ids line up because both append in order).
+        The vector leg goes first: it validates the embeddings, so a rejected
+        batch leaves neither leg changed.
+        """
+        if embeddings is None:
+            embeddings = self.embed_fn(texts)
+        ids = self.vectors.add(embeddings, texts=texts)
+        self.bm25.add(texts)
+        return ids
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        return result, (time.perf_counter() - start) * 1000
+
+    def _vector_leg(self, query: str):
+        scores, ids = self.vectors.search(self.embed_fn([query]), self.candidates)
+        return scores[0], ids[0]
+
+    def search(self, query: str, k: int = 10) -> Tuple[List[Tuple[int, float]], Dict[str, float]]:
+        """
+        Returns ([(doc_id, fused_score), ...], timings_ms).
+        timings_ms has "keyword", "vector", "fusion" and "total".
+        """
+        start = time.perf_counter()
+        keyword_future = self._executor.submit(self._timed, self.bm25.search, query, self.candidates)
+        vector_future = self._executor.submit(self._timed, self._vector_leg, query)
+        keyword, keyword_ms = keyword_future.result()
+        vector, vector_ms = vector_future.result()
+
+        fusion_start = time.perf_counter()
+        if self.fusion == "rrf":
+            fused = reciprocal_rank_fusion([keyword[1], vector[1]], self.rrf_k)
+        else:
+            fused = weighted_score_fusion([keyword, vector], self.weights)
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        fusion_ms = (time.perf_counter() - fusion_start) * 1000
+
+        timings = {
+            "keyword": keyword_ms,
+            "vector": vector_ms,
+            "fusion": fusion_ms,
+            "total": (time.perf_counter() - start) * 1000,
+        }
+        return ranked, timings
+
+    def close(self):
+        """Stop the threads that run the two legs."""
+        self._executor.shutdown()
+
+
+def demonstrate_hybrid_retriever():
+    """Keyword leg catches exact terms, vector leg catches related wording."""
+    print("=== Hybrid Retriever (BM25 + Vector, RRF) ===")
+
+    documents = [
+        "Error code E1234 means the disk quota was exceeded",
+        "Python is a popular programming language for data science",
+        "Coding in Python is simple and readable",
+        "Our refund policy allows returns within 30 days",
+        "Storage limits: when the quota is full, uploads fail",
+        "Machine learning models learn patterns from data",
+    ]
+    embedder = HashingEmbedder(dim=128)
+    retriever = HybridRetriever(embedder.embed, dim=128)
+    retriever.add(documents)
+
+    for query in ("E1234", "python coding"):
+        results, timings = retriever.search(query, k=3)
+        print(f"\nQuery: '{query}'")
+        for doc_id, score in results:
+            print(f"  {score:.4f}  {documents[doc_id]}")
+        print("  Latency (ms): " + ", ".join(f"{leg} {ms:.2f}" for leg, ms in timings.items()))
+
+    retriever.fusion = "weighted"
+    results, _ = retriever.search("disk quota", k=2)
+    print("\nWeighted fusion for 'disk quota':")
+    for doc_id, score in results:
+        print(f"  {score:.3f}  {documents[doc_id]}")
+    retriever.close()
+
+
+if __name__ == "__main__":
+    demonstrate_hybrid_retriever()
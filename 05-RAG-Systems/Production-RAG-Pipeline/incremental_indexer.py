@@ -0,0 +1,174 @@
+"""
+Incremental Indexer
+Re-ingesting a changed document only embeds the chunks that actually changed.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from local_embedder import HashingEmbedder
+from recursive_chunker import RecursiveChunker
+from vector_index import VectorIndex
+
+_DEFAULT_CHUNKER = RecursiveChunker(chunk_size=1000)
+
+
+def default_chunks(text: str) -> List[str]:
+    """Recursive chunks, stripped so a trailing separator does not change the content hash."""
+    return [chunk["text"].strip() for chunk in _DEFAULT_CHUNKER.chunk(text)]
+
+
+class IncrementalIndexer:
+    """
+    Keeps a manifest of document id -> chunk content hashes, and content hash ->
+    (vector id, reference count). On (re-)ingest:
+    - chunks whose hash is already indexed are reused, from any document
+    - only new hashes are embedded (batched across all documents in the call)
+    - hashes no document references any more are deleted from the index
+
+    `index` needs add(embeddings) -> ids and delete(ids) (VectorIndex, HNSWIndex).
+    `chunk_fn(text)` returns chunk texts; the default recursive chunker splits on
+    paragraphs first, so editing one paragraph leaves the other chunks unchanged.
+    With `manifest_path` the manifest is saved after every change; persist the
+    index alongside it so vector ids stay valid.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[Sequence[str]], np.ndarray],
+        index,
+        chunk_fn: Optional[Callable[[str], List[str]]] = None,
+        manifest_path: Optional[str] = None,
+        batch_size: int = 64
+    ):
+        self.embed_fn = embed_fn
+        self.index = index
+        self.chunk_fn = chunk_fn or default_chunks
+        self.manifest_path = manifest_path
+        self.batch_size = batch_size
+        self.documents: Dict[str, List[str]] = {}  # doc id -> chunk hashes, in order
+        self.chunks: Dict[str, List[int]] = {}     # chunk hash -> [vector id, reference count]
+        self.stats = {"embedded": 0, "reused": 0, "deleted": 0}
+        if manifest_path and os.path.exists(manifest_path):
+            with open(manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            self.documents, self.chunks = manifest["documents"], manifest["chunks"]
+
+    @staticmethod
+    def content_hash(text: str) -> str:
+        return hashlib.sha1(text.encode()).hexdigest()
+
+    def vector_id(self, chunk_hash: str) -> int:
+        return self.chunks[chunk_hash][0]
+
+    def _release(self, hashes: Sequence[str]) -> List[int]:
+        """Drop one reference per hash; returns vector ids that became orphans."""
+        orphans = []
+        for chunk_hash in hashes:
+            entry = self.chunks[chunk_hash]
+            entry[1] -= 1
+            if entry[1] == 0:
+                orphans.append(entry[0])
+                del self.chunks[chunk_hash]
+        return orphans
+
+    def upsert(self, documents: Dict[str, str]) -> Dict[str, int]:
+        """
+        Index new or changed documents ({doc id: text}). Returns counts for this
+        call: chunks, embedded, reused, deleted.
+        """
+        new_chunks: Dict[str, str] = {}  # hash -> text, for hashes not indexed yet
+        plan: Dict[str, List[str]] = {}
+        for doc_id, text in documents.items():
+            hashes = []
+            for chunk in self.chunk_fn(text):
+                chunk_hash = self.content_hash(chunk)
+                hashes.append(chunk_hash)
+                if chunk_hash not in self.chunks:
+                    new_chunks.setdefault(chunk_hash, chunk)
+            plan[doc_id] = hashes
+
+        pending = list(new_chunks)
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            ids = self.index.add(self.embed_fn([new_chunks[chunk_hash] for chunk_hash in batch]))
+            for chunk_hash, vector_id in zip(batch, np.asarray(ids).tolist()):
+                self.chunks[chunk_hash] = [vector_id, 0]
+
+        # Take the new references before releasing the old ones, so a chunk
+        # that merely moved between documents is never deleted and re-embedded
+        for hashes in plan.values():
+            for chunk_hash in hashes:
+                self.chunks[chunk_hash][1] += 1
+        orphans = []
+        for doc_id, hashes in plan.items():
+            orphans += self._release(self.documents.get(doc_id, []))
+            self.documents[doc_id] = hashes
+        if orphans:
+            self.index.delete(orphans)
+
+        total = sum(len(hashes) for hashes in plan.values())
+        result = {
+            "chunks": total,
+            "embedded": len(pending),
+            "reused": total - len(pending),
+            "deleted": len(orphans),
+        }
+        for key in ("embedded", "reused", "deleted"):
+            self.stats[key] += result[key]
+        self.save()
+        return result
+
+    def delete(self, doc_ids: Sequence[str]) -> int:
+        """Remove documents; returns how many vectors were deleted."""
+        orphans = []
+        for doc_id in doc_ids:
+            orphans += self._release(self.documents.pop(doc_id, []))
+        if orphans:
+            self.index.delete(orphans)
+        self.stats["deleted"] += len(orphans)
+        self.save()
+        return len(orphans)
+
+    def save(self):
+        """Write the manifest atomically (temp file + rename)."""
+        if not self.manifest_path:
+            return
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"documents": self.documents, "chunks": self.chunks}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def demonstrate_incremental_indexer():
+    """Edit one paragraph, re-ingest, and count what gets re-embedded."""
+    print("=== Incremental Indexer ===")
+
+    paragraphs = [f"Section {i}. " + f"Policy text for topic {i}, with details. " * 20 for i in range(10)]
+    handbook = "\n\n".join(paragraphs)
+    faq = "\n\n".join(paragraphs[:3])  # Shares its paragraphs with the handbook
+
+    embedder = HashingEmbedder(dim=128)
+    index = VectorIndex(dim=128)
+    with tempfile.TemporaryDirectory() as tmp:
+        indexer = IncrementalIndexer(embedder.embed, index, manifest_path=os.path.join(tmp, "manifest.json"))
+
+        print(f"Initial ingest:       {indexer.upsert({'handbook': handbook, 'faq': faq})}")
+
+        paragraphs[4] = "Section 4. Updated policy: refunds within 60 days. " * 20
+        handbook = "\n\n".join(paragraphs)
+        print(f"One paragraph edited: {indexer.upsert({'handbook': handbook})}")
+        print(f"FAQ removed: {indexer.delete(['faq'])} vectors deleted (its paragraphs live on in the handbook)")
+
+        reopened = IncrementalIndexer(embedder.embed, index, manifest_path=indexer.manifest_path)
+        print(f"Unchanged after restart: {reopened.upsert({'handbook': handbook})}")
+    print(f"\nLive vectors: {len(index)}, texts sent to the embedding model: {embedder.texts_embedded}")
+
+
+if __name__ == "__main__":
+    demonstrate_incremental_indexer()
@@ -0,0 +1,286 @@
+"""
+Streaming Ingestion Pipeline
+Documents on disk -> chunks -> embedding batches -> vector index, as lazy stages
+joined by bounded queues so memory stays flat regardless of corpus size.
+"""
+
+import os
+import queue
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from chunking_strategies import iter_fixed_size_chunks
+from local_embedder import HashingEmbedder
+from vector_index import VectorIndex
+
+Chunk = Dict[str, object]  # {"source", "offset", "position", "text"}
+EmbedFn = Callable[[Sequence[str]], np.ndarray]
+WriteFn = Callable[[List[Chunk], np.ndarray], None]
+
+_DONE = object()  # End-of-stream marker passed through the queues
+
+
+def read_documents(paths: Iterable[str]) -> Iterator[Dict[str, str]]:
+    """Yield {"source", "text"} one file at a time."""
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            yield {"source": path, "text": f.read()}
+
+
+def chunk_documents(
+    documents: Iterable[Dict[str, str]],
+    chunk_size: int = 500,
+    chunk_overlap: int = 50
+) -> Iterator[Chunk]:
+    """Yield chunks with their metadata (source, character offset, position)."""
+    for document in documents:
+        chunks = iter_fixed_size_chunks(document["text"], chunk_size, chunk_overlap)
+        for position, (offset, text) in enumerate(chunks):
+            if text.strip():
+                yield {"source": document["source"], "offset": offset, "position": position, "text": text}
+
+
+def batched(items: Iterable, batch_size: int) -> Iterator[list]:
+    """Group a stream into lists of batch_size (the last one may be shorter)."""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def embed_batches(
+    chunks: Iterable[Chunk],
+    embed_fn: EmbedFn,
+    batch_size: int = 64
+) -> Iterator[Tuple[List[Chunk], np.ndarray]]:
+    """One embedding request per batch of chunks."""
+    for batch in batched(chunks, batch_size):
+        yield batch, embed_fn([chunk["text"] for chunk in batch])
+
+
+class StageStats:
+    """
+    Counters for one stage. `starved_s` is time spent waiting for input and
+    `blocked_s` time spent waiting for room downstream (backpressure); the
+    rest of the wall time is the stage's own work. The busiest stage is the bottleneck.
+    """
+
+    def __init__(self, name: str, unit_in: str, unit_out: str):
+        self.name = name
+        self.unit_in = unit_in
+        self.unit_out = unit_out
+        self.items_in = 0
+        self.items_out = 0
+        self.starved_s = 0.0
+        self.blocked_s = 0.0
+        self.wall_s = 0.0
+
+    @property
+    def busy_s(self) -> float:
+        return max(self.wall_s - self.starved_s - self.blocked_s, 0.0)
+
+    def rate_in(self) -> float:
+        """Items consumed per second of wall time."""
+        return self.items_in / self.wall_s if self.wall_s else 0.0
+
+    def rate_out(self) -> float:
+        return self.items_out / self.wall_s if self.wall_s else 0.0
+
+    def utilization(self) -> float:
+        return self.busy_s / self.wall_s if self.wall_s else 0.0
+
+
+class IngestionPipeline:
+    """
+    read -> chunk -> embed -> index, each stage on its own thread.
+
+    Stages are plain generators; between them sit queues of `queue_size` items.
+    A full queue blocks the producer, so a slow embedder throttles reading and
+    chunking instead of letting chunks pile up. At most about
+    queue_size * embed_batch_size chunks are in flight at any time.
+
+    `write_fn(chunks, embeddings)` receives every embedded batch, e.g. an
+    index's add method; use `index_writer()` for a VectorIndex.
+    """
+
+    def __init__(
+        self,
+        embed_fn: EmbedFn,
+        write_fn: WriteFn,
+        chunk_size: int = 500,
+        chunk_overlap: int = 50,
+        embed_batch_size: int = 64,
+        queue_size: int = 8
+    ):
+        self.embed_fn = embed_fn
+        self.write_fn = write_fn
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.embed_batch_size = embed_batch_size
+        self.queue_size = queue_size
+        self.stats: List[StageStats] = []
+        self.max_queue_depth: Dict[str, int] = {}
+
+    def _stages(self):
+        """(stats, generator function over the upstream iterator) for each threaded stage."""
+        return [
+            (StageStats("read", "paths", "docs"), read_documents),
+            (StageStats("chunk", "docs", "chunks"),
+             lambda docs: chunk_documents(docs, self.chunk_size, self.chunk_overlap)),
+            (StageStats("embed", "chunks", "batches"),
+             lambda chunks: embed_batches(chunks, self.embed_fn, self.embed_batch_size)),
+        ]
+
+    def run(self, paths: Iterable[str]) -> List[StageStats]:
+        """Ingest every path; returns per-stage statistics (also kept in self.stats)."""
+        failed = threading.Event()
+        errors: List[BaseException] = []
+        stages = self._stages()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in stages]
+        self.stats = [stats for stats, _ in stages] + [StageStats("index", "batches", "chunks")]
+        self.max_queue_depth = {stats.name: 0 for stats, _ in stages}
+
+        def consume(source, stats: StageStats) -> Iterator:
+            """Iterate a queue (or the input paths), timing the waits for input."""
+            if not isinstance(source, queue.Queue):
+                for item in source:
+                    stats.items_in += 1
+                    yield item
+                return
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = source.get(timeout=0.1)
+                except queue.Empty:
+                    item = None
+                stats.starved_s += time.perf_counter() - start
+                if item is _DONE or failed.is_set():
+                    return
+                if item is None:
+                    continue
+                stats.items_in += 1
+                yield item
+
+        def put(out: queue.Queue, item, stats: StageStats):
+            start = time.perf_counter()
+            while not failed.is_set():
+                try:
+                    out.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+            stats.blocked_s += time.perf_counter() - start
+            self.max_queue_depth[stats.name] = max(self.max_queue_depth[stats.name], out.qsize())
+
+        def run_stage(source, stage_fn, stats: StageStats, out: queue.Queue):
+            start = time.perf_counter()
+            try:
+                for item in stage_fn(consume(source, stats)):
+                    if failed.is_set():
+                        return
+                    stats.items_out += 1
+                    put(out, item, stats)
+            except BaseException as exc:
+                errors.append(exc)
+                failed.set()
+            finally:
+                stats.wall_s = time.perf_counter() - start
+                put(out, _DONE, stats)
+
+        threads = []
+        source = paths
+        for (stats, stage_fn), out in zip(stages, queues):
+            threads.append(threading.Thread(target=run_stage, args=(source, stage_fn, stats, out), daemon=True))
+            source = out
+        for thread in threads:
+            thread.start()
+
+        # Sink: the index writer runs on the calling thread
+        index_stats = self.stats[-1]
+        start = time.perf_counter()
+        try:
+            for chunks, embeddings in consume(source, index_stats):
+                self.write_fn(chunks, embeddings)
+                index_stats.items_out += len(chunks)
+                if failed.is_set():
+                    break
+        except BaseException as exc:
+            errors.append(exc)
+            failed.set()
+        finally:
+            index_stats.wall_s = time.perf_counter() - start
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+        return self.stats
+
+    def report(self) -> str:
+        lines = [f"{'Stage':<7} {'In':>8} {'In/s':>10} {'Out':>8} {'Out/s':>10} {'Busy':>6}"]
+        for stats in self.stats:
+            lines.append(
+                f"{stats.name:<7} {stats.items_in:>8} {stats.rate_in():>10.0f} "
+                f"{stats.items_out:>8} {stats.rate_out():>10.0f} {stats.utilization():>6.0%}"
+                f"   ({stats.unit_in} -> {stats.unit_out})"
+            )
+        bottleneck = max(self.stats, key=lambda stats: stats.busy_s)
+        lines.append(f"Bottleneck: {bottleneck.name}")
+        return "\n".join(lines)
+
+
+def index_writer(index: VectorIndex) -> WriteFn:
+    """write_fn that adds each embedded batch (with its chunk texts) to a VectorIndex."""
+    def write(chunks: List[Chunk], embeddings: np.ndarray):
+        index.add(embeddings, texts=[chunk["text"] for chunk in chunks])
+    return write
+
+
+def write_corpus(directory: str, n_docs: int, words_per_doc: int = 400, seed: int = 0) -> List[str]:
+    """Write n_docs synthetic text files to directory and return their paths."""
+    rng = np.random.default_rng(seed)
+    topics = ["refund", "shipping", "python", "quota", "embedding", "latency", "tenant", "cache"]
+    paths = []
+    for i in range(n_docs):
+        words = rng.choice(topics, words_per_doc).tolist()
+        path = os.path.join(directory, f"doc_{i:06d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(" ".join(words))
+        paths.append(path)
+    return paths
+
+
+def demonstrate_ingestion_pipeline():
+    """Stream a folder of documents into a VectorIndex and find the slowest stage."""
+    print("=== Streaming Ingestion Pipeline ===")
+
+    embedder = HashingEmbedder(dim=128)
+    index = VectorIndex(dim=128)
+    pipeline = IngestionPipeline(
+        embedder.embed, index_writer(index), chunk_size=400, chunk_overlap=40,
+        embed_batch_size=32, queue_size=4
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_corpus(tmp, n_docs=300)
+        pipeline.run(paths)
+
+    print(f"Indexed {len(index)} chunks from {len(paths)} documents "
+          f"({embedder.calls} embedding requests)\n")
+    print(pipeline.report())
+    print(f"\nPeak queue depth (limit {pipeline.queue_size}): {pipeline.max_queue_depth}")
+
+    print("\nDesign:")
+    print("  - Each stage is a generator; nothing materializes the whole corpus")
+    print("  - Bounded queues = backpressure: a slow embedder pauses reading")
+    print("  - Per-stage rates and busy time show where to add capacity")
+
+
+if __name__ == "__main__":
+    demonstrate_ingestion_pipeline()
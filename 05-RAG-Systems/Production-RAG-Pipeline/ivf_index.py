@@ -0,0 +1,240 @@
+"""
+IVF Index (Inverted File)
+Approximate nearest neighbour search: cluster the corpus, search only nearby clusters.
+"""
+
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from similarity import normalize
+from vector_index import VectorIndex, recall_at_k, top_k
+
+
+def spherical_kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 20,
+    seed: int = 0
+) -> np.ndarray:
+    """
+    k-means on the unit sphere (cosine similarity instead of Euclidean distance).
+    Returns unit-norm centroids shaped (n_clusters, dim).
+    """
+    rng = np.random.default_rng(seed)
+    vectors = normalize(vectors)
+    if len(vectors) < n_clusters:
+        raise ValueError(f"Need at least {n_clusters} training vectors, got {len(vectors)}")
+
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = assign_to_centroids(vectors, centroids)
+        counts = np.bincount(assignments, minlength=n_clusters)
+
+        # Sort by cluster once, then sum each contiguous run (much faster than np.add.at)
+        order = np.argsort(assignments, kind="stable")
+        sums = np.zeros_like(centroids)
+        occupied = np.nonzero(counts)[0]
+        starts = np.concatenate(([0], np.cumsum(counts[occupied])[:-1]))
+        sums[occupied] = np.add.reduceat(vectors[order], starts, axis=0)
+
+        # Re-seed empty clusters with random vectors so every cell stays useful
+        empty = np.nonzero(counts == 0)[0]
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign_to_centroids(
+    vectors: np.ndarray,
+    centroids: np.ndarray,
+    batch_size: int = 65_536
+) -> np.ndarray:
+    """Index of the most similar centroid for each (normalized) vector."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), batch_size):
+        block = vectors[start:start + batch_size]
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+class InvertedList:
+    """Growable storage for the vectors (and their global ids) in one IVF cell."""
+
+    def __init__(self, dim: int):
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, vectors: np.ndarray, ids: np.ndarray):
+        """Append in amortized O(1) by doubling capacity."""
+        end = self._size + len(vectors)
+        if end > len(self.ids):
+            capacity = max(end, 2 * len(self.ids), 16)
+            grown = np.empty((capacity, self.vectors.shape[1]), dtype=np.float32)
+            grown[:self._size] = self.vectors[:self._size]
+            grown_ids = np.empty(capacity, dtype=np.int64)
+            grown_ids[:self._size] = self.ids[:self._size]
+            self.vectors, self.ids = grown, grown_ids
+        self.vectors[self._size:end] = vectors
+        self.ids[self._size:end] = ids
+        self._size = end
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        return self.vectors[:self._size], self.ids[:self._size]
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index with cosine similarity.
+    - train(): k-means partitions the space into nlist cells
+    - add(): each vector goes to its nearest cell (no retraining)
+    - search(): only the nprobe closest cells are scanned
+    """
+
+    def __init__(self, dim: int, nlist: int = 100, nprobe: int = 8):
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        self.lists = [InvertedList(dim) for _ in range(nlist)]
+        self.texts: List[Optional[str]] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(
+        self,
+        vectors: np.ndarray,
+        sample_size: Optional[int] = None,
+        n_iter: int = 10
+    ):
+        """
+        Learn the cell centroids from a sample of the corpus.
+        ~64 vectors per cell is plenty; k-means cost grows with sample size x nlist.
+        """
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        sample_size = sample_size or 64 * self.nlist
+        if len(vectors) > sample_size:
+            sample = np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)
+            vectors = vectors[sample]
+        self.centroids = spherical_kmeans(vectors, self.nlist, n_iter=n_iter)
+
+    def add(
+        self,
+        embeddings: np.ndarray,
+        texts: Optional[Sequence[str]] = None
+    ) -> np.ndarray:
+        """
+        Assign new vectors to their nearest existing cell and return their ids.
+        Centroids are not retrained, so ingestion never blocks on k-means.
+        """
+        if not self.is_trained:
+            raise RuntimeError("IVFIndex must be trained before adding vectors")
+        embeddings = normalize(embeddings)
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected dimension {self.dim}, got {embeddings.shape[1]}")
+
+        ids = np.arange(self._size, self._size + len(embeddings))
+        assignments = assign_to_centroids(embeddings, self.centroids)
+        order = np.argsort(assignments, kind="stable")
+        cells, starts = np.unique(assignments[order], return_index=True)
+        for cell, members in zip(cells, np.split(order, starts[1:])):
+            self.lists[cell].append(embeddings[members], ids[members])
+
+        self.texts.extend(texts if texts is not None else [None] * len(embeddings))
+        self._size += len(embeddings)
+        return ids
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        nprobe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k cosine search. nprobe can be raised per call
+        to trade latency for recall. Missing results are padded with id -1.
+        """
+        if not self.is_trained:
+            raise RuntimeError("IVFIndex must be trained before searching")
+        queries = normalize(queries)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        _, probes = top_k(queries @ self.centroids.T, nprobe)
+
+        candidate_scores = [[] for _ in range(len(queries))]
+        candidate_ids = [[] for _ in range(len(queries))]
+
+        # Group queries by cell: each probed cell is scored with one matmul
+        for cell in np.unique(probes):
+            vectors, ids = self.lists[cell].view()
+            if len(ids) == 0:
+                continue
+            query_rows = np.nonzero((probes == cell).any(axis=1))[0]
+            scores = queries[query_rows] @ vectors.T
+            for row, row_scores in zip(query_rows, scores):
+                candidate_scores[row].append(row_scores)
+                candidate_ids[row].append(ids)
+
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        for row in range(len(queries)):
+            if not candidate_ids[row]:
+                continue
+            scores = np.concatenate(candidate_scores[row])
+            ids = np.concatenate(candidate_ids[row])
+            best_scores, best = top_k(scores, k)
+            all_scores[row, :best.shape[1]] = best_scores[0]
+            all_ids[row, :best.shape[1]] = ids[best[0]]
+        return all_scores, all_ids
+
+    def cell_sizes(self) -> np.ndarray:
+        """Number of vectors per cell (balance check)."""
+        return np.array([len(inverted_list) for inverted_list in self.lists])
+
+
+def demonstrate_ivf_index():
+    """Recall vs latency as nprobe grows."""
+    print("=== IVF Index (Approximate Nearest Neighbour) ===")
+
+    rng = np.random.default_rng(0)
+    dim, n = 64, 20_000
+    # Clustered data resembles real embeddings better than uniform noise
+    centers = rng.standard_normal((50, dim)).astype(np.float32)
+    corpus = centers[rng.integers(0, 50, n)] + 0.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    queries = centers[rng.integers(0, 50, 200)] + 0.5 * rng.standard_normal((200, dim)).astype(np.float32)
+
+    exact = VectorIndex(dim)
+    exact.add(corpus)
+    _, true_ids = exact.search(queries, k=10)
+
+    ivf = IVFIndex(dim, nlist=64)
+    ivf.train(corpus)
+    ivf.add(corpus[:n // 2])
+    ivf.add(corpus[n // 2:])  # Incremental add, no retraining
+    sizes = ivf.cell_sizes()
+    print(f"Indexed {len(ivf)} vectors into {ivf.nlist} cells "
+          f"(min {sizes.min()}, max {sizes.max()} per cell)")
+
+    print(f"\n{'nprobe':>6} {'recall@10':>10} {'ms/query':>10}")
+    for nprobe in (1, 2, 4, 8, 16, 64):
+        start = time.perf_counter()
+        _, found_ids = ivf.search(queries, k=10, nprobe=nprobe)
+        elapsed = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{nprobe:>6} {recall_at_k(found_ids, true_ids):>10.3f} {elapsed:>10.3f}")
+
+    print("\nTrade-off: more cells probed = higher recall, higher latency")
+    print("nprobe = nlist is an exhaustive scan (recall 1.0)")
+
+
+if __name__ == "__main__":
+    demonstrate_ivf_index()
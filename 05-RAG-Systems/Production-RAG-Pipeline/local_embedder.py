@@ -0,0 +1,60 @@
+"""
+Local Embedder
+Deterministic, dependency-free stand-in for an embedding model (tests, demos, benchmarks).
+"""
+
+import hashlib
+import re
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens (shared by BM25 and the hashing embedder)."""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class HashingEmbedder:
+    """
+    Bag-of-words embedding: each token maps to a fixed pseudo-random vector
+    (seeded by a hash of the token) and a text is the normalized sum.
+    Texts sharing words get similar vectors, which is enough to exercise
+    retrieval code without calling a real model.
+    """
+
+    def __init__(self, dim: int = 384, model_name: str = "hashing-embedder"):
+        self.dim = dim
+        self.model_name = model_name
+        self.calls = 0           # Number of embed() requests
+        self.texts_embedded = 0  # Number of texts sent to the "model"
+        self._token_vectors: Dict[str, np.ndarray] = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            self._token_vectors[token] = vector
+        return vector
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed a batch of texts to unit-norm float32 vectors shaped (len(texts), dim)."""
+        self.calls += 1
+        self.texts_embedded += len(texts)
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                embeddings[row] += self._token_vector(token)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+
+
+if __name__ == "__main__":
+    embedder = HashingEmbedder(dim=64)
+    vectors = embedder.embed(["Python programming", "Coding in Python", "Cooking recipes"])
+    print("=== Hashing Embedder ===")
+    print(f"Similarity (Python programming, Coding in Python): {vectors[0] @ vectors[1]:.3f}")
+    print(f"Similarity (Python programming, Cooking recipes):  {vectors[0] @ vectors[2]:.3f}")
@@ -0,0 +1,202 @@
+"""
+Memory-Mapped Vector Store
+One on-disk copy of the embeddings, shared by every worker through the OS page cache.
+"""
+
+import json
+import os
+import re
+import tempfile
+from typing import Tuple
+
+import numpy as np
+
+from similarity import normalize
+from vector_index import top_k
+
+_GENERATION_FILE = re.compile(r"(?:vectors|append)-(\d+)\.(?:npy|log)$")
+
+
+class MmapVectorStore:
+    """
+    Embeddings persisted as files and opened with np.memmap:
+    - vectors-<generation>.npy: compacted base matrix (read-only mapping)
+    - append-<generation>.log:  flat float32 records appended since that compaction
+    - manifest.json:            the current generation, replaced atomically
+
+    Vectors are L2-normalized on write, so cosine similarity is a dot product.
+    Opening the store maps files instead of reading them: startup is instant and
+    processes on the same machine share the same physical pages. One process
+    appends and compacts; any number of processes read.
+    """
+
+    MANIFEST_FILE = "manifest.json"
+
+    def __init__(self, directory: str, dim: int):
+        self.directory = directory
+        self.dim = dim
+        os.makedirs(directory, exist_ok=True)
+        self._manifest_path = os.path.join(directory, self.MANIFEST_FILE)
+        if not os.path.exists(self._manifest_path):
+            np.save(self._paths(0)[0], np.empty((0, dim), dtype=np.float32))
+            open(self._paths(0)[1], "wb").close()
+            self._write_manifest(0)
+        self.refresh()
+        for name in os.listdir(directory):  # Older generations a crash after a compaction left behind
+            match = _GENERATION_FILE.match(name)
+            if match and int(match.group(1)) < self.generation:
+                os.remove(os.path.join(directory, name))
+
+    def _paths(self, generation: int) -> Tuple[str, str]:
+        """(base file, append log) of one generation."""
+        return (os.path.join(self.directory, f"vectors-{generation:08d}.npy"),
+                os.path.join(self.directory, f"append-{generation:08d}.log"))
+
+    def _write_manifest(self, generation: int):
+        tmp_path = self._manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self.dim, "generation": generation}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._manifest_path)
+
+    @property
+    def base_path(self) -> str:
+        return self._paths(self.generation)[0]
+
+    def refresh(self):
+        """Re-map the files (picks up appends and compactions by other processes)."""
+        previous = None
+        while True:
+            with open(self._manifest_path) as f:
+                generation = json.load(f)["generation"]
+            base_path, log_path = self._paths(generation)
+            try:
+                base = np.load(base_path, mmap_mode="r")
+                # A partially written trailing record (crash mid-append) is ignored
+                n_log = os.path.getsize(log_path) // (self.dim * 4)
+                log = (
+                    np.memmap(log_path, dtype=np.float32, mode="r", shape=(n_log, self.dim))
+                    if n_log else np.empty((0, self.dim), dtype=np.float32)
+                )
+            except FileNotFoundError:
+                if generation == previous:
+                    raise  # Missing for good, not replaced by a concurrent compaction
+                previous = generation  # Another process may have compacted meanwhile: re-read
+                continue
+            break
+        if base.shape[1] != self.dim:
+            raise ValueError(f"Store has dimension {base.shape[1]}, expected {self.dim}")
+        self.generation = generation
+        self._log_path = log_path
+        self._base, self._log = base, log
+
+    def __len__(self) -> int:
+        return len(self._base) + len(self._log)
+
+    @property
+    def log_size(self) -> int:
+        """Vectors waiting in the append log."""
+        return len(self._log)
+
+    def append(self, embeddings: np.ndarray, sync: bool = False) -> np.ndarray:
+        """Append vectors to the log and return their ids."""
+        embeddings = normalize(embeddings)
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected dimension {self.dim}, got {embeddings.shape[1]}")
+        record_size = self.dim * 4
+        with open(self._log_path, "ab") as f:
+            # Drop a torn trailing record left by a crash before appending
+            f.truncate(os.path.getsize(self._log_path) // record_size * record_size)
+            f.write(embeddings.tobytes())
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        start = len(self)
+        self.refresh()
+        return np.arange(start, start + len(embeddings))
+
+    def compact(self):
+        """
+        Merge the append log into the base file of the next generation, with
+        a new empty log, then switch generations by replacing manifest.json
+        atomically. A crash (or another process's refresh()) on either side of
+        that rename sees one consistent pair: the old base with the log it has
+        not merged, or the new base with an empty log. Readers that still map
+        the old files are unaffected when they are removed.
+        """
+        if not len(self._log):
+            return
+        old_paths = self._paths(self.generation)
+        generation = self.generation + 1
+        base_path, log_path = self._paths(generation)
+        merged = np.lib.format.open_memmap(
+            base_path, mode="w+", dtype=np.float32, shape=(len(self), self.dim)
+        )
+        merged[:len(self._base)] = self._base
+        merged[len(self._base):] = self._log
+        merged.flush()
+        del merged
+        open(log_path, "wb").close()
+        self._write_manifest(generation)  # The commit point
+        for path in old_paths:
+            os.remove(path)
+        self.refresh()
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        block_size: int = 262_144
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact top-k over base + log, scanned in blocks so only a bounded
+        slice of the mapping is touched per step.
+        """
+        queries = normalize(queries)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_ids = np.empty((len(queries), 0), dtype=np.int64)
+        offset = 0
+        for segment in (self._base, self._log):
+            for start in range(0, len(segment), block_size):
+                block = np.asarray(segment[start:start + block_size])
+                scores = queries @ block.T
+                block_scores, block_ids = top_k(scores, k)
+                merged_scores = np.concatenate([best_scores, block_scores], axis=1)
+                merged_ids = np.concatenate([best_ids, block_ids + offset + start], axis=1)
+                best_scores, order = top_k(merged_scores, k)
+                best_ids = np.take_along_axis(merged_ids, order, axis=1)
+            offset += len(segment)
+        return best_scores, best_ids
+
+
+def demonstrate_mmap_store():
+    """Append, search, compact and reopen a memory-mapped store."""
+    print("=== Memory-Mapped Vector Store ===")
+
+    rng = np.random.default_rng(0)
+    dim = 64
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MmapVectorStore(tmp, dim)
+        corpus = rng.standard_normal((10_000, dim)).astype(np.float32)
+        store.append(corpus[:8000])
+        store.compact()
+        store.append(corpus[8000:])
+        print(f"Base: {len(store) - store.log_size} vectors, append log: {store.log_size}")
+
+        _, ids = store.search(corpus[[5, 9500]], k=3)
+        print(f"Query for documents 5 and 9500 -> top ids {ids[:, 0].tolist()}")
+
+        store.compact()
+        reopened = MmapVectorStore(tmp, dim)  # What a new worker does at startup
+        print(f"After compaction: base {len(reopened)} vectors, log {reopened.log_size}")
+        print(f"Reopened store is a mapping, not a copy: {type(reopened._base).__name__}")
+
+    print("\nWhy memory-map:")
+    print("  - Startup maps the file instead of reading it (near-instant)")
+    print("  - N workers share one copy through the OS page cache")
+    print("  - New vectors go to an append log; compaction merges it")
+
+
+if __name__ == "__main__":
+    demonstrate_mmap_store()
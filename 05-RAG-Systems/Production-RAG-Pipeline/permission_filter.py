@@ -0,0 +1,280 @@
+"""
+Permission Filtering
+Metadata stored as columns with a bitmap per attribute value, so a `where`
+permission predicate compiles to bitmap AND/OR/NOT and is applied inside the
+top-k search: every result is permitted and there are always k of them.
+"""
+
+import json
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from similarity import UnitVectors, many_to_many, normalize
+from vector_index import VectorIndex, top_k
+
+Where = Dict[str, object]
+
+_OPERATORS = ("$eq", "$ne", "$in", "$nin")
+
+
+def matches(metadata: Dict[str, object], where: Where) -> bool:
+    """Evaluate a `where` clause against one metadata dict (per-candidate reference semantics)."""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$not":
+            if matches(metadata, condition):
+                return False
+        else:
+            operator, operand = next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+            if key not in metadata:
+                return False
+            value = metadata[key]
+            if not {
+                "$eq": lambda: value == operand,
+                "$ne": lambda: value != operand,
+                "$in": lambda: value in operand,
+                "$nin": lambda: value not in operand,
+            }[operator]():
+                return False
+    return True
+
+
+class MetadataColumns:
+    """
+    One dictionary-encoded int32 column per field (-1 where a row lacks the field).
+    Per (field, value) a bitmap of matching rows is packed 8 rows per byte
+    (np.packbits), built on first use and reused until the next write, so a
+    predicate costs a few bitwise operations over n/8 bytes per clause.
+    Compiled predicates are cached too (permission filters repeat per user).
+
+    Supported `where` syntax (ChromaDB-style): {"field": value},
+    {"field": {"$eq" | "$ne" | "$in" | "$nin": ...}}, {"$and": [...]},
+    {"$or": [...]}, {"$not": {...}}. Several keys in one dict are ANDed.
+    Values must be hashable scalars (str, int, bool).
+    """
+
+    def __init__(self, compiled_cache_size: int = 1024):
+        self._size = 0
+        self._capacity = 1024
+        self._columns: Dict[str, np.ndarray] = {}
+        self._codes: Dict[str, Dict[object, int]] = {}
+        self._bitmaps: Dict[Tuple[str, object], np.ndarray] = {}
+        self._compiled: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.compiled_cache_size = compiled_cache_size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, capacity: int):
+        if capacity <= self._capacity:
+            return
+        self._capacity = max(capacity, 2 * self._capacity)
+        for field, column in self._columns.items():
+            grown = np.full(self._capacity, -1, dtype=np.int32)
+            grown[:self._size] = column[:self._size]
+            self._columns[field] = grown
+
+    def add(self, metadatas: Sequence[Dict[str, object]]) -> np.ndarray:
+        """Append one metadata dict per row; returns the row ids."""
+        start, end = self._size, self._size + len(metadatas)
+        self._reserve(end)
+        for field in {field for metadata in metadatas for field in metadata}:
+            if field not in self._columns:
+                self._columns[field] = np.full(self._capacity, -1, dtype=np.int32)
+                self._codes[field] = {}
+            codes = self._codes[field]
+            self._columns[field][start:end] = [
+                codes.setdefault(metadata[field], len(codes)) if field in metadata else -1
+                for metadata in metadatas
+            ]
+        self._size = end
+        self._bitmaps.clear()
+        self._compiled.clear()
+        return np.arange(start, end)
+
+    def _bitmap(self, field: str, value) -> np.ndarray:
+        """Packed bitmap of rows where field == value (None: rows that have the field)."""
+        key = (field, value)
+        if key not in self._bitmaps:
+            column = self._columns.get(field)
+            if column is None:
+                bits = np.zeros(self._size, dtype=bool)
+            elif value is None:
+                bits = column[:self._size] >= 0
+            else:
+                code = self._codes[field].get(value)
+                bits = column[:self._size] == code if code is not None else np.zeros(self._size, dtype=bool)
+            self._bitmaps[key] = np.packbits(bits)
+        return self._bitmaps[key]
+
+    def _all(self) -> np.ndarray:
+        return np.packbits(np.ones(self._size, dtype=bool))  # Padding bits stay 0
+
+    def _compile(self, where: Where) -> np.ndarray:
+        result = self._all()
+        for key, condition in where.items():
+            if key == "$and":
+                bits = self._all()
+                for clause in condition:
+                    bits &= self._compile(clause)
+            elif key == "$or":
+                bits = np.zeros_like(result)
+                for clause in condition:
+                    bits |= self._compile(clause)
+            elif key == "$not":
+                bits = ~self._compile(condition) & self._all()
+            else:
+                operator, operand = next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+                if operator not in _OPERATORS:
+                    raise ValueError(f"Unsupported operator {operator!r}")
+                if operator in ("$eq", "$ne"):
+                    operand = [operand]
+                bits = np.zeros_like(result)
+                for value in operand:
+                    bits |= self._bitmap(key, value)
+                if operator in ("$ne", "$nin"):
+                    bits = ~bits & self._bitmap(key, None)
+            result &= bits
+        return result
+
+    def bitmap(self, where: Where) -> np.ndarray:
+        """Packed bitmap of the rows matching `where` (cached per predicate)."""
+        key = json.dumps(where, sort_keys=True, default=str)
+        bits = self._compiled.get(key)
+        if bits is None:
+            bits = self._compile(where)
+            self._compiled[key] = bits
+            if len(self._compiled) > self.compiled_cache_size:
+                self._compiled.popitem(last=False)
+        else:
+            self._compiled.move_to_end(key)
+        return bits
+
+    def mask(self, where: Where) -> np.ndarray:
+        """Boolean mask (one entry per row) of the rows matching `where`."""
+        return np.unpackbits(self.bitmap(where), count=self._size).view(bool)
+
+
+class FilteredVectorIndex:
+    """
+    VectorIndex plus MetadataColumns. search(queries, k, where) filters inside
+    the top-k selection instead of after it:
+    - selective filters (allowed rows < `dense_fraction` of the index): score
+      only the allowed rows
+    - broad filters: score every row, set disallowed rows to -inf, then top-k
+    Either way all k results satisfy `where` (fewer only if fewer rows do),
+    and rows deleted from the VectorIndex are never returned.
+    """
+
+    def __init__(self, dim: int, dense_fraction: float = 0.3):
+        self.index = VectorIndex(dim)
+        self.metadata = MetadataColumns()
+        self.dense_fraction = dense_fraction
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def add(self, embeddings: np.ndarray, metadatas: Sequence[Dict[str, object]]) -> np.ndarray:
+        if len(metadatas) != len(embeddings):
+            raise ValueError("embeddings and metadatas must have the same length")
+        ids = self.index.add(embeddings)  # Validates the embeddings before any metadata is written
+        try:
+            self.metadata.add(metadatas)
+        except Exception:
+            # Keep row ids aligned: the rows get empty metadata and are tombstoned
+            self.metadata.add([{}] * len(ids))
+            self.index.delete(ids)
+            raise
+        return ids
+
+    def delete(self, ids: Sequence[int]):
+        """Tombstone rows in the VectorIndex (their metadata bits stay; the mask excludes them)."""
+        self.index.delete(ids)
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        where: Optional[Where] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (scores, ids), shaped (n_queries, min(k, permitted rows)); without a
+        filter, VectorIndex.search's (n_queries, k) with -1 padding.
+        """
+        if where is None:
+            return self.index.search(queries, k)
+        queries = UnitVectors(normalize(queries), assume_normalized=True)
+        mask = self.metadata.mask(where) & ~self.index.deleted
+        allowed = np.flatnonzero(mask)
+        vectors = self.index.vectors
+        if len(allowed) < self.dense_fraction * len(mask):
+            subset = UnitVectors(vectors.data[allowed], dtype=vectors.data.dtype, assume_normalized=True)
+            scores, rows = top_k(many_to_many(queries, subset), k)
+            ids = allowed[rows]
+        else:
+            all_scores = many_to_many(queries, vectors)
+            all_scores[:, ~mask] = -np.inf
+            scores, ids = top_k(all_scores, min(k, len(allowed)))
+        return scores, ids
+
+
+def post_filter_search(
+    index: VectorIndex,
+    metadatas: List[Dict[str, object]],
+    queries: np.ndarray,
+    k: int,
+    where: Where,
+    oversample: int = 10
+) -> List[List[int]]:
+    """Baseline: fetch k * oversample unfiltered results, then check `where` per candidate."""
+    _, candidates = index.search(queries, k * oversample)
+    return [
+        [int(i) for i in row if i >= 0 and matches(metadatas[i], where)][:k]
+        for row in candidates
+    ]
+
+
+def demonstrate_permission_filter():
+    """The $or permission filter from permission_based_retrieval(), applied inside top-k."""
+    print("=== Bitmap Permission Filtering ===")
+
+    rng = np.random.default_rng(0)
+    n, dim = 50_000, 64
+    metadatas = [
+        {
+            "user_id": f"user_{rng.integers(2000)}",
+            "department": ["engineering", "sales", "legal", "hr", "finance"][rng.integers(5)],
+            "access_level": "public" if rng.random() < 0.002 else "internal",
+        }
+        for _ in range(n)
+    ]
+    index = FilteredVectorIndex(dim)
+    index.add(rng.standard_normal((n, dim)).astype(np.float32), metadatas)
+
+    where = {"$or": [
+        {"user_id": "user_42"},
+        {"$and": [{"department": "legal"}, {"access_level": {"$ne": "internal"}}]},
+        {"access_level": "public"},
+    ]}
+    permitted = index.metadata.mask(where)
+    reference = np.array([matches(metadata, where) for metadata in metadatas])
+    print(f"{permitted.sum()} of {n} chunks permitted; bitmap == per-row evaluation: "
+          f"{np.array_equal(permitted, reference)}")
+
+    queries = rng.standard_normal((3, dim)).astype(np.float32)
+    _, ids = index.search(queries, k=10, where=where)
+    print(f"Filtered top-10: {[len(row) for row in ids]} results per query, "
+          f"all permitted: {bool(reference[ids].all())}")
+    post = post_filter_search(index.index, metadatas, queries, 10, where)
+    print(f"Post-filtering the top-100: {[len(row) for row in post]} results per query")
+
+
+if __name__ == "__main__":
+    demonstrate_permission_filter()
@@ -0,0 +1,232 @@
+"""
+Product Quantization (PQ)
+Compress embeddings to a few bytes each and search them without decompressing.
+"""
+
+import os
+import tempfile
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from similarity import normalize
+from vector_index import VectorIndex, recall_at_k, top_k
+
+
+def kmeans(
+    vectors: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 15,
+    seed: int = 0
+) -> np.ndarray:
+    """Plain (Euclidean) k-means used to learn each sub-space codebook."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignments = nearest_centroid(vectors, centroids)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        occupied = np.nonzero(counts)[0]
+        order = np.argsort(assignments, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts[occupied])[:-1]))
+        sums[occupied] = np.add.reduceat(vectors[order], starts, axis=0)
+        centroids[occupied] = sums[occupied] / counts[occupied, None]
+        # Empty clusters keep their old centroid
+    return centroids
+
+
+def nearest_centroid(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """argmin ||x - c||^2, expanded so the heavy part is one matrix multiply."""
+    distances = vectors @ centroids.T
+    distances *= -2
+    distances += (centroids ** 2).sum(axis=1)
+    return np.argmin(distances, axis=1)
+
+
+class ProductQuantizer:
+    """
+    Splits each vector into n_subvectors slices and replaces every slice
+    with the id of its nearest codebook entry (256 entries = 1 byte).
+    A dim-1536 float32 vector (6 KB) becomes n_subvectors bytes.
+    """
+
+    def __init__(self, dim: int, n_subvectors: int = 192):
+        if dim % n_subvectors != 0:
+            raise ValueError(f"dim {dim} must be divisible by n_subvectors {n_subvectors}")
+        self.dim = dim
+        self.n_subvectors = n_subvectors
+        self.sub_dim = dim // n_subvectors
+        self.n_centroids = 256
+        self.codebooks: Optional[np.ndarray] = None  # (n_subvectors, 256, sub_dim)
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.n_subvectors
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dim) -> (n_subvectors, n, sub_dim) view-friendly layout."""
+        return vectors.reshape(len(vectors), self.n_subvectors, self.sub_dim).transpose(1, 0, 2)
+
+    def train(self, sample: np.ndarray, n_iter: int = 15):
+        """Learn one 256-entry codebook per sub-space from a training sample."""
+        sample = normalize(sample)
+        if len(sample) < self.n_centroids:
+            raise ValueError(f"Need at least {self.n_centroids} training vectors")
+        self.codebooks = np.stack([
+            kmeans(np.ascontiguousarray(sub), self.n_centroids, n_iter=n_iter, seed=j)
+            for j, sub in enumerate(self._split(sample))
+        ])
+
+    def encode(self, vectors: np.ndarray, batch_size: int = 16_384) -> np.ndarray:
+        """Normalize and encode vectors to uint8 codes shaped (n, n_subvectors)."""
+        if self.codebooks is None:
+            raise RuntimeError("ProductQuantizer must be trained before encoding")
+        vectors = np.atleast_2d(vectors)
+        codes = np.empty((len(vectors), self.n_subvectors), dtype=np.uint8)
+        for start in range(0, len(vectors), batch_size):
+            block = self._split(normalize(vectors[start:start + batch_size]))
+            for j, sub in enumerate(block):
+                codes[start:start + len(sub), j] = nearest_centroid(sub, self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Approximate reconstruction (used for inspection, not for search)."""
+        parts = [self.codebooks[j][codes[:, j]] for j in range(self.n_subvectors)]
+        return np.concatenate(parts, axis=1)
+
+    def lookup_tables(self, query: np.ndarray) -> np.ndarray:
+        """
+        Per-query tables of query-slice . codebook-entry, shaped (n_subvectors, 256).
+        The approximate score of any code is then the sum of n_subvectors table lookups.
+        """
+        sub_queries = normalize(query)[0].reshape(self.n_subvectors, 1, self.sub_dim)
+        return (sub_queries * self.codebooks).sum(axis=2)
+
+
+class PQIndex:
+    """
+    Compressed index: PQ codes in RAM, scored by asymmetric distance computation
+    (exact query vs compressed documents). Optionally keeps full-precision vectors
+    in a file on disk and re-ranks the top candidates against them.
+    """
+
+    def __init__(
+        self,
+        quantizer: ProductQuantizer,
+        rerank_path: Optional[str] = None
+    ):
+        self.quantizer = quantizer
+        # Codes are stored sub-space major so each table lookup scans contiguous memory
+        self._codes = np.empty((quantizer.n_subvectors, 1024), dtype=np.uint8)
+        self._size = 0
+        self.rerank_path = rerank_path
+        if rerank_path:
+            open(rerank_path, "wb").close()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, embeddings: np.ndarray) -> np.ndarray:
+        """Encode and append vectors; full-precision copies go to rerank_path."""
+        codes = self.quantizer.encode(embeddings)
+        end = self._size + len(codes)
+        if end > self._codes.shape[1]:
+            grown = np.empty((self.quantizer.n_subvectors, max(end, 2 * self._codes.shape[1])),
+                             dtype=np.uint8)
+            grown[:, :self._size] = self._codes[:, :self._size]
+            self._codes = grown
+        self._codes[:, self._size:end] = codes.T
+        if self.rerank_path:
+            with open(self.rerank_path, "ab") as f:
+                f.write(normalize(embeddings).tobytes())
+        ids = np.arange(self._size, self._size + len(codes))
+        self._size += len(codes)
+        return ids
+
+    def _full_vectors(self) -> np.ndarray:
+        """Full-precision vectors on disk; only the rows we touch are paged in."""
+        return np.memmap(self.rerank_path, dtype=np.float32, mode="r",
+                         shape=(self._size, self.quantizer.dim))
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        rerank: int = 0
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        ADC top-k search. With rerank > 0 (and a rerank_path), the best
+        max(k, rerank) ADC candidates are re-scored exactly from disk.
+        """
+        queries = normalize(queries)
+        n_candidates = max(k, rerank) if rerank and self.rerank_path else k
+        full = self._full_vectors() if n_candidates > k else None
+
+        all_scores = np.empty((len(queries), min(k, self._size)), dtype=np.float32)
+        all_ids = np.empty((len(queries), min(k, self._size)), dtype=np.int64)
+        for row, query in enumerate(queries):
+            table = self.quantizer.lookup_tables(query)
+            scores = np.zeros(self._size, dtype=np.float32)
+            for j in range(self.quantizer.n_subvectors):
+                scores += table[j].take(self._codes[j, :self._size])
+            candidate_scores, candidates = top_k(scores, n_candidates)
+            candidates, candidate_scores = candidates[0], candidate_scores[0]
+
+            if full is not None:
+                order = np.sort(candidates)  # Sequential disk reads
+                exact_scores = full[order] @ query
+                candidate_scores, best = top_k(exact_scores, k)
+                candidates, candidate_scores = order[best[0]], candidate_scores[0]
+
+            all_scores[row] = candidate_scores[:k]
+            all_ids[row] = candidates[:k]
+        return all_scores, all_ids
+
+    def memory_per_vector(self) -> int:
+        """Bytes of RAM per vector (codes only; full vectors live on disk)."""
+        return self.quantizer.bytes_per_vector
+
+
+def demonstrate_pq():
+    """Memory, throughput and recall of PQ with and without re-ranking."""
+    print("=== Product Quantization ===")
+
+    rng = np.random.default_rng(0)
+    dim, n = 256, 20_000
+    centers = rng.standard_normal((200, dim)).astype(np.float32)
+    corpus = centers[rng.integers(0, 200, n)] + rng.standard_normal((n, dim)).astype(np.float32)
+    queries = centers[rng.integers(0, 200, 50)] + rng.standard_normal((50, dim)).astype(np.float32)
+
+    exact = VectorIndex(dim)
+    exact.add(corpus)
+    _, true_ids = exact.search(queries, k=10)
+
+    quantizer = ProductQuantizer(dim, n_subvectors=32)
+    quantizer.train(corpus[:5000])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        index = PQIndex(quantizer, rerank_path=os.path.join(tmp, "full.f32"))
+        start = time.perf_counter()
+        index.add(corpus)
+        encode_rate = n / (time.perf_counter() - start)
+
+        print(f"Float32: {dim * 4} bytes/vector, PQ: {index.memory_per_vector()} bytes/vector "
+              f"({dim * 4 // index.memory_per_vector()}x smaller)")
+        print(f"Encode throughput: {encode_rate:,.0f} vectors/s")
+
+        _, found_ids = index.search(queries, k=10)
+        print(f"\nrecall@10 (ADC only):          {recall_at_k(found_ids, true_ids):.3f}")
+        _, found_ids = index.search(queries, k=10, rerank=100)
+        print(f"recall@10 (re-rank top 100):   {recall_at_k(found_ids, true_ids):.3f}")
+
+    print("\nHow it works:")
+    print("  1. Split vectors into sub-vectors, k-means each sub-space (256 centroids)")
+    print("  2. Store each sub-vector as 1 byte (its centroid id)")
+    print("  3. Per query: build a (sub-vectors x 256) lookup table once")
+    print("  4. Score = sum of table lookups (no decompression)")
+    print("  5. Optional: re-rank the top candidates with exact vectors from disk")
+
+
+if __name__ == "__main__":
+    demonstrate_pq()
@@ -16,12 +16,12 @@ def caching_strategy():
     print("  3. Retrieved chunks (if query is similar)")
     
     print("\nCaching layers:")
-    print("  - Embedding cache: Store document embeddings")
-    print("  - Query cache: Store query-answer pairs")
+    print("  - Embedding cache: Store document embeddings (embedding_cache.py: LRU + SQLite)")
+    print("  - Query cache: Store query-answer pairs (semantic_cache.py: near-duplicate queries, per tenant)")
     print("  - Chunk cache: Store retrieved chunks")
     
     print("\nImplementation:")
-    print("  - Redis: Fast, in-memory cache")
+    print("  - Redis: Fast, in-memory cache (tiered_cache.py: in-process L1 in front, coalesced misses)")
     print("  - Key: Query hash or embedding hash")
     print("  - TTL: Set expiration based on data freshness needs")
     
@@ -61,6 +61,8 @@ def multi_tenant_rag():
     print("  - Separate collections per tenant (ChromaDB)")
     print("  - Namespace/partition per tenant (Pinecone)")
     print("  - Metadata filtering (filter by tenant_id)")
+    print("    (scans every tenant's vectors; tenant_index.py keeps a shard per tenant instead)")
+    print("  - Bulk-load tenant data in large batches (bulk_writer.py; queries keep running)")
     print("  - Rate limiting per tenant")
     
     print("\nImplementation:")
@@ -96,7 +98,8 @@ def permission_based_retrieval():
     
     print("\nImplementation:")
     print("  1. Store permissions in metadata")
-    print("  2. Filter by permissions during retrieval")
+    print("  2. Filter by permissions during retrieval (permission_filter.py: bitmaps inside top-k)")
+    print("     (query_planner.py picks scan, ANN + post-filter or in-graph filter by selectivity)")
     print("  3. Apply permissions before LLM generation")
     
     print("\nExample:")
@@ -163,7 +166,7 @@ def monitoring_rag():
     
     print("\nImplementation:")
     print("  - Log all queries and responses")
-    print("  - Track metrics in time-series DB (e.g., Prometheus)")
+    print("  - Track metrics in time-series DB (e.g., Prometheus; tracing.py serves /metrics)")
     print("  - Set up alerts for anomalies")
     print("  - Dashboard for visualization")
 
@@ -179,15 +182,15 @@ def error_handling_rag():
         "LLM API error": "Fallback to simpler model or cached response",
         "No relevant chunks": "Return 'no information found' message",
         "Embedding failure": "Use keyword search as fallback",
-        "Context too long": "Reduce chunk count or use summarization",
+        "Context too long": "Pack chunks to the token budget up front (context_packer.py), or summarize",
     }
     
     for error, solution in errors.items():
         print(f"  {error}: {solution}")
     
     print("\nBest practices:")
-    print("  - Always have fallback strategies")
-    print("  - Implement circuit breakers")
+    print("  - Always have fallback strategies (resilience.py: FallbackChain)")
+    print("  - Implement circuit breakers (resilience.py: CircuitBreaker, hedged requests)")
     print("  - Log errors for debugging")
     print("  - Return user-friendly error messages")
     print("  - Monitor error rates")
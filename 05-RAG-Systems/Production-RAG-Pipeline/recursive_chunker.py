@@ -0,0 +1,165 @@
+"""
+Recursive Chunker
+Paragraph -> line -> sentence -> word -> character splitting in linear time:
+separator positions are found once and chunks are merged as index spans,
+so no intermediate substrings are built.
+"""
+
+import re
+from typing import Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+Span = Tuple[int, int]
+SpanLength = Callable[[int, int], int]     # length of text[start:end], without slicing
+LengthFn = Callable[[str], SpanLength]     # document -> span measure
+
+DEFAULT_SEPARATORS = ("\n\n", "\n", ". ", " ", "")
+
+
+def char_length(text: str) -> SpanLength:
+    return lambda start, end: end - start
+
+
+def word_length(text: str) -> SpanLength:
+    """Words in a span, from one prefix array of word start positions."""
+    starts = np.array([match.start() for match in re.finditer(r"\w+", text)], dtype=np.int64)
+    return lambda start, end: int(np.searchsorted(starts, end) - np.searchsorted(starts, start))
+
+
+def token_length(token_chunker) -> LengthFn:
+    """
+    Tokens in a span for a token_chunker.TokenChunker: the document is encoded
+    once and a span counts the tokens that start inside it.
+    """
+    def measure(text: str) -> SpanLength:
+        tokens = token_chunker.encode_batch([text])[0]
+        starts = token_chunker.token_char_offsets(text, tokens)[:-1]
+        return lambda start, end: int(np.searchsorted(starts, end) - np.searchsorted(starts, start))
+    return measure
+
+
+class RecursiveChunker:
+    """
+    Splits on the coarsest separator first and only re-splits pieces that are
+    still larger than chunk_size, then greedily merges neighbouring pieces up
+    to chunk_size. Separators stay attached to the piece before them, so chunks
+    are exact, contiguous slices of the document.
+
+    Separator positions are computed once per document (per level, on first use)
+    and located per span with a binary search; pieces are (start, end) indexes.
+    `length_fn(text)` returns measure(start, end): characters by default, or
+    word_length / token_length(TokenChunker) for token limits.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        separators: Sequence[str] = DEFAULT_SEPARATORS,
+        length_fn: LengthFn = char_length
+    ):
+        self.chunk_size = chunk_size
+        self.separators = tuple(separators)
+        self.length_fn = length_fn
+
+    def split_spans(self, text: str) -> List[Span]:
+        """Chunk boundaries as (start, end) character spans covering the whole text."""
+        measure = self.length_fn(text)
+        boundaries: Dict[int, np.ndarray] = {}
+
+        def separator_ends(level: int) -> np.ndarray:
+            """Position just after every occurrence of separators[level] (computed once)."""
+            if level not in boundaries:
+                separator = self.separators[level]
+                boundaries[level] = np.fromiter(
+                    (match.end() for match in re.finditer(re.escape(separator), text)), dtype=np.int64
+                )
+            return boundaries[level]
+
+        spans: List[Span] = []
+
+        def hard_split(start: int, end: int):
+            """Last resort: cut at the furthest position that fits (binary search on measure)."""
+            while start < end:
+                low, high = start + 1, end
+                while low < high:
+                    middle = (low + high + 1) // 2
+                    if measure(start, middle) <= self.chunk_size:
+                        low = middle
+                    else:
+                        high = middle - 1
+                spans.append((start, low))
+                start = low
+
+        def split(start: int, end: int, level: int):
+            if measure(start, end) <= self.chunk_size:
+                spans.append((start, end))
+                return
+            if level >= len(self.separators) or self.separators[level] == "":
+                hard_split(start, end)
+                return
+            ends = separator_ends(level)
+            cuts = ends[np.searchsorted(ends, start, side="right"):np.searchsorted(ends, end, side="left")]
+            if not len(cuts):
+                split(start, end, level + 1)
+                return
+
+            chunk_start = None
+            piece_start = start
+            for piece_end in [*cuts.tolist(), end]:
+                if chunk_start is not None and measure(chunk_start, piece_end) <= self.chunk_size:
+                    piece_start = piece_end  # Extend the current chunk with this piece
+                    continue
+                if chunk_start is not None:
+                    spans.append((chunk_start, piece_start))
+                if measure(piece_start, piece_end) > self.chunk_size:
+                    split(piece_start, piece_end, level + 1)
+                    chunk_start = None
+                else:
+                    chunk_start = piece_start
+                piece_start = piece_end
+            if chunk_start is not None:
+                spans.append((chunk_start, end))
+
+        if text:
+            split(0, len(text), 0)
+        return spans
+
+    def chunk(self, text: str) -> List[Dict[str, object]]:
+        """Chunks as {"text", "offset", "end"}; whitespace-only chunks are dropped."""
+        chunks = []
+        for start, end in self.split_spans(text):
+            piece = text[start:end]
+            if piece.strip():
+                chunks.append({"text": piece, "offset": start, "end": end})
+        return chunks
+
+
+def demonstrate_recursive_chunker():
+    """Structure-aware splits with character and word limits."""
+    print("=== Recursive Chunker ===")
+
+    document = (
+        "Refund policy.\n\n"
+        "Refunds go to the original payment method. Requests need the order number. "
+        "Damaged items are refunded first.\n\n"
+        "Shipping.\n\n"
+        "Shipping is free above fifty euros.\nExpress delivery takes one day.\n\n"
+        + "Supercalifragilisticexpialidocious" * 3
+    )
+    for name, chunker in [
+        ("120 characters", RecursiveChunker(chunk_size=120)),
+        ("12 words", RecursiveChunker(chunk_size=12, length_fn=word_length)),
+    ]:
+        chunks = chunker.chunk(document)
+        print(f"\nLimit {name}: {len(chunks)} chunks")
+        for chunk in chunks:
+            print(f"  [{chunk['offset']:>3}-{chunk['end']:>3}] {chunk['text'].strip()[:60]!r}")
+
+    spans = RecursiveChunker(chunk_size=120).split_spans(document)
+    print(f"\nSpans tile the document exactly: {''.join(document[s:e] for s, e in spans) == document}")
+    print("Token limits: RecursiveChunker(512, length_fn=token_length(TokenChunker()))")
+
+
+if __name__ == "__main__":
+    demonstrate_recursive_chunker()
@@ -0,0 +1,175 @@
+"""
+Reranker Stage
+Second-stage scoring of retrieved candidates with a cross-encoder, under a latency budget.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from local_embedder import tokenize
+
+Pair = Tuple[str, str]
+ScoreFn = Callable[[List[Pair]], np.ndarray]
+
+
+class OverlapCrossEncoder:
+    """
+    CPU-only stand-in for a cross-encoder: scores a (query, chunk) pair by the
+    fraction of query tokens found in the chunk. `cost_per_pair_ms` simulates
+    model latency so budgets can be exercised in tests.
+    """
+
+    def __init__(self, cost_per_pair_ms: float = 0.0):
+        self.cost_per_pair_ms = cost_per_pair_ms
+        self.pairs_scored = 0
+
+    def __call__(self, pairs: List[Pair]) -> np.ndarray:
+        if self.cost_per_pair_ms:
+            time.sleep(self.cost_per_pair_ms * len(pairs) / 1000)
+        self.pairs_scored += len(pairs)
+        scores = np.zeros(len(pairs), dtype=np.float32)
+        for i, (query, chunk) in enumerate(pairs):
+            query_tokens = set(tokenize(query))
+            if query_tokens and chunk:
+                scores[i] = len(query_tokens & set(tokenize(chunk))) / len(query_tokens)
+        return scores
+
+
+class Reranker:
+    """
+    Pipeline stage: takes the top-N (chunk_id, text) candidates from any retriever,
+    scores them in fixed-size (padded) batches, caches pair scores in an LRU keyed by
+    (query hash, chunk id), and stops scoring when the latency budget would be exceeded.
+    Candidates that were not scored keep their first-stage order after the reranked ones.
+    """
+
+    def __init__(
+        self,
+        score_fn: ScoreFn,
+        batch_size: int = 32,
+        cache_size: int = 10_000,
+        latency_budget_ms: Optional[float] = None
+    ):
+        self.score_fn = score_fn
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.latency_budget_ms = latency_budget_ms
+        self._cache: "OrderedDict[Tuple[str, Hashable], float]" = OrderedDict()
+        self._batch_ms: Optional[float] = None  # Moving average of one batch's latency
+
+    @staticmethod
+    def query_hash(query: str) -> str:
+        return hashlib.sha1(query.encode()).hexdigest()
+
+    def _cache_get(self, key) -> Optional[float]:
+        score = self._cache.get(key)
+        if score is not None:
+            self._cache.move_to_end(key)
+        return score
+
+    def _cache_put(self, key, score: float):
+        self._cache[key] = score
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _score_batch(self, query: str, texts: List[str]) -> np.ndarray:
+        """Pad to batch_size so the model always sees the same shape."""
+        pairs = [(query, text) for text in texts]
+        pairs += [(query, "")] * (self.batch_size - len(pairs))
+        start = time.perf_counter()
+        scores = np.asarray(self.score_fn(pairs))[:len(texts)]
+        elapsed = (time.perf_counter() - start) * 1000
+        self._batch_ms = elapsed if self._batch_ms is None else 0.8 * self._batch_ms + 0.2 * elapsed
+        return scores
+
+    def rerank(
+        self,
+        query: str,
+        candidates: Sequence[Tuple[Hashable, str]],
+        top_n: Optional[int] = None
+    ) -> Tuple[List[Tuple[Hashable, Optional[float]]], Dict[str, float]]:
+        """
+        Returns ([(chunk_id, score or None), ...], stats).
+        Scored candidates come first (best first); unscored ones follow in
+        first-stage order with score None.
+        """
+        start = time.perf_counter()
+        query_key = self.query_hash(query)
+        scores: Dict[int, float] = {}
+        pending: List[int] = []
+        for position, (chunk_id, _) in enumerate(candidates):
+            cached = self._cache_get((query_key, chunk_id))
+            if cached is None:
+                pending.append(position)
+            else:
+                scores[position] = cached
+        cache_hits = len(scores)
+
+        for batch_start in range(0, len(pending), self.batch_size):
+            if self.latency_budget_ms is not None and self._batch_ms is not None:
+                elapsed = (time.perf_counter() - start) * 1000
+                if elapsed + self._batch_ms > self.latency_budget_ms:
+                    break  # Next batch would blow the budget
+            batch = pending[batch_start:batch_start + self.batch_size]
+            batch_scores = self._score_batch(query, [candidates[p][1] for p in batch])
+            for position, score in zip(batch, batch_scores.tolist()):
+                scores[position] = score
+                self._cache_put((query_key, candidates[position][0]), score)
+
+        reranked = sorted(scores, key=lambda position: (-scores[position], position))
+        unscored = [p for p in range(len(candidates)) if p not in scores]
+        results = [(candidates[p][0], scores[p]) for p in reranked]
+        results += [(candidates[p][0], None) for p in unscored]
+
+        stats = {
+            "candidates": len(candidates),
+            "cache_hits": cache_hits,
+            "scored": len(scores) - cache_hits,
+            "fallback": len(unscored),
+            "elapsed_ms": (time.perf_counter() - start) * 1000,
+        }
+        return results[:top_n] if top_n else results, stats
+
+
+def demonstrate_reranker():
+    """Budgeted reranking with cache reuse on a repeated query."""
+    print("=== Reranker Stage ===")
+
+    candidates = [
+        (f"chunk-{i}", text) for i, text in enumerate([
+            "Cooking pasta takes ten minutes",
+            "Refund requests are handled by support",
+            "How to request a refund for an order",
+            "Shipping usually takes three days",
+            "Refund policy: returns within 30 days get a full refund",
+        ] * 20)
+    ]
+    query = "refund policy for returns"
+
+    scorer = OverlapCrossEncoder(cost_per_pair_ms=0.5)
+    reranker = Reranker(scorer, batch_size=16, latency_budget_ms=25)
+
+    results, stats = reranker.rerank(query, candidates, top_n=3)
+    print(f"Query: '{query}' ({len(candidates)} candidates, budget 25 ms)")
+    for chunk_id, score in results:
+        print(f"  {chunk_id}: {score:.2f}")
+    print(f"Scored {stats['scored']}, fallback order for {stats['fallback']}, "
+          f"{stats['elapsed_ms']:.1f} ms")
+
+    _, stats = reranker.rerank(query, candidates, top_n=3)
+    print(f"Same query again: {stats['cache_hits']} cache hits, scored {stats['scored']} more, "
+          f"fallback {stats['fallback']}, {stats['elapsed_ms']:.1f} ms")
+
+    print("\nDesign:")
+    print("  - Padded fixed-size batches (efficient on GPU/ONNX runtimes)")
+    print("  - LRU cache keyed by (query hash, chunk id)")
+    print("  - Budget: stop before a batch that would exceed it, keep first-stage order for the rest")
+
+
+if __name__ == "__main__":
+    demonstrate_reranker()
@@ -0,0 +1,314 @@
+"""
+Resilience for RAG Dependencies
+Circuit breakers with half-open probing, hedged requests after a p95-based
+delay, and a declarative fallback chain (vector -> keyword -> cached answer).
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class ServiceError(Exception):
+    """Raised by a dependency call that failed."""
+
+
+class CircuitOpenError(ServiceError):
+    """Raised without calling the dependency while its circuit is open."""
+
+
+class AllFallbacksFailed(ServiceError):
+    def __init__(self, errors: Dict[str, Optional[BaseException]]):
+        super().__init__(f"every fallback failed: {errors}")
+        self.errors = errors
+
+
+class CircuitBreaker:
+    """
+    closed:    calls pass; `failure_threshold` consecutive failures open the circuit
+    open:      calls are rejected immediately (no waiting on a dead dependency)
+               until `reset_timeout_s` has passed, then the circuit is half-open
+    half_open: up to `half_open_probes` trial calls pass; a success closes the
+               circuit, a failure opens it again for another reset_timeout_s
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout_s: float = 30.0,
+        half_open_probes: int = 1,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self.stats = {"rejected": 0, "opened": 0, "closed": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance()
+            return self._state
+
+    def _advance(self):
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout_s:
+            self._state, self._probes = self.HALF_OPEN, 0
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (reserves a probe slot when half-open)."""
+        with self._lock:
+            self._advance()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+            self.stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self.stats["closed"] += 1
+            self._state, self._failures = self.CLOSED, 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._state, self._opened_at = self.OPEN, self.clock()
+                self.stats["opened"] += 1
+
+
+class Dependency:
+    """
+    A remote call (vector DB, embedding API, LLM) behind a circuit breaker.
+
+    - timeout_s: give up waiting (the call counts as a failure)
+    - hedge: if no response after the `hedge_percentile` latency of recent
+      successful calls, send one duplicate request and take whichever answers
+      first; only for idempotent calls, and the slower attempt is left to finish
+      in the background
+    Counters in `stats`: calls, failures, rejected, timeouts, hedges, hedge_wins.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        breaker: Optional[CircuitBreaker] = None,
+        timeout_s: Optional[float] = None,
+        hedge: bool = False,
+        hedge_percentile: float = 95,
+        min_samples: int = 20,
+        max_workers: int = 32
+    ):
+        self.name = name
+        self.fn = fn
+        self.breaker = breaker or CircuitBreaker(name)
+        self.timeout_s = timeout_s
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.latencies: Deque[float] = deque(maxlen=500)
+        self.stats = {"calls": 0, "failures": 0, "rejected": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging; None until enough latencies are known."""
+        if not self.hedge or len(self.latencies) < self.min_samples:
+            return None
+        return float(np.percentile(self.latencies, self.hedge_percentile))
+
+    def __call__(self, *args, **kwargs):
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError(f"{self.name}: circuit open")
+        self._count("calls")
+        start = time.perf_counter()
+        try:
+            result = self._attempt(args, kwargs)
+        except Exception:
+            self._count("failures")
+            self.breaker.record_failure()
+            raise
+        self.latencies.append(time.perf_counter() - start)
+        self.breaker.record_success()
+        return result
+
+    def _attempt(self, args, kwargs):
+        delay = self.hedge_delay()
+        if delay is None and self.timeout_s is None:
+            return self.fn(*args, **kwargs)
+
+        start = time.perf_counter()
+        primary = self._pool.submit(self.fn, *args, **kwargs)
+        pending = {primary}
+        deadline = None if self.timeout_s is None else start + self.timeout_s
+        hedge_at = None if delay is None else start + delay
+        error: Optional[BaseException] = None
+        while pending:
+            waits = [moment - time.perf_counter() for moment in (deadline, hedge_at) if moment is not None]
+            done, pending = wait(pending, timeout=max(min(waits), 0.0) if waits else None,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    return future.result()
+                error = future.exception()
+            now = time.perf_counter()
+            if deadline is not None and now >= deadline:
+                self._count("timeouts")
+                raise TimeoutError(f"{self.name}: no response within {self.timeout_s:.3f} s")
+            if hedge_at is not None and now >= hedge_at and pending:
+                pending.add(self._pool.submit(self.fn, *args, **kwargs))
+                self._count("hedges")
+                hedge_at = None
+        raise error
+
+    def close(self):
+        """Stop the worker threads; calls still hanging past their timeout are abandoned."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class FallbackChain:
+    """
+    Declarative fallbacks: FallbackChain([("vector", ...), ("keyword", ...), ("cached", ...)]).
+    Steps run in order until one returns a result; an exception (including an
+    open circuit) or None moves on to the next step. Returns (result, step name);
+    `served` counts answers per step.
+    """
+
+    def __init__(self, steps: Sequence[Tuple[str, Callable]]):
+        self.steps = list(steps)
+        self.served: Dict[str, int] = {name: 0 for name, _ in self.steps}
+
+    def __call__(self, *args, **kwargs) -> Tuple[object, str]:
+        errors: Dict[str, Optional[BaseException]] = {}
+        for name, step in self.steps:
+            try:
+                result = step(*args, **kwargs)
+            except Exception as error:
+                errors[name] = error
+                continue
+            if result is None:
+                errors[name] = None
+                continue
+            self.served[name] += 1
+            return result, name
+        raise AllFallbacksFailed(errors)
+
+
+class FakeService:
+    """
+    Local stand-in for a remote dependency: base latency, a slow tail
+    (slow_rate of calls take slow_ms), random errors, and `down` for outages.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        respond: Callable = lambda *args, **kwargs: "ok",
+        latency_ms: float = 5.0,
+        slow_rate: float = 0.0,
+        slow_ms: float = 200.0,
+        error_rate: float = 0.0,
+        seed: int = 0
+    ):
+        self.name = name
+        self.respond = respond
+        self.latency_ms = latency_ms
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.down = False
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        if self.down:
+            time.sleep(self.latency_ms / 1000)
+            raise ServiceError(f"{self.name} unavailable")
+        slow = self._random.random() < self.slow_rate
+        time.sleep((self.slow_ms if slow else self.latency_ms) / 1000)
+        if self._random.random() < self.error_rate:
+            raise ServiceError(f"{self.name} error")
+        return self.respond(*args, **kwargs)
+
+
+def demonstrate_resilience():
+    """A vector DB outage: breaker opens, keyword search answers, a probe closes it again; then hedging."""
+    print("=== Resilience: Circuit Breakers, Fallbacks, Hedging ===")
+
+    now = [0.0]
+    vector_db = FakeService("vector_db", lambda query: [f"vector hit for {query!r}"], latency_ms=5)
+    keyword = FakeService("keyword", lambda query: [f"keyword hit for {query!r}"], latency_ms=2)
+    vector = Dependency("vector_db", vector_db, CircuitBreaker("vector_db", 3, reset_timeout_s=30,
+                                                               clock=lambda: now[0]), timeout_s=0.5)
+    keyword_search = Dependency("keyword", keyword)
+    answers_cache = {"what is rag": ["cached answer for 'what is rag'"]}
+    chain = FallbackChain([
+        ("vector", vector),
+        ("keyword", keyword_search),
+        ("cached", lambda query: answers_cache.get(query)),
+    ])
+
+    def ask(label: str, query: str = "what is rag"):
+        result, source = chain(query)
+        print(f"  {label:<28} breaker={vector.breaker.state:<9} served by {source:<8} {result[0]}")
+
+    ask("healthy")
+    vector_db.down = True
+    for i in range(4):
+        ask(f"vector DB down, request {i + 1}")
+    print(f"  vector DB calls during the outage: {vector_db.calls - 1} (later requests fail fast)")
+    keyword.down = True
+    ask("keyword search down too")
+    keyword.down = False
+    now[0] += 31  # reset_timeout_s passes
+    vector_db.down = False
+    ask("after reset timeout (probe)")
+    print(f"  served per step: {chain.served}, breaker {vector.breaker.stats}")
+    vector.close()
+    keyword_search.close()
+
+    print("\nHedging a dependency with a slow tail (3% of calls take 200 ms):")
+    for hedge in (False, True):
+        llm = Dependency("llm", FakeService("llm", latency_ms=10, slow_rate=0.03, slow_ms=200, seed=1), hedge=hedge)
+        latencies = []
+        for _ in range(300):
+            start = time.perf_counter()
+            llm("prompt")
+            latencies.append((time.perf_counter() - start) * 1000)
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"  hedge={str(hedge):<5} p50 {p50:6.1f} ms  p99 {p99:6.1f} ms  "
+              f"hedges sent {llm.stats['hedges']}, won {llm.stats['hedge_wins']}")
+        llm.close()
+
+
+if __name__ == "__main__":
+    demonstrate_resilience()
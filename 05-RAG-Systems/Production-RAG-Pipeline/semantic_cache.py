@@ -0,0 +1,217 @@
+"""
+Semantic Query Cache
+Serves cached answers for near-duplicate questions ("What is RAG?" / "what is rag",
+"Explain RAG") instead of calling the LLM again.
+"""
+
+import bisect
+import hashlib
+import re
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from local_embedder import HashingEmbedder
+from similarity import UnitVectors
+from vector_index import VectorIndex
+
+
+class InMemoryKV:
+    """
+    Local stand-in for the Redis calls the cache uses (get, set with ex=TTL,
+    delete), so the cache runs in tests and demos without a server.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._data: Dict[str, Tuple[object, Optional[float]]] = {}
+
+    def get(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and self.clock() >= expires_at:
+            self._data.pop(key, None)  # Another thread may have expired it first
+            return None
+        return value
+
+    def set(self, key: str, value, ex: Optional[float] = None):
+        self._data[key] = (value, None if ex is None else self.clock() + ex)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form used for the exact-match key."""
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+
+class _TenantEntries:
+    """One tenant's query vectors plus, per vector id, its store key and expiry time."""
+
+    def __init__(self, dim: int):
+        self.index = VectorIndex(dim, initial_capacity=64)
+        self.keys: List[str] = []
+        self.expires_at: List[float] = []
+        self.expired_upto = 0  # Entries before this position are already tombstoned
+
+
+class SemanticCache:
+    """
+    Lookup order for a query, always scoped to one tenant:
+    1. exact key: hash of the normalized query text (no embedding needed)
+    2. semantic: embed the query, nearest cached queries in the tenant's index;
+       a hit is the best of the top `candidates` with cosine similarity >=
+       threshold that has not expired or been evicted (those are tombstoned)
+    Entries expire after ttl_s (in the store via TTL, in the index lazily).
+    Answers live in `store` (Redis in production, InMemoryKV in tests); the
+    query-vector index is in-process and rebuilt from new traffic after restarts.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[Sequence[str]], np.ndarray],
+        dim: int,
+        threshold: float = 0.9,
+        ttl_s: float = 3600,
+        store=None,
+        clock: Callable[[], float] = time.monotonic,
+        candidates: int = 4
+    ):
+        self.embed_fn = embed_fn
+        self.dim = dim
+        self.threshold = threshold
+        self.candidates = candidates
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self.store = store if store is not None else InMemoryKV(clock)
+        self._tenants: Dict[str, _TenantEntries] = {}
+        self.stats = {"lookups": 0, "exact_hits": 0, "semantic_hits": 0, "saved_ms": 0.0}
+
+    @staticmethod
+    def _exact_key(tenant: str, query: str) -> str:
+        return f"qcache:{tenant}:exact:{hashlib.sha1(normalize_query(query).encode()).hexdigest()}"
+
+    def _entries(self, tenant: str) -> _TenantEntries:
+        if tenant not in self._tenants:
+            self._tenants[tenant] = _TenantEntries(self.dim)
+        return self._tenants[tenant]
+
+    def _hit(self, entry: dict, started: float, kind: str) -> str:
+        self.stats[kind] += 1
+        lookup_ms = (time.perf_counter() - started) * 1000
+        self.stats["saved_ms"] += max(entry["compute_ms"] - lookup_ms, 0.0)
+        return entry["answer"]
+
+    def lookup(self, query: str, tenant: str = "default") -> Optional[str]:
+        """Cached answer for this query (or a near-duplicate), or None."""
+        started = time.perf_counter()
+        self.stats["lookups"] += 1
+        entry = self.store.get(self._exact_key(tenant, query))
+        if entry is not None:
+            return self._hit(entry, started, "exact_hits")
+
+        entries = self._tenants.get(tenant)
+        if entries is None or not len(entries.index):
+            return None
+        scores, ids = entries.index.search(self.embed_fn([query]), k=self.candidates)
+        now = self.clock()
+        for score, vector_id in zip(scores[0].tolist(), ids[0].tolist()):
+            if vector_id < 0 or score < self.threshold:
+                break
+            if now >= entries.expires_at[vector_id]:
+                entries.index.delete([vector_id])
+                continue
+            entry = self.store.get(entries.keys[vector_id])
+            if entry is None:  # Evicted from the store independently
+                entries.index.delete([vector_id])
+                continue
+            return self._hit(entry, started, "semantic_hits")
+        return None
+
+    def put(self, query: str, answer: str, tenant: str = "default", compute_ms: float = 0.0):
+        """Cache an answer; compute_ms (the cost of producing it) feeds the latency-saved metric."""
+        entries = self._entries(tenant)
+        self._expire(entries)
+        key = self._exact_key(tenant, query)
+        self.store.set(key, {"answer": answer, "compute_ms": compute_ms}, ex=self.ttl_s)
+        entries.index.add(self.embed_fn([query]))
+        entries.keys.append(key)
+        entries.expires_at.append(self.clock() + self.ttl_s)
+
+    def _expire(self, entries: _TenantEntries):
+        """With one TTL, expiry times are sorted by insertion: tombstone the expired prefix."""
+        upto = bisect.bisect_right(entries.expires_at, self.clock())
+        if upto > entries.expired_upto:
+            entries.index.delete(np.arange(entries.expired_upto, upto))
+            entries.expired_upto = upto
+        n_dead = len(entries.keys) - len(entries.index)
+        if n_dead >= 1024 and 2 * n_dead > len(entries.keys):
+            # Mostly tombstones (expired or evicted): rebuild from the live rows so memory tracks live entries
+            live = np.flatnonzero(~entries.index.deleted)
+            index = VectorIndex(self.dim, initial_capacity=2 * len(live))
+            index.add(UnitVectors(entries.index.vectors.data[live], assume_normalized=True))
+            entries.index = index
+            entries.keys = [entries.keys[i] for i in live]
+            entries.expires_at = [entries.expires_at[i] for i in live]
+            entries.expired_upto = 0
+
+    def get_or_compute(
+        self,
+        query: str,
+        compute_fn: Callable[[str], str],
+        tenant: str = "default"
+    ) -> Tuple[str, bool]:
+        """(answer, cache_hit). On a miss, compute_fn(query) runs and is cached."""
+        answer = self.lookup(query, tenant)
+        if answer is not None:
+            return answer, True
+        start = time.perf_counter()
+        answer = compute_fn(query)
+        self.put(query, answer, tenant, (time.perf_counter() - start) * 1000)
+        return answer, False
+
+    def hit_rate(self) -> float:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        return hits / self.stats["lookups"] if self.stats["lookups"] else 0.0
+
+    def avg_saved_ms(self) -> float:
+        hits = self.stats["exact_hits"] + self.stats["semantic_hits"]
+        return self.stats["saved_ms"] / hits if hits else 0.0
+
+
+def demonstrate_semantic_cache():
+    """Near-duplicate questions hit, other tenants and expired entries miss."""
+    print("=== Semantic Query Cache ===")
+
+    now = [0.0]
+    embedder = HashingEmbedder(dim=256)
+    cache = SemanticCache(embedder.embed, dim=256, threshold=0.8, ttl_s=600, clock=lambda: now[0])
+
+    def slow_llm(query: str) -> str:
+        time.sleep(0.05)  # Simulated generation latency
+        return f"Answer to: {query}"
+
+    for query, tenant in [
+        ("What is RAG?", "acme"),
+        ("what is rag", "acme"),               # Exact after normalization
+        ("What is RAG exactly?", "acme"),      # Semantic near-duplicate
+        ("How do refunds work?", "acme"),
+        ("What is RAG?", "globex"),            # Other tenant: never shares answers
+    ]:
+        answer, hit = cache.get_or_compute(query, slow_llm, tenant)
+        print(f"  [{tenant:>6}] {query:<24} {'HIT ' if hit else 'miss'} -> {answer}")
+
+    now[0] += 601  # TTL passes
+    _, hit = cache.get_or_compute("What is RAG exactly?", slow_llm, "acme")
+    print(f"  After TTL: 'What is RAG exactly?' {'HIT' if hit else 'miss'}")
+
+    print(f"\nHit rate {cache.hit_rate():.0%}, {cache.avg_saved_ms():.1f} ms saved per hit "
+          f"({cache.stats['exact_hits']} exact, {cache.stats['semantic_hits']} semantic)")
+
+
+if __name__ == "__main__":
+    demonstrate_semantic_cache()
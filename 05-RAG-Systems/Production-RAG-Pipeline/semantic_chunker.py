@@ -0,0 +1,159 @@
+"""
+Semantic Chunker
+Splits a document where the meaning shifts: at sentence pairs whose embeddings
+are unusually far apart, within minimum and maximum chunk sizes.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from chunking_strategies import iter_sentence_chunks
+from local_embedder import HashingEmbedder, tokenize
+from similarity import pairwise
+
+SemanticChunk = Dict[str, object]  # {"text", "offset", "end", "n_tokens"}
+
+
+def word_count(text: str) -> int:
+    return len(tokenize(text))
+
+
+class SemanticChunker:
+    """
+    1. Split the document into sentences
+    2. Embed sentences in batches (vectors cached by sentence hash)
+    3. Cosine distance between each pair of adjacent sentences, in one vectorized pass
+    4. Break where the distance is above the `percentile` of this document's distances,
+       but only once a chunk has min_tokens, and always before it exceeds max_tokens
+
+    The cache makes re-chunking with a different threshold or size limits free
+    of embedding calls; it keeps the `cache_size` most recently used sentences. `length_fn` measures tokens (default: word count; pass a
+    real tokenizer count, e.g. from token_chunker, for model-accurate limits).
+    """
+
+    def __init__(
+        self,
+        embed_fn: Callable[[Sequence[str]], np.ndarray],
+        percentile: float = 90.0,
+        min_tokens: int = 50,
+        max_tokens: int = 512,
+        batch_size: int = 64,
+        length_fn: Callable[[str], int] = word_count,
+        cache_size: int = 50_000
+    ):
+        self.embed_fn = embed_fn
+        self.percentile = percentile
+        self.min_tokens = min_tokens
+        self.max_tokens = max_tokens
+        self.batch_size = batch_size
+        self.length_fn = length_fn
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    @staticmethod
+    def sentence_hash(sentence: str) -> str:
+        return hashlib.sha1(sentence.encode()).hexdigest()
+
+    def _embed(self, sentences: List[str]) -> Tuple[np.ndarray, int]:
+        """Embeddings for all sentences; only cache misses reach embed_fn. Returns (vectors, misses)."""
+        keys = [self.sentence_hash(sentence) for sentence in sentences]
+        vectors: Dict[str, np.ndarray] = {}  # This call's vectors, safe from eviction mid-document
+        for key in dict.fromkeys(keys):
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                vectors[key] = self._cache[key]
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        texts = {key: sentence for key, sentence in zip(keys, sentences)}
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            for key, vector in zip(batch, self.embed_fn([texts[key] for key in batch])):
+                vectors[key] = self._cache[key] = vector
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return np.stack([vectors[key] for key in keys]), len(missing)
+
+    def breakpoints(self, embeddings: np.ndarray, percentile: float) -> np.ndarray:
+        """Boolean per adjacent pair: True where a chunk boundary is allowed."""
+        distances = 1.0 - pairwise(embeddings[:-1], embeddings[1:])
+        return distances > np.percentile(distances, percentile)
+
+    def chunk(
+        self,
+        text: str,
+        percentile: Optional[float] = None
+    ) -> Tuple[List[SemanticChunk], Dict[str, float]]:
+        """
+        Returns (chunks, timings). timings has "embed_ms", "split_ms",
+        "sentences" and "embedded" (sentences sent to the model this call).
+        """
+        percentile = self.percentile if percentile is None else percentile
+        sentences = list(iter_sentence_chunks(text, max_sentences=1))
+        timings = {"embed_ms": 0.0, "split_ms": 0.0, "sentences": len(sentences), "embedded": 0}
+        if not sentences:
+            return [], timings
+
+        start = time.perf_counter()
+        embeddings, timings["embedded"] = self._embed([sentence for _, sentence in sentences])
+        timings["embed_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        is_break = self.breakpoints(embeddings, percentile) if len(sentences) > 1 else np.empty(0, bool)
+        lengths = [self.length_fn(sentence) for _, sentence in sentences]
+        chunks = []
+        first, size = 0, 0
+        for i, length in enumerate(lengths):
+            if i > first and size + length > self.max_tokens:
+                chunks.append(self._make_chunk(text, sentences, first, i, size))
+                first, size = i, 0
+            size += length
+            if i + 1 < len(sentences) and is_break[i] and size >= self.min_tokens:
+                chunks.append(self._make_chunk(text, sentences, first, i + 1, size))
+                first, size = i + 1, 0
+        if first < len(sentences):
+            chunks.append(self._make_chunk(text, sentences, first, len(sentences), size))
+        timings["split_ms"] = (time.perf_counter() - start) * 1000
+        return chunks, timings
+
+    @staticmethod
+    def _make_chunk(text: str, sentences, first: int, last: int, size: int) -> SemanticChunk:
+        """Chunk covering sentences[first:last], as an exact slice of the document."""
+        offset = sentences[first][0]
+        end = sentences[last - 1][0] + len(sentences[last - 1][1])
+        return {"text": text[offset:end], "offset": offset, "end": end, "n_tokens": size}
+
+
+def demonstrate_semantic_chunker():
+    """Topic shifts become chunk boundaries; re-chunking reuses cached embeddings."""
+    print("=== Semantic Chunker ===")
+
+    document = " ".join([
+        "A refund goes to the original payment method.",
+        "A refund request must include the order number.",
+        "A refund for damaged items is processed first.",
+        "Shipping is free for orders above fifty euros.",
+        "Express shipping delivers orders within one day.",
+        "Shipping orders to islands takes longer.",
+        "A password must have at least twelve characters.",
+        "Reset a forgotten password from the login page.",
+        "A password expires every ninety days.",
+    ])
+    embedder = HashingEmbedder(dim=256)
+    chunker = SemanticChunker(embedder.embed, percentile=60, min_tokens=10, max_tokens=30)
+
+    chunks, timings = chunker.chunk(document)
+    print(f"{timings['sentences']} sentences -> {len(chunks)} chunks "
+          f"(embed {timings['embed_ms']:.2f} ms, split {timings['split_ms']:.2f} ms)")
+    for chunk in chunks:
+        print(f"  [{chunk['offset']:>3}-{chunk['end']:>3}] {chunk['n_tokens']:>2} words: {chunk['text'][:60]}...")
+
+    chunks, timings = chunker.chunk(document, percentile=30)
+    print(f"\nRe-chunk at percentile 30: {len(chunks)} chunks, "
+          f"{timings['embedded']} sentences re-embedded ({embedder.calls} embedding calls in total)")
+
+
+if __name__ == "__main__":
+    demonstrate_semantic_chunker()
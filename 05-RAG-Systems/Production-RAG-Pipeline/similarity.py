@@ -0,0 +1,115 @@
+"""
+Similarity Kernels
+Cosine similarity over whole matrices, with vectors normalized once at ingest.
+"""
+
+from typing import Optional, Union
+
+import numpy as np
+
+
+class UnitVectors:
+    """
+    Embeddings that are already L2-normalized, marked with a flag so no kernel
+    normalizes them again. Cosine similarity on UnitVectors is a plain dot product.
+    Use float16 storage to halve memory; kernels compute in float32.
+    """
+
+    normalized = True
+
+    def __init__(self, vectors: np.ndarray, dtype=np.float32, assume_normalized: bool = False):
+        vectors = np.asarray(vectors)
+        self.data = (
+            np.ascontiguousarray(vectors, dtype=dtype) if assume_normalized
+            else normalize(vectors).astype(dtype, copy=False)
+        )
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+
+Vectors = Union[np.ndarray, UnitVectors]
+
+
+def normalize(vectors: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """L2-normalize rows as float32 (1-D input becomes one row); zero rows stay zero."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    if out is None:
+        out = np.zeros_like(vectors)
+    return np.divide(vectors, norms, out=out, where=norms > 0)
+
+
+def as_unit(vectors: Vectors) -> np.ndarray:
+    """float32/float16 unit rows: a no-op for UnitVectors, one normalization otherwise."""
+    if isinstance(vectors, UnitVectors):
+        return vectors.data
+    return normalize(vectors)
+
+
+def cosine_similarity(a: Vectors, b: Vectors) -> float:
+    """Cosine similarity of two single vectors: dot(a, b) / (|a| * |b|)."""
+    return float(pairwise(a, b)[0])
+
+
+def pairwise(a: Vectors, b: Vectors, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Row-by-row similarity: out[i] = cos(a[i], b[i]). Shapes (n, d), (n, d) -> (n,)."""
+    a, b = as_unit(a), as_unit(b)
+    if out is None:
+        out = np.empty(len(a), dtype=np.float32)
+    return np.einsum("ij,ij->i", a, b, out=out, dtype=np.float32, casting="unsafe")
+
+
+def one_to_many(
+    query: Vectors,
+    docs: Vectors,
+    out: Optional[np.ndarray] = None,
+    block_size: int = 65_536
+) -> np.ndarray:
+    """Similarity of one query to every document. Shapes (d,), (n, d) -> (n,)."""
+    if out is None:
+        out = np.empty(len(docs), dtype=np.float32)
+    many_to_many(query, docs, out=out.reshape(1, -1), block_size=block_size)
+    return out
+
+
+def many_to_many(
+    queries: Vectors,
+    docs: Vectors,
+    out: Optional[np.ndarray] = None,
+    block_size: int = 65_536
+) -> np.ndarray:
+    """
+    Similarity matrix between queries and documents. Shapes (m, d), (n, d) -> (m, n).
+    Pass a preallocated float32 `out` to avoid allocating per call. float16 documents
+    are upcast one block at a time, so the float32 copy never exceeds block_size rows.
+    """
+    queries = as_unit(queries).astype(np.float32, copy=False)
+    docs = as_unit(docs)
+    if out is None:
+        out = np.empty((len(queries), len(docs)), dtype=np.float32)
+    if docs.dtype == np.float32:
+        return np.matmul(queries, docs.T, out=out)
+
+    for start in range(0, len(docs), block_size):
+        block = docs[start:start + block_size].astype(np.float32)
+        np.matmul(queries, block.T, out=out[:, start:start + len(block)])
+    return out
+
+
+if __name__ == "__main__":
+    print("=== Similarity Kernels ===")
+    rng = np.random.default_rng(0)
+    docs = UnitVectors(rng.standard_normal((5, 4)))  # Normalized once, at ingest
+    query = rng.standard_normal(4)
+
+    scores = np.empty(len(docs), dtype=np.float32)  # Reusable output buffer
+    one_to_many(query, docs, out=scores)
+    print(f"One-to-many scores: {np.round(scores, 3)}")
+    print(f"Matches scalar helper: {np.isclose(scores[2], cosine_similarity(query, docs.data[2]))}")
+    print(f"float16 storage: {UnitVectors(docs.data, dtype=np.float16, assume_normalized=True).data.nbytes} "
+          f"bytes vs {docs.data.nbytes} bytes float32")
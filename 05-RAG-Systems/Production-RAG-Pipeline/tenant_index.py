@@ -0,0 +1,316 @@
+"""
+Tenant-Partitioned Vector Index
+One physical shard per large tenant (small tenants share group shards), loaded
+on demand and evicted under a memory budget, so a query only scans its own
+tenant's vectors instead of filtering a shared collection by tenant_id.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+from similarity import UnitVectors, many_to_many, normalize
+from vector_index import VectorIndex, top_k
+
+
+class _Shard:
+    """Vectors of one or more tenants; rows carry (owner tenant, tenant-local id)."""
+
+    def __init__(self, name: str, dim: int, capacity: int = 1024):
+        self.name = name
+        self.index = VectorIndex(dim, initial_capacity=capacity)
+        self.owners: List[str] = []
+        self.local_ids: List[int] = []
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.nbytes = 0  # Vectors plus the columns() arrays, kept current by add() and load()
+        self._owner_width = 0
+        self._columns: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def _measure(self):
+        """Size without building the columns: owners are fixed-width UCS-4, local ids int64."""
+        self.nbytes = self.index.vectors.data.nbytes + len(self.owners) * (4 * self._owner_width + 8)
+
+    def columns(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(owners, local ids) as arrays, rebuilt only after a write."""
+        if self._columns is None:
+            self._columns = (np.array(self.owners, dtype=str), np.array(self.local_ids, dtype=np.int64))
+        return self._columns
+
+    def add(self, tenant: str, vectors: np.ndarray, local_ids: np.ndarray):
+        self.index.add(UnitVectors(vectors, assume_normalized=True))
+        self.owners.extend([tenant] * len(vectors))
+        self.local_ids.extend(local_ids.tolist())
+        self._owner_width = max(self._owner_width, len(tenant))
+        self._columns = None
+        self._measure()
+        self.dirty = True
+
+    def rows_of(self, tenant: str) -> np.ndarray:
+        return np.flatnonzero(self.columns()[0] == tenant)
+
+    def search(self, tenant: str, queries: np.ndarray, k: int, shared: bool) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k of one tenant's rows; a dedicated shard needs no owner mask."""
+        owners, local_ids = self.columns()
+        scores = many_to_many(UnitVectors(queries, assume_normalized=True), self.index.vectors)
+        if shared:
+            scores[:, owners != tenant] = -np.inf
+        best_scores, rows = top_k(scores, k)
+        ids = local_ids[rows]
+        ids[np.isneginf(best_scores)] = -1
+        return best_scores, ids
+
+    def save(self, path: str):
+        """Atomic write (temp file + rename) of vectors and row owners."""
+        owners, local_ids = self.columns()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, vectors=self.index.vectors.data, owners=owners, local_ids=local_ids)
+        os.replace(tmp_path, path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, name: str, dim: int, path: str) -> "_Shard":
+        shard = cls(name, dim, capacity=1)
+        with np.load(path) as data:
+            vectors = data["vectors"]
+            shard.index = VectorIndex(dim, initial_capacity=len(vectors))
+            shard.index.add(UnitVectors(vectors, assume_normalized=True))
+            shard.owners = data["owners"].tolist()
+            shard.local_ids = data["local_ids"].tolist()
+            shard._owner_width = data["owners"].dtype.itemsize // 4 if len(shard.owners) else 0
+        shard._measure()
+        return shard
+
+
+class TenantIndex:
+    """
+    Placement:
+    - a tenant with at least `dedicated_min_vectors` vectors gets its own shard
+      (moved out of its group shard when it crosses the threshold)
+    - smaller tenants share one of `n_groups` group shards (by hash of the tenant
+      id); a query scans only that group and masks other tenants' rows
+
+    Shards are .npz files in `directory`, loaded on first query and kept in
+    memory in least-recently-used order; when resident shards exceed
+    `memory_budget_mb`, the coldest are written back (if changed) and dropped.
+    Ids are per tenant: 0, 1, 2, ... in insertion order.
+
+    Per-tenant metrics in tenant_stats(): queries, p50/p99 latency over the
+    last `latency_window` queries, vectors, shard, shard memory, cold loads.
+    """
+
+    PLACEMENT_FILE = "placement.json"
+
+    def __init__(
+        self,
+        directory: str,
+        dim: int,
+        memory_budget_mb: float = 512,
+        dedicated_min_vectors: int = 10_000,
+        n_groups: int = 16,
+        latency_window: int = 1000
+    ):
+        self.directory = directory
+        self.dim = dim
+        self.memory_budget = int(memory_budget_mb * 2**20)
+        self.dedicated_min_vectors = dedicated_min_vectors
+        self.n_groups = n_groups
+        self.latency_window = latency_window
+        self._resident: "OrderedDict[str, _Shard]" = OrderedDict()
+        self._resident_bytes = 0  # Sum of resident shards' nbytes, updated on load, add and eviction
+        self._lock = threading.RLock()
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._loads: Dict[str, int] = {}
+        self.stats = {"loads": 0, "evictions": 0}
+        os.makedirs(directory, exist_ok=True)
+        self._placement_path = os.path.join(directory, self.PLACEMENT_FILE)
+        self.tenants: Dict[str, Dict[str, object]] = {}  # tenant -> {"shard", "count"}
+        if os.path.exists(self._placement_path):
+            with open(self._placement_path, encoding="utf-8") as f:
+                self.tenants = json.load(f)
+
+    def _group_of(self, tenant: str) -> str:
+        return f"group-{zlib.crc32(tenant.encode()) % self.n_groups}"
+
+    @staticmethod
+    def _dedicated_name(tenant: str) -> str:
+        return f"tenant-{quote(tenant, safe='')}"  # Safe as a file name
+
+    def _path(self, shard_name: str) -> str:
+        return os.path.join(self.directory, f"{shard_name}.npz")
+
+    @property
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return self._resident_bytes
+
+    def _shard(self, name: str, tenant: Optional[str] = None) -> _Shard:
+        """Resident shard by name: loaded from disk (or created) on a miss, then the budget is enforced."""
+        with self._lock:
+            shard = self._resident.get(name)
+            if shard is not None:
+                self._resident.move_to_end(name)
+                return shard
+            if os.path.exists(self._path(name)):
+                shard = _Shard.load(name, self.dim, self._path(name))
+                self.stats["loads"] += 1
+                if tenant is not None:
+                    self._loads[tenant] = self._loads.get(tenant, 0) + 1
+            else:
+                shard = _Shard(name, self.dim)
+            self._resident[name] = shard
+            self._resident_bytes += shard.nbytes
+            self._enforce_budget(keep=name)
+            return shard
+
+    def _enforce_budget(self, keep: str):
+        """Evict least recently used shards (never `keep`) until under the memory budget."""
+        for name in list(self._resident):
+            if self._resident_bytes <= self.memory_budget:
+                break
+            if name == keep:
+                continue
+            shard = self._resident.pop(name)
+            with shard.lock:
+                if shard.dirty:
+                    shard.save(self._path(name))
+            self._resident_bytes -= shard.nbytes
+            self.stats["evictions"] += 1
+
+    def add(self, tenant: str, embeddings: np.ndarray) -> np.ndarray:
+        """Append vectors for a tenant; returns their tenant-local ids."""
+        vectors = normalize(embeddings)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected dimension {self.dim}, got {vectors.shape[1]}")
+        with self._lock:
+            if tenant not in self.tenants:
+                large = len(vectors) >= self.dedicated_min_vectors
+                shard_name = self._dedicated_name(tenant) if large else self._group_of(tenant)
+                self.tenants[tenant] = {"shard": shard_name, "count": 0}
+            placement = self.tenants[tenant]
+            start = placement["count"]
+            local_ids = np.arange(start, start + len(vectors))
+            if start + len(vectors) >= self.dedicated_min_vectors and placement["shard"].startswith("group-"):
+                self._promote(tenant)
+            shard = self._shard(placement["shard"])
+            with shard.lock:
+                before = shard.nbytes
+                shard.add(tenant, vectors, local_ids)
+                self._resident_bytes += shard.nbytes - before
+            placement["count"] = start + len(vectors)
+            self._enforce_budget(keep=shard.name)
+            return local_ids
+
+    def _promote(self, tenant: str):
+        """Move a tenant that outgrew its group into a dedicated shard."""
+        placement = self.tenants[tenant]
+        group = self._shard(placement["shard"])
+        name = self._dedicated_name(tenant)
+        with group.lock:
+            rows = group.rows_of(tenant)
+            keep = np.setdiff1d(np.arange(len(group.owners)), rows)
+            owners, local_ids = group.columns()
+            vectors = group.index.vectors.data
+            dedicated = _Shard(name, self.dim, capacity=max(self.dedicated_min_vectors, len(rows)))
+            dedicated.add(tenant, vectors[rows], local_ids[rows])
+            rebuilt = _Shard(group.name, self.dim, capacity=max(len(keep), 1))
+            for owner in np.unique(owners[keep]).tolist():
+                owner_rows = keep[owners[keep] == owner]
+                rebuilt.add(owner, vectors[owner_rows], local_ids[owner_rows])
+            rebuilt.dirty = True
+            self._resident[group.name] = rebuilt
+        self._resident[name] = dedicated
+        self._resident_bytes += rebuilt.nbytes + dedicated.nbytes - group.nbytes
+        placement["shard"] = name
+
+    def search(self, tenant: str, queries: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k over this tenant's vectors only: (scores, tenant-local ids), -1 where fewer than k."""
+        start = time.perf_counter()
+        queries = normalize(queries)
+        placement = self.tenants.get(tenant)
+        if placement is None:
+            scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+            return scores, np.empty((len(queries), 0), dtype=np.int64)
+        shard = self._shard(placement["shard"], tenant)
+        with shard.lock:
+            result = shard.search(tenant, queries, min(k, placement["count"]), not shard.name.startswith("tenant-"))
+        latencies = self._latencies.setdefault(tenant, deque(maxlen=self.latency_window))
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    def flush(self):
+        """Write changed resident shards and the placement map."""
+        with self._lock:
+            for name, shard in self._resident.items():
+                with shard.lock:
+                    if shard.dirty:
+                        shard.save(self._path(name))
+            tmp_path = self._placement_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.tenants, f)
+            os.replace(tmp_path, self._placement_path)
+
+    def tenant_stats(self, tenant: str) -> Dict[str, object]:
+        placement = self.tenants[tenant]
+        latencies = np.array(self._latencies.get(tenant, [0.0])) * 1000
+        with self._lock:
+            shard = self._resident.get(placement["shard"])
+            shard_bytes = shard.nbytes if shard is not None else 0
+        return {
+            "shard": placement["shard"],
+            "vectors": placement["count"],
+            "queries": len(self._latencies.get(tenant, ())),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "resident_mb": shard_bytes / 2**20,
+            "cold_loads": self._loads.get(tenant, 0),
+        }
+
+
+def demonstrate_tenant_index():
+    """One large tenant and many small ones, under a memory budget smaller than the data."""
+    print("=== Tenant-Partitioned Vector Index ===")
+
+    rng = np.random.default_rng(0)
+    dim = 128
+    with tempfile.TemporaryDirectory() as tmp:
+        index = TenantIndex(tmp, dim, memory_budget_mb=14, dedicated_min_vectors=5000, n_groups=4)
+        big = rng.standard_normal((20_000, dim)).astype(np.float32)
+        index.add("bigcorp", big[:3000])   # Starts in a group shard...
+        index.add("bigcorp", big[3000:])   # ...and is promoted to its own shard
+        small = {f"shop-{i}": rng.standard_normal((300, dim)).astype(np.float32) for i in range(40)}
+        for tenant, vectors in small.items():
+            index.add(tenant, vectors)
+        index.flush()
+        print(f"{len(index.tenants)} tenants, shards on disk: "
+              f"{sorted(name for name in os.listdir(tmp) if name.endswith('.npz'))}")
+
+        for _ in range(20):
+            index.search("bigcorp", big[rng.integers(20_000, size=1)], k=5)
+            for tenant in ("shop-1", "shop-2"):
+                index.search(tenant, small[tenant][rng.integers(300, size=1)], k=5)
+        _, ids = index.search("shop-3", small["shop-3"][[7]], k=5)
+        print(f"shop-3's own vector 7 is its top hit: {ids[0, 0] == 7}")
+        _, ids = index.search("shop-2", big[[0]], k=300)
+        print(f"shop-2 never sees bigcorp's vectors: {bool((ids[0] < 300).all())}")
+
+        print(f"\nResident {index.resident_bytes / 2**20:.1f} MB of {index.memory_budget / 2**20:.0f} MB budget, "
+              f"{index.stats['loads']} cold loads, {index.stats['evictions']} evictions")
+        print(f"{'Tenant':<8} {'Shard':<15} {'Vectors':>8} {'Queries':>8} {'p50 ms':>7} {'p99 ms':>7} {'MB':>6}")
+        for tenant in ("bigcorp", "shop-1", "shop-2"):
+            s = index.tenant_stats(tenant)
+            print(f"{tenant:<8} {s['shard']:<15} {s['vectors']:>8,} {s['queries']:>8} "
+                  f"{s['p50_ms']:>7.2f} {s['p99_ms']:>7.2f} {s['resident_mb']:>6.1f}")
+
+
+if __name__ == "__main__":
+    demonstrate_tenant_index()
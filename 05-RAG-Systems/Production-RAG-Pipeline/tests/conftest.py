@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The pipeline modules import each other by bare name (from vector_index import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,30 @@
+import threading
+import time
+
+import numpy as np
+
+from bulk_writer import BulkVectorWriter
+
+
+def test_batches_from_two_writers_are_published_in_upsert_order(tmp_path):
+    writer = BulkVectorWriter(str(tmp_path), dim=4, batch_size=1, sync=False)
+    put = writer._queue.put
+
+    def slow_first_put(batch):
+        if batch is not None and batch[2][0] == {"version": 1}:
+            time.sleep(0.2)  # The first writer is descheduled between taking and queueing its batch
+        put(batch)
+    writer._queue.put = slow_first_put
+
+    vector = np.ones((1, 4), dtype=np.float32)
+    first = threading.Thread(target=writer.upsert, args=(["x"], vector, [{"version": 1}]))
+    first.start()
+    time.sleep(0.05)
+    writer.upsert(["x"], vector, [{"version": 2}])
+    first.join()
+    writer.flush()
+
+    _, ids, metadatas = writer.search(vector, k=2)
+    assert ids[0, 0] == "x" and metadatas[0][0] == {"version": 2}
+    assert len(writer) == 1
+    writer.close()
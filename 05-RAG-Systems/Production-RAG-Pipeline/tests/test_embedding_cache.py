@@ -0,0 +1,12 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+
+def test_put_many_with_an_empty_batch_is_a_no_op():
+    cache = EmbeddingCache()
+    cache.put_many([], [])
+    cache.put_many(["a"], np.ones((1, 4)))
+    assert cache.get_many([]) == []
+    assert np.allclose(cache.get_many(["a"])[0], 1.0)
+    cache.close()
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from hnsw_index import HNSWIndex
+
+
+def test_deleted_neighbours_do_not_take_result_slots():
+    rng = np.random.default_rng(0)
+    center = rng.standard_normal(16).astype(np.float32)
+    near = center + 0.01 * rng.standard_normal((60, 16)).astype(np.float32)  # Ids 0-59 sit around the query
+    far = rng.standard_normal((1000, 16)).astype(np.float32)
+    index = HNSWIndex(16, ef_search=20)
+    index.add(np.vstack([near, far]))
+    index.delete(np.arange(50))
+
+    scores, ids = index.search(center[None], k=10)
+    assert (ids >= 0).all()
+    assert not np.isin(ids, np.arange(50)).any()
+    assert set(ids[0, :10].tolist()) == set(range(50, 60))
+    assert np.all(np.diff(scores[0]) <= 0)
+
+
+def test_search_with_every_node_deleted_returns_nothing():
+    index = HNSWIndex(8)
+    index.add(np.random.default_rng(1).standard_normal((20, 8)).astype(np.float32))
+    index.delete(np.arange(20))
+    _, ids = index.search(np.ones((1, 8), dtype=np.float32), k=5)
+    assert (ids == -1).all()
+
+
+@pytest.mark.parametrize("M", [0, 1])
+def test_rejects_fewer_than_two_links_per_node(M):
+    with pytest.raises(ValueError, match="M must be at least 2"):
+        HNSWIndex(8, M=M)
@@ -0,0 +1,59 @@
+import threading
+
+import numpy as np
+import pytest
+
+from hybrid_retriever import BM25Index, HybridRetriever
+from local_embedder import HashingEmbedder
+
+
+def test_bm25_search_while_documents_are_added():
+    index = BM25Index()
+    index.add(["alpha beta"] * 100)
+    errors = []
+    done = threading.Event()
+
+    def writer():
+        for i in range(300):
+            index.add([f"alpha term{i}", f"beta term{i} term{i + 1}"])
+        done.set()
+
+    def reader():
+        try:
+            while not done.is_set():
+                for i in range(0, 300, 7):
+                    scores, ids = index.search(f"alpha term{i}", k=5)
+                    assert len(scores) == len(ids) == 5
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    scores, ids = index.search("term299", k=2)
+    assert sorted(ids.tolist()) == [100 + 2 * 298 + 1, 100 + 2 * 299]
+
+
+def test_close_stops_the_leg_threads():
+    embedder = HashingEmbedder(dim=32)
+    retriever = HybridRetriever(embedder.embed, dim=32)
+    retriever.add(["disk quota exceeded", "refund policy"])
+    results, _ = retriever.search("quota", k=1)
+    assert results[0][0] == 0
+    retriever.close()
+    assert retriever._executor._shutdown
+
+
+def test_rejected_add_leaves_both_legs_aligned():
+    embedder = HashingEmbedder(dim=4)
+    retriever = HybridRetriever(embedder.embed, dim=4)
+    with pytest.raises(ValueError):
+        retriever.add(["wrong", "dimension"], embeddings=np.ones((2, 5)))
+    assert len(retriever.bm25) == len(retriever.vectors) == 0
+    retriever.add(["disk quota exceeded", "refund policy"])
+    results, _ = retriever.search("refund", k=1)
+    assert results[0][0] == 1
+    retriever.close()
@@ -0,0 +1,34 @@
+from incremental_indexer import IncrementalIndexer
+from local_embedder import HashingEmbedder
+from vector_index import VectorIndex
+
+
+def make_indexer():
+    embedder = HashingEmbedder(dim=32)
+    # One chunk per paragraph, so each paragraph is its own content hash
+    indexer = IncrementalIndexer(embedder.embed, VectorIndex(32), chunk_fn=lambda text: text.split("\n\n"))
+    return indexer, embedder
+
+
+def test_chunk_moving_between_documents_is_reused():
+    indexer, embedder = make_indexer()
+    indexer.upsert({"A": "alpha\n\nmoving para", "B": "beta"})
+    embedded = embedder.texts_embedded
+
+    result = indexer.upsert({"A": "alpha", "B": "beta\n\nmoving para"})
+
+    assert result == {"chunks": 3, "embedded": 0, "reused": 3, "deleted": 0}
+    assert embedder.texts_embedded == embedded
+    moved = indexer.content_hash("moving para")
+    assert indexer.documents["B"][-1] == moved
+    assert indexer.chunks[moved][1] == 1
+    assert len(indexer.index) == 3
+
+
+def test_unreferenced_chunks_are_deleted():
+    indexer, _ = make_indexer()
+    indexer.upsert({"A": "alpha\n\nold para"})
+    result = indexer.upsert({"A": "alpha\n\nnew para"})
+    assert result["embedded"] == 1 and result["deleted"] == 1
+    assert indexer.content_hash("old para") not in indexer.chunks
+    assert len(indexer.index) == 2
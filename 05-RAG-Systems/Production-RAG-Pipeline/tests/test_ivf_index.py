@@ -0,0 +1,13 @@
+import numpy as np
+import pytest
+
+from ivf_index import IVFIndex
+
+
+def test_search_before_train_raises_like_add():
+    index = IVFIndex(dim=8, nlist=4)
+    query = np.ones((1, 8), dtype=np.float32)
+    with pytest.raises(RuntimeError, match="trained"):
+        index.add(query)
+    with pytest.raises(RuntimeError, match="trained"):
+        index.search(query)
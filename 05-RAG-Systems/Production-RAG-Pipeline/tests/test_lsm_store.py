@@ -0,0 +1,143 @@
+import os
+
+import numpy as np
+import pytest
+
+import lsm_store
+from lsm_store import PUT, LSMVectorStore, WriteAheadLog
+
+DIM = 8
+
+
+def make_vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def nearest(store, vectors):
+    _, ids, _ = store.search(vectors, k=1)
+    return list(ids[:, 0])
+
+
+def names(directory, suffix):
+    return sorted(name for name in os.listdir(directory) if name.endswith(suffix))
+
+
+def failing_after(n_calls, real):
+    """Wrap `real` so that calls after the first `n_calls` raise, like a crash at that point."""
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        if len(calls) > n_calls:
+            raise OSError("simulated crash")
+        return real(*args, **kwargs)
+    return wrapper
+
+
+def test_crash_during_wal_append_keeps_every_acknowledged_write(tmp_path):
+    vectors = make_vectors(21)
+    store = LSMVectorStore(str(tmp_path), DIM, memtable_size=1000)
+    store.put([f"doc{i}" for i in range(20)], vectors[:20])
+    store.delete(["doc0"])
+    record = WriteAheadLog.encode(PUT, "torn", vectors[20])
+    store._wal._file.write(record[:len(record) // 2])  # The put never returned
+    store._wal._file.flush()
+
+    recovered = LSMVectorStore(str(tmp_path), DIM)
+    assert recovered.stats["recovered_records"] == 21
+    assert len(recovered) == 19
+    assert nearest(recovered, vectors[1:20]) == [f"doc{i}" for i in range(1, 20)]
+    assert nearest(recovered, vectors[:1]) != ["doc0"]
+    assert nearest(recovered, vectors[20:]) != ["torn"]
+    recovered.put(["after"], vectors[20:])
+    recovered.close()
+    assert len(LSMVectorStore(str(tmp_path), DIM)) == 20
+
+
+def test_crash_between_segment_write_and_manifest_update(tmp_path):
+    vectors = make_vectors(20)
+    store = LSMVectorStore(str(tmp_path), DIM, memtable_size=1000)
+    store.put([f"doc{i}" for i in range(10)], vectors[:10])
+    store.flush()
+    store.put([f"doc{i}" for i in range(10, 20)], vectors[10:])
+    store.delete(["doc3"])
+    store._write_manifest = failing_after(0, store._write_manifest)
+    with pytest.raises(RuntimeError):
+        store.flush()
+    assert len(names(str(tmp_path), ".seg")) == 2  # Written, but the manifest lists only the first
+
+    recovered = LSMVectorStore(str(tmp_path), DIM)
+    assert recovered.stats["recovered_records"] == 11
+    assert len(recovered) == 19
+    assert len(recovered.segments) == 2
+    live = [i for i in range(20) if i != 3]
+    assert nearest(recovered, vectors[live]) == [f"doc{i}" for i in live]
+    assert nearest(recovered, vectors[3:4]) != ["doc3"]
+    assert len(names(str(tmp_path), ".log")) == 1  # Only the new store's own, empty WAL
+
+
+def test_crash_before_flushed_wal_is_removed(tmp_path, monkeypatch):
+    vectors = make_vectors(20)
+    store = LSMVectorStore(str(tmp_path), DIM, memtable_size=1000)
+    store.put([f"doc{i}" for i in range(20)], vectors)
+    store.delete(["doc5"])
+    monkeypatch.setattr(lsm_store.os, "remove", failing_after(0, os.remove))
+    with pytest.raises(RuntimeError):
+        store.flush()
+    monkeypatch.undo()
+    assert "wal-00000001.log" in names(str(tmp_path), ".log")  # Flushed to a segment, but still on disk
+
+    recovered = LSMVectorStore(str(tmp_path), DIM)
+    assert recovered.stats["recovered_records"] == 0  # Not replayed a second time
+    assert len(recovered) == 19
+    assert len(recovered.segments) == 1
+    _, ids, _ = recovered.search(vectors, k=20)
+    assert sorted(id_ for id_ in ids[0] if id_ is not None) == sorted(f"doc{i}" for i in range(20) if i != 5)
+    assert "wal-00000001.log" not in names(str(tmp_path), ".log")
+
+
+def test_crash_during_compaction_keeps_the_old_segments(tmp_path):
+    vectors = make_vectors(30)
+    store = LSMVectorStore(str(tmp_path), DIM, memtable_size=1000, max_segments=2, merge_factor=2)
+    for start in (0, 10):
+        store.put([f"doc{i}" for i in range(start, start + 10)], vectors[start:start + 10])
+        store.flush()
+    store.put([f"doc{i}" for i in range(20, 30)], vectors[20:])
+    store.delete(["doc12"])
+    store.put(["doc1"], -vectors[1:2], [{"version": 2}])
+    store._write_manifest = failing_after(1, store._write_manifest)  # The flush publishes, the compaction does not
+    with pytest.raises(RuntimeError):
+        store.flush()
+    assert len(names(str(tmp_path), ".seg")) == 4  # Three listed segments plus the unpublished merge
+
+    recovered = LSMVectorStore(str(tmp_path), DIM)
+    assert recovered.stats["compactions"] == 0
+    assert len(recovered.segments) == 3
+    assert len(names(str(tmp_path), ".seg")) == 3
+    assert len(recovered) == 29
+    expected = [f"doc{i}" for i in range(30) if i not in (1, 12)]
+    assert nearest(recovered, vectors[[i for i in range(30) if i not in (1, 12)]]) == expected
+    assert nearest(recovered, vectors[12:13]) != ["doc12"]
+    _, ids, metadatas = recovered.search(-vectors[1:2], k=1)
+    assert ids[0, 0] == "doc1" and metadatas[0][0] == {"version": 2}
+
+
+def test_compaction_with_fewer_segments_than_merge_factor(tmp_path):
+    vectors = make_vectors(40)
+    store = LSMVectorStore(str(tmp_path), DIM, memtable_size=1000, max_segments=2, merge_factor=4)
+    for start in range(0, 40, 10):
+        store.put([f"doc{i}" for i in range(start, start + 10)], vectors[start:start + 10])
+        store.flush()
+    assert len(store.segments) <= 2
+    assert store.stats["compactions"] >= 1
+    store.delete(["doc0"])  # The store still accepts writes
+    assert len(store) == 39
+    assert nearest(store, vectors[1:]) == [f"doc{i}" for i in range(1, 40)]
+    store.close()
+
+
+def test_rejects_configurations_where_compaction_cannot_shrink(tmp_path):
+    with pytest.raises(ValueError):
+        LSMVectorStore(str(tmp_path), DIM, max_segments=0)
+    with pytest.raises(ValueError):
+        LSMVectorStore(str(tmp_path), DIM, merge_factor=1)
@@ -0,0 +1,70 @@
+import os
+
+import numpy as np
+import pytest
+
+import mmap_store
+from mmap_store import MmapVectorStore
+
+DIM = 8
+
+
+def make_vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def crash(*args):
+    raise OSError("simulated crash")
+
+
+def test_compaction_keeps_ids_and_results(tmp_path):
+    vectors = make_vectors(30)
+    store = MmapVectorStore(str(tmp_path), DIM)
+    store.append(vectors[:20])
+    store.compact()
+    store.append(vectors[20:])
+    _, before = store.search(vectors, k=1)
+    store.compact()
+    _, after = MmapVectorStore(str(tmp_path), DIM).search(vectors, k=1)
+    assert len(store) == 30 and store.log_size == 0
+    assert before[:, 0].tolist() == after[:, 0].tolist() == list(range(30))
+
+
+def test_crash_before_manifest_switch_keeps_the_old_generation(tmp_path):
+    store = MmapVectorStore(str(tmp_path), DIM)
+    store.append(make_vectors(10))
+    store._write_manifest = crash
+    with pytest.raises(OSError):
+        store.compact()  # The merged base and new log are on disk, the manifest is not switched
+
+    reopened = MmapVectorStore(str(tmp_path), DIM)
+    assert (len(reopened), reopened.log_size) == (10, 10)
+    reopened.compact()  # Overwrites the leftover files of the failed attempt
+    assert (len(MmapVectorStore(str(tmp_path), DIM)), reopened.log_size) == (10, 0)
+
+
+def test_crash_after_manifest_switch_does_not_reapply_the_log(tmp_path, monkeypatch):
+    store = MmapVectorStore(str(tmp_path), DIM)
+    store.append(make_vectors(10))
+    reader = MmapVectorStore(str(tmp_path), DIM)  # Another process mapping the same store
+    monkeypatch.setattr(mmap_store.os, "remove", crash)
+    with pytest.raises(OSError):
+        store.compact()  # Switched to the new generation, old files not yet removed
+    monkeypatch.undo()
+
+    reader.refresh()
+    assert (len(reader), reader.log_size) == (10, 0)
+    reopened = MmapVectorStore(str(tmp_path), DIM)
+    assert (len(reopened), reopened.log_size) == (10, 0)
+    assert sorted(name for name in os.listdir(tmp_path) if name != "manifest.json") == [
+        "append-00000001.log", "vectors-00000001.npy"]
+
+
+def test_missing_generation_file_raises_instead_of_spinning(tmp_path):
+    store = MmapVectorStore(str(tmp_path), DIM)
+    store.append(make_vectors(4))
+    os.remove(store.base_path)
+    with pytest.raises(FileNotFoundError):
+        MmapVectorStore(str(tmp_path), DIM)
+    with pytest.raises(FileNotFoundError):
+        store.append(make_vectors(1))
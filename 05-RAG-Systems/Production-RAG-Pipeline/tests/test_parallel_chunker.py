@@ -0,0 +1,13 @@
+from parallel_chunker import chunk_file
+
+
+def test_byte_offsets_stay_exact_after_invalid_bytes(tmp_path):
+    raw = b"caf\xc3\xa9 \xff\xfe broken " + "naïve text, sentence after sentence. ".encode() * 40
+    path = tmp_path / "doc.txt"
+    path.write_bytes(raw)
+
+    chunks = chunk_file(str(path), chunk_size=50, chunk_overlap=10)
+    assert len(chunks) > 5
+    assert "��" in chunks[0]["text"]
+    for chunk in chunks:
+        assert raw[chunk["byte_offset"]:].decode("utf-8", errors="replace").startswith(chunk["text"])
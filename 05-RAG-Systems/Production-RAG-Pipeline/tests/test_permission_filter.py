@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from permission_filter import FilteredVectorIndex
+
+
+@pytest.mark.parametrize("dense_fraction", [0.0, 1.0])  # Broad-filter and selective-filter paths
+def test_deleted_rows_are_never_permitted_hits(dense_fraction):
+    vectors = np.random.default_rng(0).standard_normal((100, 16)).astype(np.float32)
+    index = FilteredVectorIndex(16, dense_fraction=dense_fraction)
+    index.add(vectors, [{"team": "a" if i % 2 else "b"} for i in range(100)])
+    index.delete([1, 3, 5])
+
+    scores, ids = index.search(vectors[[1, 3, 5]], k=10, where={"team": "a"})
+    assert not np.isin(ids, [1, 3, 5]).any()
+    assert np.all(ids % 2 == 1)
+    assert ids.shape == (3, 10)
+
+
+def test_rejected_add_keeps_metadata_and_vectors_aligned():
+    index = FilteredVectorIndex(4)
+    with pytest.raises(ValueError):
+        index.add(np.ones((2, 5), dtype=np.float32), [{"team": "a"}, {"team": "a"}])
+    with pytest.raises(TypeError):
+        index.add(np.ones((1, 4), dtype=np.float32), [{"team": ["unhashable"]}])
+    ids = index.add(np.eye(4, dtype=np.float32)[:2], [{"team": "a"}, {"team": "b"}])
+    assert ids.tolist() == [1, 2]
+    _, found = index.search(np.eye(4, dtype=np.float32)[:2], k=2, where={"team": "b"})
+    assert found[:, 0].tolist() == [2, 2]
+    assert len(index) == 2
@@ -0,0 +1,24 @@
+import threading
+import time
+
+import pytest
+
+from resilience import Dependency
+
+
+def test_close_releases_the_worker_threads():
+    release = threading.Event()
+    dependency = Dependency("hangs", lambda: release.wait(5), timeout_s=0.01, max_workers=2)
+    with pytest.raises(TimeoutError):
+        dependency()
+    assert any(thread.name.startswith("hangs") for thread in threading.enumerate())
+    start = time.perf_counter()
+    dependency.close()
+    assert time.perf_counter() - start < 1  # Does not wait for the hanging call
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name.startswith("hangs"):
+            thread.join(timeout=1)
+    assert not any(thread.name.startswith("hangs") for thread in threading.enumerate())
+    with pytest.raises(RuntimeError):
+        dependency._pool.submit(print)
@@ -0,0 +1,38 @@
+from local_embedder import HashingEmbedder
+from semantic_cache import SemanticCache
+
+
+def make_cache(now, **options):
+    embedder = HashingEmbedder(dim=256)
+    return SemanticCache(embedder.embed, dim=256, ttl_s=10, clock=lambda: now[0], **options)
+
+
+def test_expired_top_hit_does_not_hide_a_live_near_duplicate():
+    now = [0.0]
+    cache = make_cache(now, threshold=0.8)
+    cache.put("What is RAG exactly?", "old answer", "acme")
+    now[0] = 5
+    cache.put("What is RAG?", "new answer", "acme")
+    now[0] = 11  # The first entry has expired, the second has not
+
+    assert cache.lookup("What is RAG exactly?", "acme") == "new answer"
+    assert cache.stats["semantic_hits"] == 1
+
+
+def test_rebuild_keeps_evicted_entries_out():
+    now = [0.0]
+    cache = make_cache(now, threshold=0.99)
+    for i in range(1100):
+        cache.put(f"early{i} question{i}", "answer", "acme")
+    now[0] = 5
+    for i in range(900):
+        cache.put(f"late{i} question{i}", "answer", "acme")
+    cache.store.delete(cache._exact_key("acme", "late7 question7"))  # Evicted by the store
+    assert cache.lookup("late7 question7?", "acme") is None  # Tombstones the evicted entry
+
+    now[0] = 11
+    cache.put("fresh question", "answer", "acme")  # Expires the early entries and rebuilds
+    entries = cache._tenants["acme"]
+    assert len(entries.keys) == len(entries.index) == 900
+    assert cache._exact_key("acme", "late7 question7") not in entries.keys
+    assert cache.lookup("late8 question8?", "acme") == "answer"
@@ -0,0 +1,30 @@
+import numpy as np
+
+from local_embedder import HashingEmbedder
+from semantic_chunker import SemanticChunker
+
+
+def test_sentence_cache_is_bounded_and_keeps_recent_sentences():
+    embedder = HashingEmbedder(dim=32)
+    chunker = SemanticChunker(embedder.embed, min_tokens=5, max_tokens=40, cache_size=8)
+    documents = [" ".join(f"Topic {d} sentence number {i} here." for i in range(12)) for d in range(3)]
+    for document in documents:
+        chunks, timings = chunker.chunk(document)
+        assert timings["embedded"] == 12  # Larger than the cache, yet every sentence gets a vector
+        assert chunks
+    assert len(chunker._cache) == 8
+
+    short = " ".join(f"Topic 2 sentence number {i} here." for i in range(8, 12))
+    _, timings = chunker.chunk(short)
+    assert timings["embedded"] == 0  # The most recently used sentences are still cached
+    _, timings = chunker.chunk(documents[0])
+    assert timings["embedded"] == 12
+
+
+def test_cached_vectors_match_fresh_embeddings():
+    embedder = HashingEmbedder(dim=32)
+    chunker = SemanticChunker(embedder.embed, cache_size=2)
+    sentences = ["Alpha one.", "Beta two.", "Alpha one.", "Gamma three."]
+    vectors, misses = chunker._embed(sentences)
+    assert misses == 3
+    np.testing.assert_allclose(vectors, embedder.embed(sentences))
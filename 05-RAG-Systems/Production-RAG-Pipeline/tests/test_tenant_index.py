@@ -0,0 +1,42 @@
+import numpy as np
+
+from tenant_index import TenantIndex, _Shard
+
+DIM = 16
+
+
+def measured(shard):
+    owners, local_ids = shard.columns()
+    return shard.index.vectors.data.nbytes + owners.nbytes + local_ids.nbytes
+
+
+def test_running_byte_counts_match_the_arrays(tmp_path):
+    rng = np.random.default_rng(0)
+    index = TenantIndex(str(tmp_path), DIM, memory_budget_mb=0.05, dedicated_min_vectors=400, n_groups=2)
+    vectors = {f"t{i}": rng.standard_normal((150, DIM)).astype(np.float32) for i in range(6)}
+    vectors["a-much-longer-tenant-name"] = rng.standard_normal((500, DIM)).astype(np.float32)
+    for tenant, tenant_vectors in vectors.items():
+        index.add(tenant, tenant_vectors[:100])
+    for tenant, tenant_vectors in vectors.items():
+        index.add(tenant, tenant_vectors[100:])  # The long-named tenant is promoted
+    assert index.stats["evictions"] > 0
+    for tenant, tenant_vectors in vectors.items():
+        _, ids = index.search(tenant, tenant_vectors[[3]], k=1)  # Reloads evicted shards
+        assert ids[0, 0] == 3
+        for shard in index._resident.values():
+            assert shard.nbytes == measured(shard)
+        assert index.resident_bytes == sum(measured(shard) for shard in index._resident.values())
+
+
+
+def test_add_does_not_rebuild_columns_to_measure_memory(tmp_path, monkeypatch):
+    rng = np.random.default_rng(1)
+    index = TenantIndex(str(tmp_path), DIM, n_groups=4)
+    for i in range(8):
+        index.add(f"t{i}", rng.standard_normal((50, DIM)).astype(np.float32))
+    rebuilt = []
+    monkeypatch.setattr(_Shard, "columns", lambda shard: rebuilt.append(shard.name))
+    for i in range(8):
+        index.add(f"t{i}", rng.standard_normal((50, DIM)).astype(np.float32))
+    assert rebuilt == []
+    assert index.resident_bytes == 8 * 100 * (DIM * 4 + 4 * 2 + 8)
@@ -0,0 +1,18 @@
+from tracing import MetricsRegistry
+
+
+def test_exposition_type_lines_name_the_samples():
+    registry = MetricsRegistry()
+    registry.counter("rag_requests", "Requests served").labels(status="ok").inc()
+    registry.histogram("rag_stage_seconds", "Stage latency").labels(stage="embed").observe(0.01)
+    lines = registry.expose().splitlines()
+
+    assert "# TYPE rag_requests_total counter" in lines
+    assert "# HELP rag_requests_total Requests served" in lines
+    assert 'rag_requests_total{status="ok"} 1' in lines
+    assert "# TYPE rag_stage_seconds histogram" in lines
+    typed = {line.split()[2] for line in lines if line.startswith("# TYPE")}
+    for line in lines:
+        if not line.startswith("#"):
+            sample = line.split("{")[0].split()[0]
+            assert any(sample == name or sample.startswith(name + "_") for name in typed), sample
@@ -0,0 +1,22 @@
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+def test_search_shape_does_not_depend_on_index_size():
+    index = VectorIndex(4)
+    queries = np.eye(4, dtype=np.float32)[:3]
+    scores, ids = index.search(queries, k=5)
+    assert scores.shape == ids.shape == (3, 5)
+    assert (ids == -1).all() and np.isneginf(scores).all()
+
+    index.add(np.eye(4, dtype=np.float32)[:2])
+    scores, ids = index.search(queries, k=5)
+    assert scores.shape == ids.shape == (3, 5)
+    assert ids[:2, 0].tolist() == [0, 1]
+    assert (ids[:, 2:] == -1).all() and np.isneginf(scores[:, 2:]).all()
+
+    index.delete([0])
+    _, ids = index.search(queries, k=5)
+    assert ids.shape == (3, 5)
+    assert (ids[:, 1:] == -1).all() and ids[1, 0] == 1
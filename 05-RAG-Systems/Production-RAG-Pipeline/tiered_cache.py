@@ -0,0 +1,255 @@
+"""
+Tiered Response Cache
+An in-process L1 (TTL + LRU) in front of a shared L2 (Redis), with single-flight
+request coalescing and optional stale-while-revalidate.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from semantic_cache import InMemoryKV
+
+Entry = Dict[str, object]  # {"value", "fresh_until"}, identical in both tiers
+
+
+class L1Cache:
+    """Bounded in-process cache: entries expire after their TTL, least recently used go first."""
+
+    def __init__(self, max_items: int = 1024, clock: Callable[[], float] = time.time):
+        self.max_items = max_items
+        self.clock = clock
+        self._items: "OrderedDict[str, Tuple[Entry, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str) -> Optional[Entry]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if self.clock() >= item[1]:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def set(self, key: str, entry: Entry, ttl_s: float):
+        if self.max_items <= 0 or ttl_s <= 0:
+            return
+        with self._lock:
+            self._items[key] = (entry, self.clock() + ttl_s)
+            self._items.move_to_end(key)
+            if len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+
+
+class FakeRemoteKV(InMemoryKV):
+    """InMemoryKV with a simulated network round trip per call, and a call counter."""
+
+    def __init__(self, latency_s: float = 0.001, clock: Callable[[], float] = time.time):
+        super().__init__(clock)
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def _round_trip(self):
+        self.calls += 1
+        time.sleep(self.latency_s)
+
+    def get(self, key: str):
+        self._round_trip()
+        return super().get(key)
+
+    def set(self, key: str, value, ex: Optional[float] = None):
+        self._round_trip()
+        super().set(key, value, ex)
+
+    def delete(self, key: str):
+        self._round_trip()
+        super().delete(key)
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution of fn (and its result or error)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, fn: Callable[[], object]) -> Tuple[object, bool]:
+        """(result, shared): shared is True when another caller's execution was reused."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), True
+        try:
+            future.set_result(fn())
+        except BaseException as error:
+            future.set_exception(error)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return future.result(), False
+
+
+class TieredCache:
+    """
+    get_or_compute(key, compute_fn) checks, in order:
+    1. L1, in-process: no network; kept at most l1_ttl_s so replicas converge
+    2. L2, shared (Redis get/set(ex)/delete interface; InMemoryKV locally)
+    3. compute_fn(), then written to both tiers
+
+    With coalesce=True, concurrent misses for a key wait on one in-flight L2
+    read / computation instead of each calling the LLM.
+    With stale_s > 0, an entry older than ttl_s is still served for stale_s
+    seconds while one background refresh recomputes it (stale-while-revalidate);
+    if the refresh fails, the stale value keeps being served until it expires.
+
+    `clock` is wall time by default because entries in L2 are shared across processes.
+    Counters in `stats`: l1_hits, l2_hits, stale_hits, misses, coalesced,
+    computes, refreshes, refresh_errors.
+    """
+
+    def __init__(
+        self,
+        l2=None,
+        ttl_s: float = 3600,
+        l1_ttl_s: float = 60,
+        l1_items: int = 1024,
+        stale_s: float = 0,
+        coalesce: bool = True,
+        clock: Callable[[], float] = time.time
+    ):
+        self.l2 = l2 if l2 is not None else InMemoryKV(clock)
+        self.ttl_s = ttl_s
+        self.l1_ttl_s = l1_ttl_s
+        self.stale_s = stale_s
+        self.coalesce = coalesce
+        self.clock = clock
+        self.l1 = L1Cache(l1_items, clock)
+        self.stats = {
+            "l1_hits": 0, "l2_hits": 0, "stale_hits": 0, "misses": 0,
+            "coalesced": 0, "computes": 0, "refreshes": 0, "refresh_errors": 0,
+        }
+        self._flight = SingleFlight()
+        self._refreshing: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _fill_l1(self, key: str, entry: Entry):
+        """Keep in L1 for l1_ttl_s, but never past the end of the entry's stale window."""
+        remaining = entry["fresh_until"] + self.stale_s - self.clock()
+        self.l1.set(key, entry, min(self.l1_ttl_s, remaining))
+
+    def _serve(self, key: str, entry: Entry, compute_fn: Callable[[], object], hit: str) -> object:
+        if self.clock() < entry["fresh_until"]:
+            self._count(hit)
+        else:
+            self._count("stale_hits")
+            self._refresh_in_background(key, compute_fn)
+        return entry["value"]
+
+    def get_or_compute(self, key: str, compute_fn: Callable[[], object]) -> object:
+        entry = self.l1.get(key)
+        if entry is not None:
+            return self._serve(key, entry, compute_fn, "l1_hits")
+        if not self.coalesce:
+            return self._load(key, compute_fn)
+        value, shared = self._flight.do(key, lambda: self._load(key, compute_fn))
+        if shared:
+            self._count("coalesced")
+        return value
+
+    def _load(self, key: str, compute_fn: Callable[[], object]) -> object:
+        """L2, then compute_fn; runs once per key at a time when coalescing."""
+        entry = self.l2.get(key)
+        if entry is not None:
+            self._fill_l1(key, entry)
+            return self._serve(key, entry, compute_fn, "l2_hits")
+        self._count("misses")
+        return self._compute(key, compute_fn)
+
+    def _compute(self, key: str, compute_fn: Callable[[], object]) -> object:
+        self._count("computes")
+        value = compute_fn()
+        entry = {"value": value, "fresh_until": self.clock() + self.ttl_s}
+        self.l2.set(key, entry, ex=self.ttl_s + self.stale_s)
+        self._fill_l1(key, entry)
+        return value
+
+    def _refresh_in_background(self, key: str, compute_fn: Callable[[], object]):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key, compute_fn), daemon=True).start()
+
+    def _refresh(self, key: str, compute_fn: Callable[[], object]):
+        try:
+            self._compute(key, compute_fn)
+            self._count("refreshes")
+        except Exception:
+            self._count("refresh_errors")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, key: str):
+        """Remove from L2 and this process's L1 (other processes' L1 expire within l1_ttl_s)."""
+        self.l1.delete(key)
+        self.l2.delete(key)
+
+
+def demonstrate_tiered_cache():
+    """A burst of identical misses collapses to one LLM call; stale entries refresh in the background."""
+    print("=== Tiered Response Cache ===")
+
+    now = [1_000.0]
+    llm_calls = []
+
+    def slow_llm(query: str) -> str:
+        llm_calls.append(query)
+        time.sleep(0.05)  # Simulated generation latency
+        return f"Answer #{len(llm_calls)} to: {query}"
+
+    l2 = FakeRemoteKV(latency_s=0.002, clock=lambda: now[0])
+    cache = TieredCache(l2, ttl_s=300, l1_ttl_s=30, stale_s=60, clock=lambda: now[0])
+
+    query = "What is the refund policy?"
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        answers = list(pool.map(lambda _: cache.get_or_compute(query, lambda: slow_llm(query)), range(50)))
+    print(f"50 concurrent misses: {len(llm_calls)} LLM call, {cache.stats['coalesced']} requests waited on it, "
+          f"{len(set(answers))} distinct answer")
+
+    cache.get_or_compute(query, lambda: slow_llm(query))
+    print(f"Next request: L1 hit, L2 round trips so far: {l2.calls}")
+
+    other_replica = TieredCache(l2, ttl_s=300, l1_ttl_s=30, stale_s=60, clock=lambda: now[0])
+    other_replica.get_or_compute(query, lambda: slow_llm(query))
+    print(f"Another replica: {other_replica.stats['l2_hits']} L2 hit, still {len(llm_calls)} LLM call")
+
+    now[0] += 320  # Past ttl_s, inside the stale window
+    start = time.perf_counter()
+    answer = cache.get_or_compute(query, lambda: slow_llm(query))
+    print(f"\nAfter TTL: served {answer!r} in {(time.perf_counter() - start) * 1000:.2f} ms (stale)")
+    time.sleep(0.1)  # Let the background refresh finish
+    print(f"After refresh: {cache.get_or_compute(query, lambda: slow_llm(query))!r}")
+    print(f"\nstats: {cache.stats}")
+
+
+if __name__ == "__main__":
+    demonstrate_tiered_cache()
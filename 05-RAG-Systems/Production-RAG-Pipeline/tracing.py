@@ -0,0 +1,310 @@
+"""
+RAG Tracing and Metrics
+Nested per-stage spans (embed, retrieve, filter, rerank, generate), fixed-bucket
+latency histograms with p50/p95/p99, and a Prometheus text endpoint.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from local_embedder import HashingEmbedder
+from vector_index import VectorIndex
+
+# Bucket upper bounds: 21 steps per decade (at most 12.5% apart), 1 us to 100 s.
+# Every 1 / 2.5 / 5 x 10^n bound is included, and only those are exported to Prometheus.
+_MANTISSAS = (1.0, 1.1, 1.2, 1.3, 1.4, 1.6, 1.8, 2.0, 2.2, 2.5, 2.8, 3.2, 3.6, 4.0, 4.5, 5.0, 5.6, 6.3, 7.1, 8.0, 9.0)
+LATENCY_BUCKETS = tuple(round(m * 10.0 ** e, 12) for e in range(-6, 2) for m in _MANTISSAS) + (100.0,)
+EXPORTED_LATENCY_BUCKETS = frozenset(round(m * 10.0 ** e, 12) for e in range(-6, 3) for m in (1.0, 2.5, 5.0))
+SCORE_BUCKETS = tuple(round(0.05 * i, 2) for i in range(1, 21))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels] + ([extra] if extra else [])
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    """
+    Fixed buckets, so recording is a binary search plus an increment (no samples
+    kept) and percentiles are within one bucket width of the true value.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = list(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # Last slot: above the highest bound
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def percentile(self, q: float) -> float:
+        """Value at percentile q (0-100), interpolated linearly inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.bounds[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.bounds[-1]
+
+    def summary(self) -> Dict[str, float]:
+        return {"count": self.count, "p50": self.percentile(50), "p95": self.percentile(95), "p99": self.percentile(99)}
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class MetricFamily:
+    """One metric name with a child Histogram/Counter per label combination."""
+
+    def __init__(self, name: str, help_text: str, kind: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.buckets = buckets
+        self.children: Dict[Tuple[Tuple[str, str], ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels: str):
+        key = tuple(sorted(labels.items()))
+        child = self.children.get(key)
+        if child is None:
+            with self._lock:
+                child = self.children.setdefault(
+                    key, Histogram(self.buckets) if self.kind == "histogram" else Counter()
+                )
+        return child
+
+    def expose(self) -> List[str]:
+        # Text format 0.0.4: HELP/TYPE name the samples, so a counter's family is "<name>_total"
+        exposed = f"{self.name}_total" if self.kind == "counter" else self.name
+        lines = [f"# HELP {exposed} {self.help_text}", f"# TYPE {exposed} {self.kind}"]
+        for labels, child in sorted(self.children.items()):
+            if self.kind == "counter":
+                lines.append(f"{exposed}{_format_labels(labels)} {child.value:g}")
+                continue
+            cumulative = 0
+            for bound, count in zip(child.bounds, child.counts):
+                cumulative += count
+                if self.buckets is not LATENCY_BUCKETS or bound in EXPORTED_LATENCY_BUCKETS:
+                    le = f'le="{bound:g}"'
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(labels, le)} {child.count}")
+            lines.append(f"{self.name}_sum{_format_labels(labels)} {child.sum:.9g}")
+            lines.append(f"{self.name}_count{_format_labels(labels)} {child.count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.families: Dict[str, MetricFamily] = {}
+
+    def _family(self, name: str, help_text: str, kind: str, buckets=LATENCY_BUCKETS) -> MetricFamily:
+        if name not in self.families:
+            self.families[name] = MetricFamily(name, help_text, kind, buckets)
+        return self.families[name]
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS) -> MetricFamily:
+        return self._family(name, help_text, "histogram", buckets)
+
+    def counter(self, name: str, help_text: str) -> MetricFamily:
+        return self._family(name, help_text, "counter")
+
+    def expose(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(line for family in self.families.values() for line in family.expose()) + "\n"
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "start", "children", "duration", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str):
+        self.tracer = tracer
+        self.name = name
+        self.children: List["_Span"] = []
+        self.duration = 0.0
+
+    def __enter__(self) -> "_Span":
+        parent = _current_span.get()
+        if parent is not None:
+            parent.children.append(self)
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self.start
+        _current_span.reset(self._token)
+        self.tracer._finish(self)
+        return False
+
+    def tree(self, depth: int = 0) -> List[str]:
+        lines = [f"{'  ' * depth}{self.name:<{20 - 2 * depth}} {self.duration * 1000:8.3f} ms"]
+        for child in self.children:
+            lines += child.tree(depth + 1)
+        return lines
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar = contextvars.ContextVar("rag_span", default=None)
+
+
+class Tracer:
+    """
+    with tracer.span("retrieve"): ...   records the stage's latency in
+    rag_stage_seconds{stage="retrieve"}. Spans nest per thread / asyncio task
+    (contextvars); finished root spans (whole requests) are kept in
+    `recent_traces` for inspection. enabled=False makes span() a shared no-op.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None, enabled: bool = True, keep_traces: int = 100):
+        self.registry = registry or MetricsRegistry()
+        self.enabled = enabled
+        self.stage_seconds = self.registry.histogram("rag_stage_seconds", "Latency of each RAG pipeline stage")
+        self.recent_traces: Deque[_Span] = deque(maxlen=keep_traces)
+        self._histograms: Dict[str, Histogram] = {}
+
+    def span(self, name: str):
+        return _Span(self, name) if self.enabled else _NOOP_SPAN
+
+    def _finish(self, span: _Span):
+        histogram = self._histograms.get(span.name)
+        if histogram is None:
+            histogram = self._histograms[span.name] = self.stage_seconds.labels(stage=span.name)
+        histogram.observe(span.duration)
+        if _current_span.get() is None:
+            self.recent_traces.append(span)
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        """{stage: {count, p50, p95, p99}} with latencies in milliseconds."""
+        return {
+            name: {key: value * 1000 if key != "count" else value for key, value in histogram.summary().items()}
+            for name, histogram in self._histograms.items()
+        }
+
+
+def serve_metrics(registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9464) -> ThreadingHTTPServer:
+    """Serve GET /metrics from a daemon thread (port=0 picks a free port); call .shutdown() to stop."""
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.expose().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # Keep scrapes out of the application log
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class TracedRAG:
+    """A small RAG query path instrumented with the tracer, used by the demo and the overhead benchmark."""
+
+    def __init__(self, documents: Sequence[str], tracer: Tracer, generate_s: float = 0.002, dim: int = 256):
+        self.tracer = tracer
+        self.generate_s = generate_s
+        self.embedder = HashingEmbedder(dim=dim)
+        self.index = VectorIndex(dim)
+        self.index.add(self.embedder.embed(documents), texts=list(documents))
+        registry = tracer.registry
+        self.chunks_retrieved = registry.histogram(
+            "rag_chunks_retrieved", "Chunks passed to generation", buckets=(1, 2, 3, 5, 8, 13, 21)).labels()
+        self.top_score = registry.histogram(
+            "rag_top_similarity", "Similarity of the best retrieved chunk", buckets=SCORE_BUCKETS).labels()
+        self.requests = registry.counter("rag_requests", "RAG queries by outcome")
+
+    def query(self, question: str, k: int = 20, min_score: float = 0.05) -> str:
+        with self.tracer.span("rag_query"):
+            with self.tracer.span("embed"):
+                query = self.embedder.embed([question])
+            with self.tracer.span("retrieve"):
+                scores, ids = self.index.search(query, k=k)
+            with self.tracer.span("filter"):
+                kept = [(score, i) for score, i in zip(scores[0].tolist(), ids[0].tolist()) if score >= min_score]
+            with self.tracer.span("rerank"):
+                kept.sort(key=lambda item: (-item[0], len(self.index.texts[item[1]])))
+                context = [self.index.texts[i] for _, i in kept[:5]]
+            with self.tracer.span("generate"):
+                time.sleep(self.generate_s)  # Simulated LLM call
+                answer = f"Answer from {len(context)} chunks"
+        self.chunks_retrieved.observe(len(context))
+        self.top_score.observe(kept[0][0] if kept else 0.0)
+        self.requests.labels(outcome="answered" if context else "no_context").inc()
+        return answer
+
+
+def demonstrate_tracing():
+    """Trace a batch of queries, print a trace tree and percentiles, then scrape /metrics."""
+    print("=== RAG Tracing and Metrics ===")
+
+    rng = np.random.default_rng(0)
+    topics = ["refund", "shipping", "password", "invoice", "warranty", "delivery"]
+    documents = [f"{topics[i % 6]} policy {i}: " + " ".join(rng.choice(topics, 12)) for i in range(5000)]
+    tracer = Tracer()
+    rag = TracedRAG(documents, tracer)
+    for i in range(200):
+        rag.query(f"how does {topics[i % 6]} work")
+
+    print("One request:")
+    print("\n".join("  " + line for line in tracer.recent_traces[-1].tree()))
+    print(f"\n{'Stage':<10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for stage, summary in tracer.stage_summary().items():
+        print(f"{stage:<10} {summary['count']:>6} {summary['p50']:>8.3f} {summary['p95']:>8.3f} {summary['p99']:>8.3f}")
+
+    server = serve_metrics(tracer.registry, port=0)
+    url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+    with urllib.request.urlopen(url) as response:
+        text = response.read().decode()
+    server.shutdown()
+    print(f"\nScraped {url}: {len(text.splitlines())} lines, e.g.")
+    for line in text.splitlines():
+        if line.startswith(('rag_stage_seconds_bucket{stage="generate",le="0.0025"}',
+                            'rag_stage_seconds_count{stage="generate"}', "rag_requests_total")):
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    demonstrate_tracing()
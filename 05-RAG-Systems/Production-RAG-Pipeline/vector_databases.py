@@ -19,6 +19,10 @@ def vector_db_concept():
     print("  - Fast similarity search (ANN - Approximate Nearest Neighbor)")
     print("  - Scale to millions of vectors")
     print("  - Filter by metadata (e.g., date, category)")
+    
+    print("\nANN in practice (see ivf_index.py):")
+    print("  - Cluster vectors into cells, search only the closest cells")
+    print("  - Trade a little recall for a large latency reduction")
 
 
 def chroma_local():
@@ -37,6 +41,9 @@ def chroma_local():
     print("  - Development and testing")
     print("  - Small to medium datasets")
     print("  - Single-machine deployments")
+    print("  - No third-party DB allowed? See hnsw_index.py (native HNSW + file format)")
+    print("  - Re-ingesting edited documents? incremental_indexer.py embeds only changed chunks")
+    print("  - Loading millions of vectors? bulk_writer.py batches upserts and builds segments in the background")
     
     print("\nExample usage:")
     print("""
@@ -132,7 +139,7 @@ def production_considerations():
         "Scalability": "Can it handle millions of vectors?",
         "Performance": "Query latency and throughput",
         "Metadata filtering": "Filter by date, category, etc.",
-        "Persistence": "Data durability and backups",
+        "Persistence": "Data durability and backups (lsm_store.py: WAL, segments, snapshots)",
         "Multi-tenancy": "Support for multiple users/orgs",
         "Cost": "Pricing model and total cost",
         "Monitoring": "Metrics and observability",
@@ -147,7 +154,7 @@ def production_considerations():
     print("  ✓ Test query performance")
     print("  ✓ Plan for data growth")
     print("  ✓ Implement monitoring")
-    print("  ✓ Set up backups")
+    print("  ✓ Set up backups (snapshots need not stop writes: LSMVectorStore.snapshot)")
     print("  ✓ Consider multi-tenancy needs")
 
 
@@ -0,0 +1,177 @@
+"""
+Vector Index
+Exact batched top-k cosine search over a contiguous embedding matrix.
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from similarity import UnitVectors, Vectors, as_unit, many_to_many, normalize
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Select the k highest scores per row, sorted descending.
+    argpartition is O(n) per row; only the k winners are fully sorted.
+    """
+    scores = np.atleast_2d(scores)
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(scores.dtype), empty.astype(np.int64)
+
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    ids = np.take_along_axis(candidates, order, axis=1)
+    return np.take_along_axis(candidate_scores, order, axis=1), ids
+
+
+def recall_at_k(found_ids: np.ndarray, true_ids: np.ndarray) -> float:
+    """Fraction of the exact top-k neighbours that an approximate search returned."""
+    found_ids, true_ids = np.atleast_2d(found_ids), np.atleast_2d(true_ids)
+    hits = sum(
+        len(np.intersect1d(found, true)) for found, true in zip(found_ids, true_ids)
+    )
+    return hits / true_ids.size
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity index.
+    All embeddings live in one contiguous matrix, L2-normalized once at insert,
+    so scoring a batch of queries is a single matrix multiply.
+    dtype=np.float16 halves memory; scores are still computed in float32.
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 1024, dtype=np.float32):
+        self.dim = dim
+        self._vectors = np.empty((max(initial_capacity, 1), dim), dtype=dtype)
+        self._deleted = np.zeros(max(initial_capacity, 1), dtype=bool)
+        self._n_deleted = 0
+        self._size = 0
+        self.texts: List[Optional[str]] = []
+
+    def __len__(self) -> int:
+        """Number of live (non-deleted) vectors."""
+        return self._size - self._n_deleted
+
+    @property
+    def vectors(self) -> UnitVectors:
+        """The stored (normalized) embeddings, flagged so kernels skip re-normalizing."""
+        return UnitVectors(self._vectors[:self._size], dtype=self._vectors.dtype,
+                           assume_normalized=True)
+
+    @property
+    def deleted(self) -> np.ndarray:
+        """Tombstone mask over ids (True = deleted); a view, do not modify."""
+        return self._deleted[:self._size]
+
+    def _reserve(self, capacity: int):
+        """Grow storage geometrically so appends stay amortized O(1)."""
+        if capacity <= self._vectors.shape[0]:
+            return
+        new_capacity = max(capacity, 2 * self._vectors.shape[0])
+        vectors = np.empty((new_capacity, self.dim), dtype=self._vectors.dtype)
+        vectors[:self._size] = self._vectors[:self._size]
+        self._vectors = vectors
+        self._deleted = np.concatenate([self._deleted, np.zeros(new_capacity - len(self._deleted), dtype=bool)])
+
+    def add(
+        self,
+        embeddings: Vectors,
+        texts: Optional[Sequence[str]] = None
+    ) -> np.ndarray:
+        """Normalize (unless already UnitVectors) and append a batch; returns their ids."""
+        embeddings = as_unit(embeddings)
+        if embeddings.shape[1] != self.dim:
+            raise ValueError(f"Expected dimension {self.dim}, got {embeddings.shape[1]}")
+        if texts is not None and len(texts) != len(embeddings):
+            raise ValueError("texts and embeddings must have the same length")
+
+        start, end = self._size, self._size + len(embeddings)
+        self._reserve(end)
+        self._vectors[start:end] = embeddings
+
+        self.texts.extend(texts if texts is not None else [None] * len(embeddings))
+        self._size = end
+        return np.arange(start, end)
+
+    def delete(self, ids: Sequence[int]):
+        """Tombstone deletes: rows stay in the matrix but are never returned."""
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        if len(ids) and (ids.min() < 0 or ids.max() >= self._size):
+            raise KeyError("Unknown vector id")
+        self._n_deleted += int((~self._deleted[ids]).sum())
+        self._deleted[ids] = True
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 5,
+        batch_size: int = 64
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k cosine search for a batch of queries.
+        Returns (scores, ids), both shaped (n_queries, k).
+        Queries are scored batch_size at a time into one reused score buffer.
+        Slots left over when fewer than k vectors are live have score -inf
+        and id -1, so the shape never depends on the index size.
+        """
+        queries = normalize(queries)
+        all_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        all_ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if self._size == 0:
+            return all_scores, all_ids
+        found = min(k, self._size)
+        vectors = self.vectors
+        buffer = np.empty((min(batch_size, len(queries)), self._size), dtype=np.float32)
+
+        for start in range(0, len(queries), batch_size):
+            block = UnitVectors(queries[start:start + batch_size], assume_normalized=True)
+            scores = many_to_many(block, vectors, out=buffer[:len(block)])
+            if self._n_deleted:
+                scores[:, self._deleted[:self._size]] = -np.inf
+            block_scores, block_ids = top_k(scores, found)
+            all_scores[start:start + len(block), :found] = block_scores
+            all_ids[start:start + len(block), :found] = block_ids
+
+        if self._n_deleted:
+            all_ids[np.isneginf(all_scores)] = -1
+        return all_scores, all_ids
+
+
+def demonstrate_vector_index():
+    """Batched search over a small random corpus."""
+    print("=== Vector Index ===")
+
+    rng = np.random.default_rng(42)
+    dim = 64
+    corpus = rng.standard_normal((1000, dim)).astype(np.float32)
+
+    index = VectorIndex(dim)
+    index.add(corpus, texts=[f"Document {i}" for i in range(len(corpus))])
+
+    # Queries are noisy copies of known documents
+    targets = np.array([7, 123, 999])
+    queries = corpus[targets] + 0.1 * rng.standard_normal((3, dim)).astype(np.float32)
+    scores, ids = index.search(queries, k=3)
+
+    print(f"Indexed {len(index)} vectors of dimension {dim}")
+    for target, row_scores, row_ids in zip(targets, scores, ids):
+        print(f"\nQuery near document {target}:")
+        for score, doc_id in zip(row_scores, row_ids):
+            print(f"  {index.texts[doc_id]}: {score:.3f}")
+
+    print("\nWhy it is fast:")
+    print("  - One contiguous float32 matrix (cache friendly, BLAS matmul)")
+    print("  - Vectors normalized once at insert, so cosine = one dot product")
+    print("  - argpartition selects top-k in O(n) instead of a full sort")
+
+
+if __name__ == "__main__":
+    demonstrate_vector_index()